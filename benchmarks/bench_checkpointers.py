@@ -0,0 +1,124 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+checkpointer 读写延迟基准：InMemorySaver vs SqliteSaver vs DeltaSqliteSaver
+===========================================================================
+
+模拟 N 个会话，每个会话若干轮，每轮写入一个带 messages 的 checkpoint 和一组 pending writes（put_writes），
+然后逐个读取最新状态。SQLite 类的读取用新打开的实例（冷读：不命中写入时留下的缓存，
+如 DeltaSqliteSaver 的还原 LRU；InMemorySaver 只能用同一个实例读），
+还会输出数据库文件大小，用来对比整份存储与增量存储的写入量。
+
+运行：
+    python benchmarks/bench_checkpointers.py --threads 10000 --turns 3
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 项目根目录，用于导入 common 包
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import InMemorySaver
+
+from common.checkpoint import DeltaSqliteSaver, SqliteSaver
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run(make_saver, threads: int, turns: int) -> dict:
+    saver = make_saver()
+    write_times, put_writes_times, read_times = [], [], []
+    parents = {}
+    versions = {}
+    histories = {}
+    for turn in range(turns):
+        for t in range(threads):
+            thread_id = f'user_{t}'
+            history = histories.setdefault(thread_id, [])
+            history += [
+                HumanMessage(content=f'第{turn}轮问题，我的用户 ID 是 {t}', id=f'h-{t}-{turn}'),
+                AIMessage(content=f'好的，已记下您的用户ID {t}。还有什么可以帮您？', id=f'a-{t}-{turn}'),
+            ]
+            version = saver.get_next_version(versions.get(thread_id), None)
+            versions[thread_id] = version
+            checkpoint = empty_checkpoint()
+            checkpoint['channel_values'] = {'messages': list(history)}
+            checkpoint['channel_versions'] = {'messages': version}
+            config = {'configurable': {'thread_id': thread_id, 'checkpoint_ns': ''}}
+            if thread_id in parents:
+                config['configurable']['checkpoint_id'] = parents[thread_id]
+
+            start = time.perf_counter()
+            saved = saver.put(config, checkpoint, {'source': 'loop', 'step': turn}, {'messages': version})
+            write_times.append(time.perf_counter() - start)
+            parents[thread_id] = saved['configurable']['checkpoint_id']
+
+            # 下一步的 pending writes（节点输出先于 checkpoint 落库）
+            writes = [('messages', [AIMessage(content=f'工具结果 {t}-{turn}', id=f'w-{t}-{turn}')])]
+            start = time.perf_counter()
+            saver.put_writes(saved, writes, task_id=f'task-{t}-{turn}')
+            put_writes_times.append(time.perf_counter() - start)
+
+    reader = saver
+    if hasattr(saver, 'close'):
+        saver.close()
+        reader = make_saver()  # 新实例读取：冷读，不用写入时留在内存里的还原结果
+    for t in range(threads):
+        start = time.perf_counter()
+        reader.get_tuple({'configurable': {'thread_id': f'user_{t}', 'checkpoint_ns': ''}})
+        read_times.append(time.perf_counter() - start)
+    if reader is not saver:
+        reader.close()
+
+    return {
+        'write_p50_us': percentile(write_times, 0.5) * 1e6,
+        'write_p99_us': percentile(write_times, 0.99) * 1e6,
+        'write_mean_us': statistics.fmean(write_times) * 1e6,
+        'put_writes_p50_us': percentile(put_writes_times, 0.5) * 1e6,
+        'put_writes_p99_us': percentile(put_writes_times, 0.99) * 1e6,
+        'read_p50_us': percentile(read_times, 0.5) * 1e6,
+        'read_p99_us': percentile(read_times, 0.99) * 1e6,
+        'read_mean_us': statistics.fmean(read_times) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='checkpointer 读写延迟基准')
+    parser.add_argument('--threads', type=int, default=10_000)
+    parser.add_argument('--turns', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 名字 -> (创建 / 重新打开 saver 的函数, 数据库文件名)
+        savers = {
+            'InMemorySaver': (InMemorySaver, None),
+            'SqliteSaver(commit_every=1)': (lambda: SqliteSaver(os.path.join(tmp, 'a.sqlite')), 'a.sqlite'),
+            'SqliteSaver(commit_every=16)': (
+                lambda: SqliteSaver(os.path.join(tmp, 'b.sqlite'), commit_every=16), 'b.sqlite'),
+            'DeltaSqliteSaver': (lambda: DeltaSqliteSaver(os.path.join(tmp, 'c.sqlite')), 'c.sqlite'),
+        }
+        print(f'{args.threads} 个会话 × {args.turns} 轮')
+        print(f'{"checkpointer":<30}{"写p50":>10}{"写p99":>10}{"写均值":>10}{"writes p50":>12}{"writes p99":>12}'
+              f'{"冷读p50":>10}{"冷读p99":>10}{"冷读均值":>10}{"库MB":>10}  (微秒)')
+        for name, (make_saver, filename) in savers.items():
+            result = run(make_saver, args.threads, args.turns)
+            size = '-'
+            if filename is not None:
+                size = f'{sum(os.path.getsize(p) for p in Path(tmp).glob(filename + "*")) / 2 ** 20:.2f}'
+            widths = [10, 10, 10, 12, 12, 10, 10, 10]
+            print(f'{name:<30}' + ''.join(f'{v:>{w}.1f}' for v, w in zip(result.values(), widths)) + f'{size:>10}')
+
+
+if __name__ == '__main__':
+    main()
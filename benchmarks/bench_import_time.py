@@ -0,0 +1,173 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+启动耗时基准（-X importtime）
+============================
+
+对每个入口（各章节脚本只导入不运行示例、common.tools 下的工具模块只导入、各 CLI 的 --help）分别测：
+- cold：字节码缓存为空（PYTHONPYCACHEPREFIX 指向新的临时目录）时的一次启动
+- warm：字节码缓存已生成后的多次启动，取中位数
+- import：-X importtime 统计的导入总耗时，以及耗时最多的几个顶层模块
+
+结果可以保存为 JSON 基线，之后对比基线，warm 启动变慢超过阈值时以退出码 1 结束（可放进 CI）：
+    python benchmarks/bench_import_time.py --save              # 生成 / 更新基线
+    python benchmarks/bench_import_time.py --compare           # 与基线对比
+    python benchmarks/bench_import_time.py --only 05 06 --runs 3
+
+基线与机器相关，请在同一台机器（或同一 CI 规格）上生成和对比。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'import_time_baseline.json'
+
+
+def _script(path: str) -> list:
+    # 以非 __main__ 的名字执行脚本：只走模块顶层（导入、构建模型），不跑示例
+    return ['-c', f'import runpy; runpy.run_path({path!r}, run_name="__bench__")']
+
+
+# 入口名 -> python 参数
+ENTRY_POINTS = {
+    '01_heiio_langchain/helloword': _script('phase1_fundamentals/01_heiio_langchain/helloword.py'),
+    '01_heiio_langchain/invoke_practics': _script('phase1_fundamentals/01_heiio_langchain/invoke_practics.py'),
+    '02_prompt_templates/main': _script('phase1_fundamentals/02_prompt_templates/main.py'),
+    '03_messages/main': _script('phase1_fundamentals/03_messages/main.py'),
+    '05_simple_agent/main': _script('phase1_fundamentals/05_simple_agent/main.py'),
+    '06_agent_loop/main': _script('phase1_fundamentals/06_agent_loop/main.py'),
+    '07_memory_basics/main': _script('phase_2_practical/07_memory_basics/main.py'),
+    '08_context_management/main': _script('phase_2_practical/08_context_management/main.py'),
+    '09_agent_service/main --help': ['phase_2_practical/09_agent_service/main.py', '--help'],
+    # 工具模块只测导入（-m 会跑模块里的演示，arithmetic 的演示本身就要逐个调用上万次）；
+    # 导入耗时的下限是 from langchain_core.tools import tool：BaseTool 依赖回调 / 追踪体系（callbacks.manager、langsmith），
+    # 工具模块不用它就给不出工具对象，而不需要工具的入口本来就不会导入这些模块（common.tools 按名字懒加载）
+    'common.tools.arithmetic': ['-c', 'import common.tools.arithmetic'],
+    'common.tools.expression': ['-c', 'import common.tools.expression'],
+    'common.tools.user_info': ['-c', 'import common.tools.user_info'],
+    'common.tools.weather': ['-c', 'import common.tools.weather'],
+    'common.tools.search': ['-c', 'import common.tools.search'],
+    'common.mock_server --help': ['-m', 'common.mock_server', '--help'],
+    'bench_search_index --help': ['benchmarks/bench_search_index.py', '--help'],
+    'bench_prompt_templates --help': ['benchmarks/bench_prompt_templates.py', '--help'],
+    'bench_checkpointers --help': ['benchmarks/bench_checkpointers.py', '--help'],
+    'load_test_service --help': ['benchmarks/load_test_service.py', '--help'],
+}
+
+
+def run_once(args: list, pycache: str, importtime: bool = False) -> tuple:
+    """运行一次，返回 (墙钟耗时 ms, stderr)"""
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache, PYTHONPATH=str(ROOT))
+    env.setdefault('DEEPSEEK_API_KEY', 'import-time-bench')  # 部分脚本启动时检查密钥；只导入，不会发请求
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + args
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f'{" ".join(args)} 退出码 {result.returncode}:\n{result.stderr[-2000:]}')
+    return elapsed, result.stderr
+
+
+def parse_importtime(stderr: str, top: int) -> tuple:
+    """解析 -X importtime 输出，返回 (导入总耗时 ms, [(顶层模块, 累计 ms)])"""
+    total_us, roots = 0, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        name = name[1:]  # 去掉分隔符后的一个空格，剩下的缩进表示嵌套层级
+        if not name.startswith(' '):  # 顶层导入
+            roots.append((name, int(cumulative_us) / 1000))
+    roots.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, [(name, round(ms, 1)) for name, ms in roots[:top]]
+
+
+def measure(name: str, args: list, runs: int, top: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix='pycache-') as pycache:
+        cold, _ = run_once(args, pycache)
+        warm = [run_once(args, pycache)[0] for _ in range(runs)]
+        _, stderr = run_once(args, pycache, importtime=True)
+    import_ms, heaviest = parse_importtime(stderr, top)
+    return {
+        'cold_ms': round(cold, 1),
+        'warm_ms': round(statistics.median(warm), 1),
+        'import_ms': round(import_ms, 1),
+        'heaviest': heaviest,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """返回变慢的入口 [(入口, 基线 ms, 当前 ms)]"""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get('entries', {}).get(name)
+        if not before:
+            continue
+        delta = current['warm_ms'] - before['warm_ms']
+        if delta > min_delta_ms and current['warm_ms'] > before['warm_ms'] * (1 + tolerance):
+            regressions.append((name, before['warm_ms'], current['warm_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准（-X importtime）')
+    parser.add_argument('--runs', type=int, default=5, help='warm 启动的重复次数（取中位数）')
+    parser.add_argument('--top', type=int, default=3, help='每个入口列出耗时最多的几个顶层模块')
+    parser.add_argument('--only', nargs='*', help='只测名字包含这些子串的入口')
+    parser.add_argument('--save', nargs='?', const=str(DEFAULT_BASELINE), help='把结果保存为基线 JSON')
+    parser.add_argument('--compare', nargs='?', const=str(DEFAULT_BASELINE), help='与基线 JSON 对比')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='warm 启动变慢超过该比例算退化')
+    parser.add_argument('--min-delta-ms', type=float, default=30.0, help='变慢的绝对值小于该值时忽略（抖动）')
+    args = parser.parse_args()
+
+    entries = {name: argv for name, argv in ENTRY_POINTS.items()
+               if not args.only or any(part in name for part in args.only)}
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print(f'{"入口":<34}{"cold":>10}{"warm":>10}{"import":>10}{"基线warm":>10}  最重的顶层导入')
+    results = {}
+    for name, argv in entries.items():
+        result = results[name] = measure(name, argv, args.runs, args.top)
+        before = (baseline or {}).get('entries', {}).get(name, {}).get('warm_ms')
+        heaviest = ', '.join(f'{module} {ms:.0f}ms' for module, ms in result['heaviest'])
+        print(f'{name:<36}{result["cold_ms"]:>10.0f}{result["warm_ms"]:>10.0f}{result["import_ms"]:>10.0f}'
+              f'{before if before is not None else "-":>12}  {heaviest}')
+
+    if args.save:
+        data = {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'entries': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f'\n基线已保存：{args.save}')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print('\n启动变慢：')
+            for name, before, after in regressions:
+                print(f'  {name}: {before:.0f}ms -> {after:.0f}ms')
+            sys.exit(1)
+        print('\n与基线相比没有明显退化')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+提示词模板格式化基准：LangChain 原生模板 vs common.fast_prompt
+==============================================================
+
+用 02_prompt_templates/main.py 里的各个模板，分别测：
+- 构建（from_template / from_messages / partial）每秒次数
+- 格式化（format / format_messages）每秒次数，fast_prompt 另测 format_dicts
+
+运行：
+    python benchmarks/bench_prompt_templates.py --seconds 0.5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 项目根目录，用于导入 common 包
+from langchain_core.prompts import (
+    ChatPromptTemplate,
+    HumanMessagePromptTemplate,
+    PromptTemplate,
+    SystemMessagePromptTemplate,
+)
+
+from common.fast_prompt import FastChatPromptTemplate, FastPromptTemplate
+
+CHAT_EXAMPLES = {
+    'example_3_chat': (
+        [("system", "你是一个{role}，擅长{expertise}。"), ("user", "请给我{task}")],
+        dict(role='AI教授', expertise='大模型开发', task='解释什么是机器学习'),
+    ),
+    'example_4_conversation': (
+        [("system", "你是一个{role}。{instruction}"), ("user", "{question1}"),
+         ("assistant", "{answer1}"), ("user", "{question2}")],
+        dict(role="Python 专家", instruction="回答要简洁、准确", question1="什么是列表？",
+             answer1="列表是 Python 中的有序可变集合，用方括号 [] 表示。", question2="它和元组有什么区别？"),
+    ),
+    'example_5_message_template': (
+        [SystemMessagePromptTemplate.from_template('你是一个{role}，{instruction}'),
+         HumanMessagePromptTemplate.from_template('关于{topic}，我想知道{question}')],
+        dict(role='Python老师', instruction='回答通俗易懂', topic='装饰器', question='原理与用法'),
+    ),
+}
+
+STRING_EXAMPLES = {
+    'example_1_why_template': (
+        '你是一个{difficulty}级别的编程导师，请用简单易懂的语言解释{topic}。',
+        dict(difficulty='medium', topic='AI应用开发'),
+    ),
+    'example_2_translate': (
+        '将下列文本翻译成{language}：\n{text}',
+        dict(language='韩语', text='你好，我是AI应用工程师。'),
+    ),
+}
+
+
+def rate(fn, seconds: float) -> float:
+    """在 seconds 秒内尽量多地调用 fn，返回每秒次数"""
+    count, batch = 0, 64
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            fn()
+        count += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def row(name: str, langchain: float, fast: float, fast_dicts: float = None):
+    dicts = f'{fast_dicts:>14,.0f}' if fast_dicts is not None else f'{"-":>14}'
+    print(f'{name:<40}{langchain:>14,.0f}{fast:>14,.0f}{dicts}{fast / langchain:>10.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提示词模板格式化基准')
+    parser.add_argument('--seconds', type=float, default=0.5, help='每一项测多少秒')
+    args = parser.parse_args()
+    s = args.seconds
+
+    print(f'{"场景（次/秒）":<36}{"LangChain":>14}{"fast_prompt":>14}{"format_dicts":>14}{"加速":>10}')
+
+    for name, (template, values) in STRING_EXAMPLES.items():
+        lc, fast = PromptTemplate.from_template(template), FastPromptTemplate.from_template(template)
+        assert lc.format(**values) == fast.format(**values)
+        row(f'{name} build', rate(lambda: PromptTemplate.from_template(template), s),
+            rate(lambda: FastPromptTemplate.from_template(template), s))
+        row(f'{name} format', rate(lambda: lc.format(**values), s), rate(lambda: fast.format(**values), s))
+
+    for name, (messages, values) in CHAT_EXAMPLES.items():
+        lc, fast = ChatPromptTemplate.from_messages(messages), FastChatPromptTemplate.from_messages(messages)
+        assert lc.format_messages(**values) == fast.format_messages(**values)
+        row(f'{name} build', rate(lambda: ChatPromptTemplate.from_messages(messages), s),
+            rate(lambda: FastChatPromptTemplate.from_messages(messages), s))
+        row(f'{name} format_messages', rate(lambda: lc.format_messages(**values), s),
+            rate(lambda: fast.format_messages(**values), s), rate(lambda: fast.format_dicts(**values), s))
+
+    # example_6：partial 之后复用
+    messages = [("system", "你是一个{role}，擅长{expertise}。"), ("user", "请给我{task}，概括回答")]
+    fixed = dict(role='LangChain学生', expertise='AI app开发')
+    lc = ChatPromptTemplate.from_messages(messages).partial(**fixed)
+    fast = FastChatPromptTemplate.from_messages(messages).partial(**fixed)
+    task = '介绍用langchain进行AI应用开发的步骤'
+    assert lc.format_messages(task=task) == fast.format_messages(task=task)
+    row('example_6_partial partial', rate(lambda: ChatPromptTemplate.from_messages(messages).partial(**fixed), s),
+        rate(lambda: FastChatPromptTemplate.from_messages(messages).partial(**fixed), s))
+    row('example_6_partial format_messages', rate(lambda: lc.format_messages(task=task), s),
+        rate(lambda: fast.format_messages(task=task), s), rate(lambda: fast.format_dicts(task=task), s))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+倒排索引基准：建索引吞吐与查询延迟
+==================================
+
+生成 N 篇中英混合的模拟网页标题（词频服从 Zipf 分布），批量建索引后：
+- 随机抽取文档里的 1~3 个词作为查询，统计 search 延迟 p50 / p95 / p99；
+  含常见词（倒排表长于 candidate_budget）的查询要扫长倒排表，单独一行报告，
+  其余查询按 p99 检查是否达到亚毫秒目标（--target-ms），未达标时以退出码 1 结束
+- 再增量添加一批文档，测增量添加耗时与添加后第一次查询的延迟（要重算一次长度归一项）
+- 与原来的线性扫描（逐条 .lower() 子串匹配，扫完全部文档再取前 k 个）在同一语料上对比
+
+运行：
+    python benchmarks/bench_search_index.py --docs 1000000 --queries 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # 项目根目录，用于导入 common 包
+from common.search_index import SearchIndex, tokenize
+
+# 常用汉字，用来拼中文词
+_HANZI = ('的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后'
+          '多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由'
+          '其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建'
+          '月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较')
+_LATIN = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def make_vocabulary(rng: random.Random, size: int) -> list:
+    words = set()
+    while len(words) < size:
+        if rng.random() < 0.5:
+            words.add(''.join(rng.choices(_HANZI, k=rng.choice((2, 2, 3, 4)))))
+        else:
+            words.add(''.join(rng.choices(_LATIN, k=rng.randint(3, 9))))
+    return sorted(words)
+
+
+def make_corpus(rng: random.Random, vocabulary: list, docs: int, words_per_doc: tuple) -> list:
+    weights = [1 / (rank + 1) ** 1.05 for rank in range(len(vocabulary))]
+    lo, hi = words_per_doc
+    pool = rng.choices(vocabulary, weights=weights, k=docs * hi)
+    corpus, pos = [], 0
+    for _ in range(docs):
+        n = rng.randint(lo, hi)
+        corpus.append(' '.join(pool[pos:pos + n]))
+        pos += n
+    return corpus
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def linear_search(corpus: list, query: str, k: int) -> list:
+    """原 web_search 的做法：逐条 .lower() 子串匹配（要排序就得扫完全部文档）"""
+    query = query.lower()
+    results = [doc for doc in corpus if query in doc.lower()]
+    results.sort(key=len)
+    return results[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='倒排索引基准')
+    parser.add_argument('--docs', type=int, default=1_000_000, help='文档数')
+    parser.add_argument('--vocab', type=int, default=200_000, help='词表大小')
+    parser.add_argument('--queries', type=int, default=2000, help='查询次数')
+    parser.add_argument('--batch', type=int, default=100_000, help='每批建索引的文档数')
+    parser.add_argument('--k', type=int, default=10, help='每次返回的结果数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--target-ms', type=float, default=1.0, help='非常见词查询的 p99 延迟目标（毫秒）')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    vocabulary = make_vocabulary(rng, args.vocab)
+    corpus = make_corpus(rng, vocabulary, args.docs, (4, 12))
+    print(f'生成语料：{len(corpus):,} 篇，{time.perf_counter() - start:.1f}s')
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(0, len(corpus), args.batch):
+        index.add_documents(corpus[i:i + args.batch])
+    elapsed = time.perf_counter() - start
+    print(f'建索引：{elapsed:.1f}s（{len(corpus) / elapsed:,.0f} 篇/秒），{index.stats()}')
+
+    index.search('warmup')  # 首次查询计算长度归一项
+    queries = []
+    for _ in range(args.queries):
+        words = rng.choice(corpus).split()
+        queries.append(' '.join(rng.sample(words, rng.randint(1, min(3, len(words))))))
+
+    def is_common(query: str) -> bool:
+        return any(index.document_frequency(term) > index.candidate_budget for term in tokenize(query))
+
+    groups = {'1 个词': [], '2~3 个词': [], f'含常见词（倒排表 > {index.candidate_budget:,}，不计入目标）': []}
+    labels = list(groups)
+    for query in queries:
+        groups[labels[2] if is_common(query) else labels[' ' in query]].append(query)
+
+    passed = True
+    for label, group in groups.items():
+        if not group:
+            continue
+        latencies = []
+        for query in group:
+            t = time.perf_counter()
+            index.search(query, args.k)
+            latencies.append((time.perf_counter() - t) * 1000)
+        p99 = percentile(latencies, 0.99)
+        verdict = ''
+        if label != labels[2]:
+            ok = p99 < args.target_ms
+            passed &= ok
+            verdict = f'  [{"PASS" if ok else "FAIL"}：p99 目标 < {args.target_ms}ms]'
+        print(f'查询（{label}，{len(group)} 次）：p50 {percentile(latencies, 0.5):.3f}ms  '
+              f'p95 {percentile(latencies, 0.95):.3f}ms  p99 {p99:.3f}ms{verdict}')
+
+    # 增量添加
+    extra = make_corpus(rng, vocabulary, 10_000, (4, 12))
+    t = time.perf_counter()
+    for doc in extra[:1000]:
+        index.add(doc)
+    single = (time.perf_counter() - t) / 1000 * 1e6
+    t = time.perf_counter()
+    index.add_documents(extra[1000:])
+    batch = (time.perf_counter() - t) / 9000 * 1e6
+    t = time.perf_counter()
+    index.search(queries[0], args.k)
+    first = (time.perf_counter() - t) * 1000
+    print(f'增量添加：逐篇 {single:.1f}µs/篇，批量 {batch:.1f}µs/篇；添加后首次查询 {first:.3f}ms')
+
+    # 原来的线性扫描（只测几次，太慢）
+    sample = [q.split()[0] for q in queries[:5]]
+    t = time.perf_counter()
+    for query in sample:
+        linear_search(corpus, query, args.k)
+    linear = (time.perf_counter() - t) / len(sample) * 1000
+    t = time.perf_counter()
+    for query in sample:
+        index.search(query, args.k)
+    indexed = (time.perf_counter() - t) / len(sample) * 1000
+    print(f'对比线性扫描（{len(sample)} 个单词查询平均）：线性 {linear:.2f}ms vs 倒排索引 {indexed:.3f}ms')
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
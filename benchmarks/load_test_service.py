@@ -0,0 +1,193 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+Agent 服务压测（09_agent_service）
+=================================
+
+默认在进程内启动离线模拟服务 + Agent 服务（InMemorySaver），再用 N 个并发客户端压测：
+每个客户端是一个用户（各自的 thread_id），按顺序发送若干轮对话（含一次工具调用）。
+统计：
+- 各状态码数量（503 即被背压拒绝）、吞吐（成功轮次 / 秒）
+- 客户端视角的整轮耗时与首个 token 延迟（流式）p50 / p95 / p99
+- --abort 比例的流式请求收到几个 token 后主动断开，检查服务端是否取消了这些轮次（cancelled）
+  且结束后 in_flight / running 都回到 0
+
+运行：
+    python benchmarks/load_test_service.py --clients 200 --turns 3 --concurrency 32 --queue 64
+    python benchmarks/load_test_service.py --mode invoke --tps 0
+    python benchmarks/load_test_service.py --url http://127.0.0.1:8000     # 压测已启动的服务
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import runpy
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # 项目根目录，用于导入 common 包
+
+CONVERSATION = ["你好，我想咨询一下", "我的用户 ID 是 123", "帮我查一下我的信息", "我多大来着？"]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def request(host: str, port: int, method: str, path: str, payload: dict = None,
+                  abort_after: int = 0) -> dict:
+    """
+    发一个 HTTP 请求（每个请求一个连接），流式响应逐行解析 SSE
+
+    参数:
+        abort_after: >0 时收到这么多个 token 事件后直接断开连接（模拟用户关掉页面）
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload or {}, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+    await writer.drain()
+    result = {'status': 0, 'ttft': None, 'tokens': 0, 'aborted': False, 'body': b''}
+    try:
+        status_line = await reader.readline()
+        result['status'] = int(status_line.split()[1]) if status_line else 0
+        stream = False
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            if line.lower().startswith(b'content-type: text/event-stream'):
+                stream = True
+        if not stream:
+            result['body'] = await reader.read()
+        else:
+            event = None
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b'event: '):
+                    event = line[7:].strip().decode()
+                elif line.startswith(b'data: ') and event == 'token':
+                    result['tokens'] += 1
+                    if result['ttft'] is None:
+                        result['ttft'] = time.perf_counter() - start
+                    if abort_after and result['tokens'] >= abort_after:
+                        result['aborted'] = True
+                        break
+                elif line.startswith(b'data: ') and event in ('done', 'error'):
+                    result['event'] = event
+                    result['body'] = line[6:]
+    finally:
+        writer.close()
+    result['latency'] = time.perf_counter() - start
+    return result
+
+
+async def client(index: int, args, host: str, port: int, results: list):
+    thread_id = f'load_{index}_{random.randrange(1 << 30)}'
+    for turn in range(args.turns):
+        message = CONVERSATION[turn % len(CONVERSATION)]
+        stream = args.mode == 'stream' or (args.mode == 'mixed' and random.random() < 0.5)
+        abort = stream and random.random() < args.abort
+        path = f'/threads/{thread_id}/{"stream" if stream else "invoke"}'
+        try:
+            result = await request(host, port, 'POST', path, {'message': message}, abort_after=2 if abort else 0)
+        except (ConnectionError, OSError) as e:
+            result = {'status': -1, 'error': str(e), 'latency': 0.0, 'ttft': None, 'aborted': False}
+        result['stream'] = stream
+        results.append(result)
+        if result['status'] == 503:
+            await asyncio.sleep(random.uniform(0.05, 0.2))  # 被拒绝：退避后继续下一轮
+
+
+async def run_load(args, host: str, port: int) -> tuple:
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i, args, host, port, results) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.2)  # 等服务端处理完断开的连接
+    stats = await request(host, port, 'GET', '/stats')
+    return results, elapsed, json.loads(stats['body'])
+
+
+def report(results: list, elapsed: float, server_stats: dict):
+    statuses = Counter(r['status'] for r in results)
+    ok = [r for r in results if r['status'] == 200 and not r['aborted'] and r.get('event', 'done') == 'done']
+    aborted = sum(r['aborted'] for r in results)
+    latencies = [r['latency'] for r in ok]
+    ttfts = [r['ttft'] for r in ok if r['ttft'] is not None]
+    print(f'请求 {len(results)} 个，用时 {elapsed:.2f}s，状态码 {dict(statuses)}')
+    print(f'成功 {len(ok)} 轮，吞吐 {len(ok) / elapsed:.1f} 轮/秒；主动断开 {aborted} 个')
+    print(f'整轮耗时：p50 {percentile(latencies, 0.5):.3f}s  p95 {percentile(latencies, 0.95):.3f}s  '
+          f'p99 {percentile(latencies, 0.99):.3f}s')
+    if ttfts:
+        print(f'首 token（流式）：p50 {percentile(ttfts, 0.5):.3f}s  p95 {percentile(ttfts, 0.95):.3f}s  '
+              f'p99 {percentile(ttfts, 0.99):.3f}s')
+    print(f'\n服务端统计：{json.dumps(server_stats, ensure_ascii=False)}')
+    if server_stats.get('cancelled', 0) < aborted:
+        print(f'警告：客户端断开 {aborted} 个，服务端只取消了 {server_stats.get("cancelled", 0)} 个')
+    sessions = server_stats.get('sessions', {})
+    if server_stats.get('in_flight') or sessions.get('running') or sessions.get('queued_turns'):
+        print('警告：压测结束后服务端仍有未完成的请求')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agent 服务压测')
+    parser.add_argument('--url', default=None, help='压测已启动的服务；不指定则在进程内启动离线服务')
+    parser.add_argument('--clients', type=int, default=200, help='并发客户端（用户）数')
+    parser.add_argument('--turns', type=int, default=3, help='每个客户端的对话轮数')
+    parser.add_argument('--mode', choices=('stream', 'invoke', 'mixed'), default='mixed')
+    parser.add_argument('--abort', type=float, default=0.1, help='流式请求中途断开的比例')
+    parser.add_argument('--concurrency', type=int, default=32, help='进程内服务：工作池大小')
+    parser.add_argument('--queue', type=int, default=64, help='进程内服务：排队上限')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟服务首包延迟（秒）')
+    parser.add_argument('--tps', type=float, default=100, help='模拟服务生成速度，0 表示不限速')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = mock = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        from langgraph.checkpoint.memory import InMemorySaver
+        from common.agent_server import serve_in_thread
+        from common.mock_server import MockConfig, serve_in_thread as serve_mock
+
+        mock = serve_mock(MockConfig(latency=args.latency, tokens_per_sec=args.tps, rules=[
+            {"match": "查一下", "tool_calls": [{"name": "get_used_info", "arguments": {"used_id": "123"}}]},
+        ]))
+        os.environ['DEEPSEEK_BASE_URL'] = mock.base_url
+        os.environ['DEEPSEEK_API_KEY'] = 'mock'
+        service = runpy.run_path(str(ROOT / 'phase_2_practical/09_agent_service/main.py'), run_name='__load_test__')
+        server = serve_in_thread(service['build_agent'](InMemorySaver()), max_concurrency=args.concurrency,
+                                 max_queue=args.queue)
+        host, port = urlsplit(server.base_url).hostname, urlsplit(server.base_url).port
+        print(f'进程内服务：{server.base_url}（工作池 {args.concurrency}，排队上限 {args.queue}），模拟模型 {mock.base_url}')
+
+    try:
+        results, elapsed, server_stats = asyncio.run(run_load(args, host, port))
+        report(results, elapsed, server_stats)
+    finally:
+        if server is not None:
+            server.shutdown()
+        if mock is not None:
+            mock.shutdown()
+
+
+if __name__ == '__main__':
+    main()
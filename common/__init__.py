@@ -0,0 +1,13 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+公共组件包
+==========
+
+各章节示例共用的基础设施（离线模拟服务、模型工厂、缓存等）。
+脚本中通过把项目根目录加入 sys.path 后 `from common.xxx import ...` 使用。
+
+注意：这里不做任何子模块的导入，避免拖慢脚本启动。
+"""
@@ -0,0 +1,376 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+Agent HTTP / SSE 服务（asyncio，无第三方依赖）
+============================================
+
+把 create_agent 的 Agent 放到网络接口后面，按 thread_id 区分会话：
+
+    POST /threads/{thread_id}/invoke    {"message": "你好"}  -> {"thread_id", "reply", "latency"}
+    POST /threads/{thread_id}/stream    {"message": "你好"}  -> text/event-stream
+        event: token  data: {"text": "你"}
+        event: tool   data: {"name": "get_used_info", "content": "..."}
+        event: done   data: {"reply": "...", "metrics": {"ttft": ..., "tokens_per_sec": ...}}
+        event: error  data: {"error": "..."}
+    GET  /stats                          服务与会话统计
+    GET  /health
+
+调度：
+1. 模型调用交给 SessionDriver：同一 thread_id 的轮次按顺序执行，不同会话并发，
+   同时在跑的轮次不超过 max_concurrency（即工作池大小）
+2. 排队与背压：已接收未完成的请求数达到 max_concurrency + max_queue 时直接返回 503（带 Retry-After），
+   不无限堆积；客户端据此退避重试
+3. 客户端断开：请求处理期间一直监听连接，对方关闭连接（或 SSE 写入失败）就取消这一轮，
+   正在进行的模型请求随之取消，会话锁与并发名额立即释放
+4. 单轮超时 request_timeout，超时返回 504（流式则发送 error 事件）
+
+每个响应都带 Connection: close，不支持 keep-alive / pipelining（客户端每个请求一个连接）。
+
+用法：
+    server = AgentServer(agent, max_concurrency=32, max_queue=128)
+    server.run('127.0.0.1', 8000)
+
+    # 或在后台线程里启动（压测、测试用）
+    server = serve_in_thread(agent, port=0)
+    print(server.base_url)
+    server.shutdown()
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional
+from urllib.parse import unquote
+
+from common.session_driver import SessionDriver
+from common.streaming import StreamMetrics, TurnMetrics, percentile
+
+_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class _ClientGone(Exception):
+    """客户端已断开"""
+
+
+def _response_head(status: int, content_type: str, length: Optional[int] = None, headers: Optional[dict] = None) -> bytes:
+    lines = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}', f'Content-Type: {content_type}', 'Connection: close']
+    if length is not None:
+        lines.append(f'Content-Length: {length}')
+    for name, value in (headers or {}).items():
+        lines.append(f'{name}: {value}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'.encode('utf-8')
+
+
+class AgentServer:
+    """
+    参数:
+        agent: 带 checkpointer 的 Agent（create_agent 的返回值）
+        max_concurrency: 同时执行的轮次上限（工作池大小）
+        max_queue: 在工作池之外最多排队的请求数，再多返回 503
+        request_timeout: 单轮超时（秒），None 表示不限
+        max_body: 请求体大小上限（字节）
+        window: 统计耗时分位数时保留的样本数
+    """
+
+    def __init__(
+            self,
+            agent,
+            max_concurrency: int = 32,
+            max_queue: int = 128,
+            request_timeout: Optional[float] = 120,
+            max_body: int = 1 << 20,
+            window: int = 10_000,
+    ):
+        self.driver = SessionDriver(agent, max_concurrency=max_concurrency)
+        self.max_queue = max_queue
+        self.capacity = max_concurrency + max_queue
+        self.request_timeout = request_timeout
+        self.max_body = max_body
+        self.stream_metrics = StreamMetrics(window)
+        self.latencies: deque = deque(maxlen=window)
+        self.counters = {'accepted': 0, 'rejected': 0, 'completed': 0, 'cancelled': 0, 'timeouts': 0, 'errors': 0}
+        self.in_flight = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: set = set()
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> tuple:
+        head = await reader.readuntil(b'\r\n\r\n')
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = request_line.split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, '请求行格式错误')
+        headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(400, 'Content-Length 不是整数')
+        if length < 0:
+            raise HTTPError(400, 'Content-Length 不能为负数')
+        if length > self.max_body:
+            raise HTTPError(413, f'请求体超过 {self.max_body} 字节')
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], body
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(_response_head(status, 'application/json; charset=utf-8', len(body), headers) + body)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(self._read_request(reader), 30)
+                await self._route(method, path, body, reader, writer)
+            except HTTPError as e:
+                await self._send_json(writer, e.status, {'error': str(e)}, e.headers)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                ConnectionError, _ClientGone):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes, reader, writer):
+        if path == '/health':
+            return await self._send_json(writer, 200, {'status': 'ok'})
+        if path == '/stats':
+            return await self._send_json(writer, 200, self.stats())
+
+        parts = path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'threads' or parts[2] not in ('invoke', 'stream'):
+            raise HTTPError(404, f'未知路径 {path}')
+        if method != 'POST':
+            raise HTTPError(405, '只支持 POST')
+        thread_id = unquote(parts[1])
+        try:
+            message = json.loads(body or b'{}')['message']
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, '请求体应为 {"message": "..."}')
+        if not thread_id or not isinstance(message, (str, dict)):
+            raise HTTPError(400, 'thread_id 或 message 无效')
+
+        # 背压：超出工作池 + 队列容量就拒绝，而不是无限排队
+        if self.in_flight >= self.capacity:
+            self.counters['rejected'] += 1
+            raise HTTPError(503, '服务繁忙，请稍后重试', {'Retry-After': '1'})
+        self.in_flight += 1
+        self.counters['accepted'] += 1
+        try:
+            if parts[2] == 'invoke':
+                work = self._invoke(thread_id, message, writer)
+            else:
+                work = self._stream(thread_id, message, writer)
+            await self._until_disconnect(work, reader)
+        finally:
+            self.in_flight -= 1
+
+    async def _until_disconnect(self, work, reader: asyncio.StreamReader):
+        """执行 work，期间监听连接；客户端断开则取消 work"""
+        task = asyncio.create_task(work)
+        watcher = asyncio.create_task(self._wait_closed(reader))
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # 服务关闭
+            task.cancel()
+            raise
+        finally:
+            watcher.cancel()
+        if not task.done():
+            task.cancel()
+            self.counters['cancelled'] += 1
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            raise _ClientGone()
+        try:
+            task.result()
+        except (_ClientGone, ConnectionError):
+            self.counters['cancelled'] += 1
+            raise _ClientGone()
+
+    @staticmethod
+    async def _wait_closed(reader: asyncio.StreamReader):
+        # 请求体已读完，之后读到 EOF（或连接被重置）说明客户端关闭了连接
+        try:
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+
+    # ------------------------------------------------------------------ 处理
+
+    async def _invoke(self, thread_id: str, message, writer):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.driver.send(thread_id, message), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise HTTPError(504, f'处理超时（超过 {self.request_timeout:g} 秒）')
+        except Exception as e:
+            self.counters['errors'] += 1
+            raise HTTPError(500, f'{type(e).__name__}: {e}')
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+        self.counters['completed'] += 1
+        reply = result['messages'][-1]
+        await self._send_json(writer, 200, {
+            'thread_id': thread_id,
+            'reply': getattr(reply, 'text', None) or str(reply.content),
+            'latency': round(latency, 4),
+        })
+
+    async def _stream(self, thread_id: str, message, writer: asyncio.StreamWriter):
+        writer.write(_response_head(200, 'text/event-stream; charset=utf-8', headers={'Cache-Control': 'no-cache'}))
+        await writer.drain()
+
+        def on_token(text: str):
+            writer.write(_sse('token', {'text': text}))
+
+        def on_tool(name: str, content: str):
+            writer.write(_sse('tool', {'name': name, 'content': content}))
+
+        turn = TurnMetrics()
+
+        async def run():
+            async for chunk, metadata in self.driver.stream(thread_id, message):
+                turn.feed(chunk, metadata, on_token, on_tool)
+                await writer.drain()  # 客户端读得慢时在这里等待；已断开则抛 ConnectionError
+
+        try:
+            await asyncio.wait_for(run(), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            writer.write(_sse('error', {'error': f'处理超时（超过 {self.request_timeout:g} 秒）'}))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.counters['errors'] += 1
+            writer.write(_sse('error', {'error': f'{type(e).__name__}: {e}'}))
+        else:
+            turn.close()
+            self.stream_metrics.add(turn)
+            self.latencies.append(turn.end - turn.start)
+            self.counters['completed'] += 1
+            writer.write(_sse('done', {'reply': turn.text, 'metrics': turn.as_dict()}))
+        await writer.drain()
+
+    # ------------------------------------------------------------------ 启停
+
+    def _on_connection(self, reader, writer):
+        task = asyncio.create_task(self._handle(reader, writer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> int:
+        """开始监听，返回实际端口（port=0 时由系统分配）"""
+        self._server = await asyncio.start_server(self._on_connection, host, port, limit=self.max_body)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self, grace: float = 10.0) -> None:
+        """停止接收新连接，等待进行中的请求最多 grace 秒，之后取消"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def run(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        """阻塞运行，Ctrl+C 停止"""
+
+        async def main():
+            port_ = await self.start(host, port)
+            print(f'Agent 服务已启动：http://{host}:{port_}')
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await self.close()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            print('\n已停止')
+
+    def stats(self) -> dict:
+        """请求计数、排队情况、耗时分位数与流式指标"""
+        return {
+            **self.counters,
+            'in_flight': self.in_flight,
+            'capacity': self.capacity,
+            'latency_p50': round(percentile(self.latencies, 0.5), 4),
+            'latency_p95': round(percentile(self.latencies, 0.95), 4),
+            'latency_p99': round(percentile(self.latencies, 0.99), 4),
+            'sessions': self.driver.stats(),
+            'stream': self.stream_metrics.stats(),
+        }
+
+
+class _ThreadedServer:
+    """serve_in_thread 的返回值：base_url、stats()、shutdown()"""
+
+    def __init__(self, server: AgentServer, loop: asyncio.AbstractEventLoop, thread: threading.Thread, port: int,
+                 host: str):
+        self.server = server
+        self.base_url = f'http://{host}:{port}'
+        self._loop = loop
+        self._thread = thread
+
+    def stats(self) -> dict:
+        return asyncio.run_coroutine_threadsafe(self._stats(), self._loop).result()
+
+    async def _stats(self) -> dict:
+        return self.server.stats()
+
+    def shutdown(self, grace: float = 5.0) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.close(grace), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def serve_in_thread(agent, host: str = '127.0.0.1', port: int = 0, **kwargs) -> _ThreadedServer:
+    """在后台线程（独立事件循环）里启动服务，参数同 AgentServer"""
+    server = AgentServer(agent, **kwargs)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    result = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        result['port'] = loop.run_until_complete(server.start(host, port))
+        started.set()
+        loop.run_forever()
+        loop.close()
+
+    thread = threading.Thread(target=run, name='agent-server', daemon=True)
+    thread.start()
+    started.wait()
+    return _ThreadedServer(server, loop, thread, result['port'], host)
@@ -0,0 +1,80 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+并发批量执行
+============
+
+create_agent 返回的图本身就是 Runnable，自带 batch / abatch：
+- max_concurrency 控制同时进行的请求数
+- return_exceptions=True 时单个输入出错不影响其它输入，异常对象放在对应位置
+- 返回结果与输入顺序一致
+
+N 个独立问题的总耗时约等于最慢的那一个（受 max_concurrency 限制）。
+"""
+
+from typing import Any, Optional, Sequence, Union
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def question_inputs(questions: Sequence[str], role: str = 'user') -> list:
+    """把问题列表转成 Agent 的输入：[{"messages": [{"role": "user", "content": 问题}]}, ...]"""
+    return [{'messages': [{'role': role, 'content': question}]} for question in questions]
+
+
+def _config_list(config: Union[dict, Sequence[dict], None], count: int, max_concurrency: int) -> list:
+    if config is None or isinstance(config, dict):
+        configs = [dict(config or {}) for _ in range(count)]
+    else:
+        if len(config) != count:
+            raise ValueError(f'config 数量({len(config)})与输入数量({count})不一致')
+        configs = [dict(c) for c in config]
+    for c in configs:
+        c['max_concurrency'] = max_concurrency
+    return configs
+
+
+def run_batch(
+        runnable,
+        inputs: Sequence[Any],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        config: Union[dict, Sequence[dict], None] = None,
+) -> list:
+    """
+    并发执行多个独立输入（线程池）
+
+    参数:
+        runnable: Agent 或任意 Runnable
+        inputs: 输入列表
+        max_concurrency: 最大并发数
+        config: 公共配置，或与 inputs 等长的配置列表（例如每个输入不同的 thread_id）
+
+    返回:
+        与 inputs 顺序一致的结果列表；出错的位置是异常对象
+    """
+    if not inputs:
+        return []
+    configs = _config_list(config, len(inputs), max_concurrency)
+    return runnable.batch(list(inputs), configs, return_exceptions=True)
+
+
+async def arun_batch(
+        runnable,
+        inputs: Sequence[Any],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        config: Union[dict, Sequence[dict], None] = None,
+) -> list:
+    """run_batch 的异步版本（asyncio，用 abatch）"""
+    if not inputs:
+        return []
+    configs = _config_list(config, len(inputs), max_concurrency)
+    return await runnable.abatch(list(inputs), configs, return_exceptions=True)
+
+
+def final_answer(result: Any) -> Optional[str]:
+    """取 Agent 结果中最后一条消息的内容；结果是异常时返回 None"""
+    if isinstance(result, BaseException):
+        return None
+    return result['messages'][-1].content
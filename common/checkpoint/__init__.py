@@ -0,0 +1,13 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+自定义 checkpointer（InMemorySaver 的替代品）
+"""
+
+from common.checkpoint.sqlite import SqliteSaver
+from common.checkpoint.delta import DeltaSqliteSaver
+from common.checkpoint.bounded import BoundedMemorySaver
+
+__all__ = ['SqliteSaver', 'DeltaSqliteSaver', 'BoundedMemorySaver']
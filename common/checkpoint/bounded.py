@@ -0,0 +1,379 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+有内存上限的 InMemorySaver
+==========================
+
+问题：InMemorySaver 里 thread_id 越来越多（'客服1号'、'客服2号'……），常驻内存只增不减。
+
+BoundedMemorySaver（InMemorySaver 的子类，用法完全相同）：
+1. 按会话统计占用字节数（序列化后的 checkpoint / blob / writes 大小）
+2. 超过 max_bytes 或 max_threads 时，把最久未访问的会话整体转出到磁盘（zlib 压缩后存 SQLite）
+3. 下次访问该会话时自动读回内存，对 Agent 透明
+4. stats() 提供常驻会话数、常驻字节数、已转出会话数等指标
+
+注意：
+- 磁盘部分只是内存的延伸，不是持久化；默认的临时文件每次创建实例都是新的。要持久化请用 SqliteSaver。
+  传入 spill_path 时不会清空其中已有的会话（视为已转出，访问时读回）
+- 当前正在使用的会话不会被转出：单个会话本身超过 max_bytes 时常驻字节会超出预算，
+  stats() 里的 over_budget_bytes / over_budget_events 反映这种情况，每个会话第一次超出时记一条 warning 日志
+- copy_thread、prune、delete_for_runs 同时处理常驻与已转出的会话，字节计数随之更新；
+  prune(strategy='keep_latest') 只保留每个命名空间最新的 checkpoint，图里用了 DeltaChannel 时不要用
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+
+def _typed_size(typed: Any) -> int:
+    return len(typed[1]) if typed and typed[1] else 0
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    参数:
+        max_bytes: 常驻内存的字节预算（按序列化大小估算），None 表示不限
+        max_threads: 常驻会话数上限，None 表示不限
+        spill_path: 转出文件路径，默认在临时目录新建（关闭时删除）；传入已有文件时保留其中的会话
+        serde: 序列化器
+    """
+
+    def __init__(
+            self,
+            *,
+            max_bytes: Optional[int] = 64 * 2 ** 20,
+            max_threads: Optional[int] = None,
+            spill_path: Optional[str] = None,
+            serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.max_bytes = max_bytes
+        self.max_threads = max_threads
+        self._lock = threading.RLock()
+        self._lru: OrderedDict = OrderedDict()  # thread_id -> 占用字节数
+        self._blob_keys: dict = {}
+        self._write_keys: dict = {}
+        self._spilled: set = set()
+        self.resident_bytes = 0
+        self.evictions = 0
+        self.reloads = 0
+        self.over_budget_events = 0
+        self._warned: set = set()  # 已经因单会话超预算告警过的会话
+
+        self._owns_file = spill_path is None
+        if spill_path is None:
+            fd, spill_path = tempfile.mkstemp(prefix='checkpoint-spill-', suffix='.sqlite')
+            os.close(fd)
+        self.spill_path = spill_path
+        self._db = sqlite3.connect(spill_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        if self._owns_file:
+            self._db.execute('DROP TABLE IF EXISTS spill')
+        self._db.execute('CREATE TABLE IF NOT EXISTS spill (thread_id TEXT PRIMARY KEY, data BLOB NOT NULL)')
+        self._db.commit()
+        self._spilled.update(row[0] for row in self._db.execute('SELECT thread_id FROM spill'))
+
+    # ------------------------------------------------------------------ 常驻管理
+
+    def _add_bytes(self, thread_id: str, size: int):
+        self._lru[thread_id] = self._lru.get(thread_id, 0) + size
+        self.resident_bytes += size
+
+    def _touch(self, thread_id: str):
+        """确保会话在内存中，并标记为最近使用；读回会话后超出预算的话转出别的会话"""
+        reloaded = thread_id in self._spilled
+        if reloaded:
+            self._reload(thread_id)
+        if thread_id in self._lru:
+            self._lru.move_to_end(thread_id)
+        if reloaded:
+            self._evict(keep=thread_id)
+
+    def _over_budget(self) -> bool:
+        if self.max_threads is not None and len(self._lru) > self.max_threads:
+            return True
+        return self.max_bytes is not None and self.resident_bytes > self.max_bytes
+
+    def _evict(self, keep: str):
+        """按 LRU 转出会话，直到回到预算以内（当前会话不转出）"""
+        while self._over_budget():
+            victim = next((t for t in self._lru if t != keep), None)
+            if victim is None:
+                # 只剩当前会话，它自己就超出了预算
+                self.over_budget_events += 1
+                if keep not in self._warned:
+                    self._warned.add(keep)
+                    logger.warning('会话 %s 单独占用 %d 字节，超出 max_bytes=%s', keep, self.resident_bytes, self.max_bytes)
+                break
+            self._spill(victim)
+
+    def _extract(self, thread_id: str) -> tuple:
+        """把一个常驻会话的 (storage, writes, blobs) 从内存里取出来，并扣除占用"""
+        storage = {ns: dict(checkpoints) for ns, checkpoints in self.storage.pop(thread_id, {}).items()}
+        writes = {k: self.writes.pop(k) for k in self._write_keys.pop(thread_id, ()) if k in self.writes}
+        blobs = {k: self.blobs.pop(k) for k in self._blob_keys.pop(thread_id, ()) if k in self.blobs}
+        self.resident_bytes -= self._lru.pop(thread_id, 0)
+        return storage, writes, blobs
+
+    def _spill(self, thread_id: str):
+        self._write_spilled(thread_id, self._extract(thread_id))
+        self._spilled.add(thread_id)
+        self.evictions += 1
+
+    def _write_spilled(self, thread_id: str, data: tuple):
+        blob = zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        self._db.execute('INSERT OR REPLACE INTO spill VALUES (?, ?)', (thread_id, blob))
+        self._db.commit()
+
+    def _read_spilled(self, thread_id: str) -> Optional[tuple]:
+        row = self._db.execute('SELECT data FROM spill WHERE thread_id = ?', (thread_id,)).fetchone()
+        return None if row is None else pickle.loads(zlib.decompress(row[0]))
+
+    def _reload(self, thread_id: str):
+        data = self._read_spilled(thread_id)
+        self._spilled.discard(thread_id)
+        if data is None:
+            return
+        self._db.execute('DELETE FROM spill WHERE thread_id = ?', (thread_id,))
+        self._db.commit()
+        self._load_thread(thread_id, *data)
+        self.reloads += 1
+
+    def _load_thread(self, thread_id: str, storage: dict, writes: dict, blobs: dict):
+        """把一个会话的 checkpoint / writes / blobs 放进内存并计入占用"""
+        size = 0
+        for ns, checkpoints in storage.items():
+            self.storage[thread_id][ns].update(checkpoints)
+            size += sum(_typed_size(c) + _typed_size(m) for c, m, _ in checkpoints.values())
+        self.writes.update(writes)
+        self.blobs.update(blobs)
+        self._write_keys.setdefault(thread_id, set()).update(writes)
+        self._blob_keys.setdefault(thread_id, set()).update(blobs)
+        size += sum(_typed_size(v[2]) for outer in writes.values() for v in outer.values())
+        size += sum(_typed_size(v) for v in blobs.values())
+        self._add_bytes(thread_id, size)
+
+    # ------------------------------------------------------------------ BaseCheckpointSaver 接口
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            self._touch(config['configurable']['thread_id'])
+            return super().get_tuple(config)
+
+    def list(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[dict] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        # 不指定 thread_id 时只列出常驻内存的会话
+        with self._lock:
+            if config:
+                self._touch(config['configurable']['thread_id'])
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    def get_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        with self._lock:
+            self._touch(config['configurable']['thread_id'])
+            return super().get_delta_channel_history(config=config, channels=channels)
+
+    def put(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        with self._lock:
+            self._touch(thread_id)
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            keys = self._blob_keys.setdefault(thread_id, set())
+            size = 0
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                keys.add(key)
+                size += _typed_size(self.blobs.get(key))
+            ckpt, meta, _ = self.storage[thread_id][checkpoint_ns][checkpoint['id']]
+            self._add_bytes(thread_id, size + _typed_size(ckpt) + _typed_size(meta))
+            self._evict(keep=thread_id)
+            return saved
+
+    def put_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple],
+            task_id: str,
+            task_path: str = '',
+    ) -> None:
+        thread_id = config['configurable']['thread_id']
+        outer_key = (thread_id, config['configurable'].get('checkpoint_ns', ''), config['configurable']['checkpoint_id'])
+        with self._lock:
+            self._touch(thread_id)
+            before = sum(_typed_size(v[2]) for v in self.writes.get(outer_key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            after = sum(_typed_size(v[2]) for v in self.writes.get(outer_key, {}).values())
+            self._write_keys.setdefault(thread_id, set()).add(outer_key)
+            self._add_bytes(thread_id, after - before)
+            self._evict(keep=thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.storage.pop(thread_id, None)
+            for key in self._write_keys.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self._blob_keys.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+            self.resident_bytes -= self._lru.pop(thread_id, 0)
+            if thread_id in self._spilled:
+                self._spilled.discard(thread_id)
+                self._db.execute('DELETE FROM spill WHERE thread_id = ?', (thread_id,))
+                self._db.commit()
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        """复制整个会话（源会话已转出时先读回），目标会话计入占用与 LRU"""
+        with self._lock:
+            self._touch(source_thread_id)
+            self._touch(target_thread_id)
+            storage = {ns: dict(checkpoints) for ns, checkpoints in self.storage.get(source_thread_id, {}).items()}
+            writes = {(target_thread_id, *key[1:]): dict(self.writes[key])
+                      for key in self._write_keys.get(source_thread_id, ()) if key in self.writes}
+            blobs = {(target_thread_id, *key[1:]): self.blobs[key]
+                     for key in self._blob_keys.get(source_thread_id, ()) if key in self.blobs}
+            self._load_thread(target_thread_id, storage, writes, blobs)
+            self._evict(keep=target_thread_id)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        self.copy_thread(source_thread_id, target_thread_id)
+
+    def _drop_checkpoints(self, storage: dict, writes: dict, blobs: dict, dropped: set) -> None:
+        """从一个会话的数据里删除 dropped 中的 (ns, checkpoint_id) 及其 writes，再删掉不再被引用的 blob"""
+        for ns, checkpoint_id in dropped:
+            storage[ns].pop(checkpoint_id, None)
+            if not storage[ns]:
+                del storage[ns]
+        for key in [k for k in writes if (k[1], k[2]) in dropped]:
+            del writes[key]
+        referenced = {
+            (ns, channel, version)
+            for ns, checkpoints in storage.items()
+            for ckpt, _, _ in checkpoints.values()
+            for channel, version in self.serde.loads_typed(ckpt)['channel_versions'].items()
+        }
+        for key in [k for k in blobs if k[1:] not in referenced]:
+            del blobs[key]
+
+    def _rewrite_thread(self, thread_id: str, select: Callable) -> None:
+        """
+        删除会话里 select(storage) 选出的 checkpoint，常驻与已转出的会话都支持：
+        常驻的取出后重新计入占用，转出的改写后存回；删空了就删除整个会话
+        """
+        if thread_id in self._spilled:
+            data = self._read_spilled(thread_id)
+            if data is None:
+                return
+            storage = data[0]
+        elif thread_id in self.storage:
+            data, storage = None, self.storage[thread_id]
+        else:
+            return
+        dropped = select(storage)
+        if not dropped:
+            return
+        if data is None:
+            data = self._extract(thread_id)
+        self._drop_checkpoints(*data, dropped)
+        if not data[0]:
+            self.delete_thread(thread_id)
+        elif thread_id in self._spilled:
+            self._write_spilled(thread_id, data)
+        else:
+            self._load_thread(thread_id, *data)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = 'keep_latest') -> None:
+        """
+        清理会话的历史 checkpoint（常驻与已转出的都处理）
+
+        参数:
+            thread_ids: 要清理的会话
+            strategy: "keep_latest" 每个命名空间只保留最新的 checkpoint；"delete" 删除整个会话
+        """
+        if strategy not in ('keep_latest', 'delete'):
+            raise ValueError(f'未知的 prune 策略: {strategy}')
+
+        def older(storage: dict) -> set:
+            dropped = set()
+            for ns, checkpoints in storage.items():
+                latest = max(checkpoints, default=None)
+                dropped.update((ns, checkpoint_id) for checkpoint_id in checkpoints if checkpoint_id != latest)
+            return dropped
+
+        with self._lock:
+            for thread_id in thread_ids:
+                if strategy == 'delete':
+                    self.delete_thread(thread_id)
+                else:
+                    self._rewrite_thread(thread_id, older)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = 'keep_latest') -> None:
+        self.prune(thread_ids, strategy=strategy)
+
+    def delete_for_runs(self, run_ids: Sequence[str]) -> None:
+        """删除这些 run 产生的 checkpoint 及其 writes（已转出的会话逐个读出、改写后再存回）"""
+        run_ids = set(run_ids)
+
+        def of_runs(storage: dict) -> set:
+            return {
+                (ns, checkpoint_id)
+                for ns, checkpoints in storage.items()
+                for checkpoint_id, (_, meta, _) in checkpoints.items()
+                if self.serde.loads_typed(meta).get('run_id') in run_ids
+            }
+
+        with self._lock:
+            for thread_id in [*self.storage, *self._spilled]:
+                self._rewrite_thread(thread_id, of_runs)
+
+    async def adelete_for_runs(self, run_ids: Sequence[str]) -> None:
+        self.delete_for_runs(run_ids)
+
+    def stats(self) -> dict:
+        """常驻会话数 / 常驻字节数 / 超出 max_bytes 的字节数与次数 / 已转出会话数 / 累计转出与读回次数"""
+        with self._lock:
+            over = self.resident_bytes - self.max_bytes if self.max_bytes is not None else 0
+            return {
+                'resident_threads': len(self._lru),
+                'resident_bytes': self.resident_bytes,
+                'over_budget_bytes': max(0, over),
+                'over_budget_events': self.over_budget_events,
+                'spilled_threads': len(self._spilled),
+                'evictions': self.evictions,
+                'reloads': self.reloads,
+            }
+
+    def close(self) -> None:
+        """关闭转出文件；默认的临时文件会被删除"""
+        self._db.close()
+        if self._owns_file:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.spill_path + suffix):
+                    os.remove(self.spill_path + suffix)
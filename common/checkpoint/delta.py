@@ -0,0 +1,149 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+增量（delta）编码的 checkpoint
+==============================
+
+问题：messages channel 每一步都存整份消息列表，一个会话 n 轮的总写入量是 O(n²)。
+
+做法（DeltaSqliteSaver，SqliteSaver 的子类）：
+1. messages 这类消息列表 channel，每一步只存一条 delta：
+   {"base": 上一版本号, "refs": [...], "new": [新消息]}
+   refs 按顺序描述完整列表：字符串 = 引用上一版本里同 id 的消息，整数 = new 里的下标
+   （被删除的消息自然不在 refs 里；内容被改写的消息当作新消息存）
+2. 每 snapshot_every 个 delta 存一次完整快照，限制还原时要回溯的链长
+3. 读取时才沿 base 链还原（只还原被请求的版本），还原结果放进一个小 LRU，
+   连续几轮对话基本只需要在上一版本基础上应用一条 delta
+4. 写入时用内存里的"链头"（上一版本的消息）计算 delta；进程重启后链头为空，第一步写快照
+
+注意：blobs 表中 delta 记录的 type 以 "delta:" 开头，只能用本类读取。
+"""
+
+from collections import OrderedDict
+from typing import Any, Sequence
+
+from common.checkpoint.sqlite import SqliteSaver
+
+DELTA_PREFIX = 'delta:'
+
+
+class _Head:
+    __slots__ = ('version', 'by_id', 'depth')
+
+    def __init__(self, version: str, messages: Sequence, depth: int):
+        self.version = version
+        self.by_id = {m.id: m for m in messages if getattr(m, 'id', None) is not None}
+        self.depth = depth
+
+
+class DeltaSqliteSaver(SqliteSaver):
+    """
+    参数:
+        path: 数据库文件路径
+        delta_channels: 使用增量编码的 channel
+        snapshot_every: 每多少个 delta 写一次完整快照
+        cache_size: 链头与还原结果 LRU 的容量（按 channel 版本计）
+        commit_every、serde: 同 SqliteSaver
+    """
+
+    def __init__(
+            self,
+            path: str = 'checkpoints.sqlite',
+            *,
+            delta_channels: Sequence[str] = ('messages',),
+            snapshot_every: int = 20,
+            cache_size: int = 1024,
+            commit_every: int = 1,
+            serde=None,
+    ):
+        super().__init__(path, commit_every=commit_every, serde=serde)
+        self.delta_channels = frozenset(delta_channels)
+        self.snapshot_every = snapshot_every
+        self.cache_size = cache_size
+        self._heads: OrderedDict = OrderedDict()
+        self._decoded: OrderedDict = OrderedDict()
+        self.counters = {'snapshots': 0, 'deltas': 0, 'snapshot_bytes': 0, 'delta_bytes': 0}
+
+    @staticmethod
+    def _is_message_list(value: Any) -> bool:
+        return isinstance(value, list) and all(hasattr(m, 'id') and hasattr(m, 'content') for m in value)
+
+    def _remember(self, cache: OrderedDict, key: tuple, value: Any):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _dump_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, value: Any) -> tuple:
+        if channel not in self.delta_channels or not self._is_message_list(value):
+            return super()._dump_blob(thread_id, checkpoint_ns, channel, version, value)
+
+        key = (thread_id, checkpoint_ns, channel)
+        head = self._heads.get(key)
+        if head is None or head.depth >= self.snapshot_every:
+            typed = super()._dump_blob(thread_id, checkpoint_ns, channel, version, value)
+            self._remember(self._heads, key, _Head(version, value, 0))
+            self.counters['snapshots'] += 1
+            self.counters['snapshot_bytes'] += len(typed[1])
+            return typed
+
+        refs, new = [], []
+        for message in value:
+            old = head.by_id.get(message.id) if message.id is not None else None
+            if old is not None and (old is message or old == message):
+                refs.append(message.id)
+            else:
+                refs.append(len(new))
+                new.append(message)
+        type_, blob = self.serde.dumps_typed({'base': head.version, 'refs': refs, 'new': new})
+        self._remember(self._heads, key, _Head(version, value, head.depth + 1))
+        self._remember(self._decoded, (thread_id, checkpoint_ns, channel, version), list(value))
+        self.counters['deltas'] += 1
+        self.counters['delta_bytes'] += len(blob)
+        return DELTA_PREFIX + type_, blob
+
+    def _load_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, typed: tuple) -> Any:
+        type_, blob = typed
+        if not type_.startswith(DELTA_PREFIX):
+            return super()._load_blob(thread_id, checkpoint_ns, channel, version, typed)
+
+        cache_key = (thread_id, checkpoint_ns, channel, version)
+        cached = self._decoded.get(cache_key)
+        if cached is not None:
+            self._decoded.move_to_end(cache_key)
+            return list(cached)
+
+        payload = self.serde.loads_typed((type_[len(DELTA_PREFIX):], blob))
+        base = self._load_version(thread_id, checkpoint_ns, channel, payload['base'])
+        by_id = {m.id: m for m in base if getattr(m, 'id', None) is not None}
+        new = payload['new']
+        value = [new[ref] if isinstance(ref, int) else by_id[ref] for ref in payload['refs']]
+        self._remember(self._decoded, cache_key, value)
+        return list(value)
+
+    def _load_version(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> list:
+        """按版本号读取某个 channel 的完整值（沿 delta 链回溯）"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?',
+                (thread_id, checkpoint_ns, channel, version),
+            ).fetchone()
+        if row is None:
+            # delta 的基础版本不在库里（被外部删除或库文件不完整），无法还原，不能当成空列表悄悄返回
+            raise ValueError(f'找不到 delta 的基础版本：thread={thread_id!r} ns={checkpoint_ns!r} '
+                             f'channel={channel!r} version={version!r}')
+        if row[0] == 'empty':
+            return []
+        return self._load_blob(thread_id, checkpoint_ns, channel, version, row)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for cache in (self._heads, self._decoded):
+            for key in [k for k in cache if k[0] == thread_id]:
+                del cache[key]
+
+    def stats(self) -> dict:
+        """snapshots / deltas 条数与字节数，用于对比写入量"""
+        return dict(self.counters)
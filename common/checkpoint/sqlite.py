@@ -0,0 +1,372 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+SQLite 持久化 checkpointer
+==========================
+
+InMemorySaver 的直接替代品：接口相同（BaseCheckpointSaver），数据写在本地 SQLite 文件里，
+进程重启后会话仍在，内存也不会随会话数无限增长。
+
+存储结构与 InMemorySaver 一致，分三张表：
+1. checkpoints：每一步的 checkpoint（不含 channel_values）+ metadata + 父 checkpoint
+2. blobs：各 channel 的值，按 (channel, version) 存，只有本步变化的 channel 才写
+3. writes：pending writes（节点中途写入的值）
+
+性能相关：
+- WAL 模式 + synchronous=NORMAL：读写互不阻塞，提交时不必每次 fsync
+- 分组提交：put_writes 只写不提交，put（一个 super-step 结束）时才提交；
+  commit_every > 1 时每 N 步提交一次（进程崩溃最多丢 N-1 步）
+- 三张表的主键都以 thread_id 开头，按会话查询、删除都走主键索引
+- 异步接口（aget_tuple / aput 等）在线程池里执行，磁盘 IO 不会阻塞事件循环（连接由锁保护，可跨线程使用）
+
+用法：
+    with SqliteSaver('checkpoints.sqlite') as memory:
+        agent = create_agent(model=model, checkpointer=memory)
+"""
+
+import asyncio
+import random
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteSaver(BaseCheckpointSaver[str]):
+    """
+    参数:
+        path: 数据库文件路径，":memory:" 表示内存库（测试用）
+        commit_every: 每多少个 put（agent 步）提交一次事务
+        serde: 序列化器，默认与 InMemorySaver 相同
+    """
+
+    def __init__(self, path: str = 'checkpoints.sqlite', *, commit_every: int = 1, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self._pending_steps = 0
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    # ------------------------------------------------------------------ 生命周期
+
+    def flush(self) -> None:
+        """提交尚未提交的步骤"""
+        with self._lock:
+            self.conn.commit()
+            self._pending_steps = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self.conn.close()
+
+    def __enter__(self) -> 'SqliteSaver':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def __aenter__(self) -> 'SqliteSaver':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------ blob 编解码（子类可覆盖）
+
+    def _dump_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, value: Any) -> tuple:
+        return self.serde.dumps_typed(value)
+
+    def _load_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, typed: tuple) -> Any:
+        return self.serde.loads_typed(typed)
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict:
+        if not versions:
+            return {}
+        items = list(versions.items())
+        where = ' OR '.join(['(channel = ? AND version = ?)'] * len(items))
+        params = [thread_id, checkpoint_ns]
+        for channel, version in items:
+            params += [channel, str(version)]
+        rows = self.conn.execute(
+            f'SELECT channel, version, type, blob FROM blobs '
+            f'WHERE thread_id = ? AND checkpoint_ns = ? AND ({where})',
+            params,
+        ).fetchall()
+        result = {}
+        for channel, version, type_, blob in rows:
+            if type_ == 'empty':
+                continue
+            result[channel] = self._load_blob(thread_id, checkpoint_ns, channel, version, (type_, blob))
+        return result
+
+    # ------------------------------------------------------------------ 读
+
+    def _make_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_b, metadata_type, metadata_b = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        writes = self.conn.execute(
+            'SELECT task_id, channel, type, value FROM writes '
+            'WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? '
+            'ORDER BY task_path, task_id, idx',
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={'configurable': {
+                'thread_id': thread_id,
+                'checkpoint_ns': checkpoint_ns,
+                'checkpoint_id': checkpoint_id,
+            }},
+            checkpoint={
+                **checkpoint,
+                'channel_values': self._load_blobs(thread_id, checkpoint_ns, checkpoint['channel_versions']),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_b)),
+            parent_config=(
+                {'configurable': {
+                    'thread_id': thread_id,
+                    'checkpoint_ns': checkpoint_ns,
+                    'checkpoint_id': parent_checkpoint_id,
+                }}
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        columns = 'checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata'
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f'SELECT {columns} FROM checkpoints '
+                    'WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?',
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f'SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? '
+                    'ORDER BY checkpoint_id DESC LIMIT 1',
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._make_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[dict] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append('thread_id = ?')
+            params.append(config['configurable']['thread_id'])
+            if config['configurable'].get('checkpoint_ns') is not None:
+                where.append('checkpoint_ns = ?')
+                params.append(config['configurable']['checkpoint_ns'])
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append('checkpoint_id = ?')
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append('checkpoint_id < ?')
+            params.append(before_id)
+        sql = ('SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, '
+               'metadata_type, metadata FROM checkpoints')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC'
+
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            # 只在读库时持锁，yield 之前释放：消费方慢慢迭代或中途放弃都不会挡住其它线程的 put / get_tuple
+            with self._lock:
+                item = self._make_tuple(thread_id, checkpoint_ns, tuple(row))
+            yield item
+
+    # ------------------------------------------------------------------ 写
+
+    def put(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        c = checkpoint.copy()
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        values: dict = c.pop('channel_values')
+        type_, checkpoint_b = self.serde.dumps_typed(c)
+        metadata_type, metadata_b = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            blob_rows = []
+            for channel, version in new_versions.items():
+                if channel in values:
+                    blob_type, blob = self._dump_blob(thread_id, checkpoint_ns, channel, str(version), values[channel])
+                else:
+                    blob_type, blob = 'empty', None
+                blob_rows.append((thread_id, checkpoint_ns, channel, str(version), blob_type, blob))
+            self.conn.executemany('INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)', blob_rows)
+            self.conn.execute(
+                'INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (thread_id, checkpoint_ns, checkpoint['id'], config['configurable'].get('checkpoint_id'),
+                 type_, checkpoint_b, metadata_type, metadata_b),
+            )
+            # 一个 put 对应 agent 的一步：本步的 writes 与 checkpoint 一起提交
+            self._pending_steps += 1
+            if self._pending_steps >= self.commit_every:
+                self.conn.commit()
+                self._pending_steps = 0
+        return {'configurable': {
+            'thread_id': thread_id,
+            'checkpoint_ns': checkpoint_ns,
+            'checkpoint_id': checkpoint['id'],
+        }}
+
+    def put_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple],
+            task_id: str,
+            task_path: str = '',
+    ) -> None:
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        checkpoint_id = config['configurable']['checkpoint_id']
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, blob, task_path))
+        # 特殊 channel（错误、中断等，idx < 0）可以覆盖，普通写入已存在时保留第一次
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [r for r in rows if r[4] < 0]
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [r for r in rows if r[4] >= 0]
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for table in ('checkpoints', 'blobs', 'writes'):
+                self.conn.execute(f'DELETE FROM {table} WHERE thread_id = ?', (thread_id,))
+            self.conn.commit()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # 与 InMemorySaver 相同的版本格式：单调递增整数 + 随机小数，字符串可直接比较大小
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split('.')[0])
+        return f'{current_v + 1:032}.{random.random():016}'
+
+    # ------------------------------------------------------------------ 异步接口（同步实现放到线程池里执行，不阻塞事件循环）
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+            self,
+            config: Optional[RunnableConfig],
+            *,
+            filter: Optional[dict] = None,
+            before: Optional[RunnableConfig] = None,
+            limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        iterator = self.list(config, filter=filter, before=before, limit=limit)
+        done = object()
+        while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+            yield item
+
+    async def aput(
+            self,
+            config: RunnableConfig,
+            checkpoint: Checkpoint,
+            metadata: CheckpointMetadata,
+            new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+            self,
+            config: RunnableConfig,
+            writes: Sequence[tuple],
+            task_id: str,
+            task_path: str = '',
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,142 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+对话缓冲区：固定的系统消息 + 有上限的最近对话窗口
+================================================
+
+问题：
+1. keep_recent_history 每次调用都把整段对话过滤两遍、重新拼接
+2. 多轮对话直接往 list 里 append，历史无限增长，每轮请求越来越大
+
+ConversationBuffer：
+1. 系统消息单独固定（pinned），永远在最前面，不会被挤出窗口
+2. 其余消息放在 deque 里，按"轮"（一条用户消息 + 其后的回复 / 工具消息）淘汰最旧的内容，
+   上限可以是轮数 max_pairs，也可以是 token 预算 max_tokens（两者可同时设置）
+3. append / 淘汰都是 O(1)（均摊），token 数在追加时算一次并维护累计值
+4. messages() 直接给出可传给 model.invoke 的消息列表（长度受窗口上限约束，与总历史长度无关）
+
+消息既可以是字典 {"role": ..., "content": ...}，也可以是 SystemMessage / HumanMessage 等消息对象。
+
+用法：
+    conversation = ConversationBuffer({"role": "system", "content": "你是一个友好的助手"}, max_pairs=10)
+    conversation.add_user("我叫李明")
+    response = model.invoke(conversation.messages())
+    conversation.add_assistant(response.content)
+"""
+
+from collections import deque
+from typing import Any, Iterable, Optional
+
+from common.token_counter import MESSAGE_OVERHEAD, estimate_tokens
+
+_USER_ROLES = ('user', 'human')
+
+
+def _role(message: Any) -> str:
+    if isinstance(message, dict):
+        return message.get('role', '')
+    return getattr(message, 'type', '')
+
+
+def _text(message: Any) -> str:
+    content = message.get('content') if isinstance(message, dict) else message.content
+    if isinstance(content, str):
+        return content
+    return ''.join(
+        block if isinstance(block, str) else str(block.get('text', ''))
+        for block in content or ()
+    )
+
+
+def count_tokens(message: Any) -> int:
+    """单条消息的 token 估算（内容 + 消息固定开销）"""
+    return estimate_tokens(_text(message)) + MESSAGE_OVERHEAD
+
+
+class ConversationBuffer:
+    """
+    参数:
+        *system: 固定在最前面的系统消息（字典或 SystemMessage）
+        max_pairs: 最多保留多少轮对话，None 表示不限
+        max_tokens: 窗口（不含系统消息）的 token 预算，None 表示不限；最近一轮总会保留
+        token_counter: 单条消息的 token 计数函数，默认 count_tokens
+    """
+
+    def __init__(
+            self,
+            *system: Any,
+            max_pairs: Optional[int] = None,
+            max_tokens: Optional[int] = None,
+            token_counter=count_tokens,
+    ):
+        self.pinned: list = list(system)
+        self.max_pairs = max_pairs
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+        self._window: deque = deque()  # (消息, token 数)
+        self._turns = 0
+        self.tokens = 0
+        self.evicted = 0
+
+    def append(self, message: Any) -> None:
+        """追加一条消息；系统消息会被固定，其余消息进入窗口并按上限淘汰旧的轮次"""
+        role = _role(message)
+        if role == 'system':
+            self.pinned.append(message)
+            return
+        if role in _USER_ROLES:
+            self._turns += 1
+        tokens = self.token_counter(message)
+        self._window.append((message, tokens))
+        self.tokens += tokens
+        self._evict()
+
+    def extend(self, messages: Iterable) -> None:
+        for message in messages:
+            self.append(message)
+
+    def add_user(self, content: str) -> None:
+        self.append({'role': 'user', 'content': content})
+
+    def add_assistant(self, content: str) -> None:
+        self.append({'role': 'assistant', 'content': content})
+
+    def _pop_turn(self) -> None:
+        """淘汰最旧的一轮：弹出队首消息，再弹到下一条用户消息为止"""
+        message, tokens = self._window.popleft()
+        self.tokens -= tokens
+        self.evicted += 1
+        if _role(message) in _USER_ROLES:
+            self._turns -= 1
+        while self._window and _role(self._window[0][0]) not in _USER_ROLES:
+            _, tokens = self._window.popleft()
+            self.tokens -= tokens
+            self.evicted += 1
+
+    def _evict(self) -> None:
+        while self.max_pairs is not None and self._turns > self.max_pairs:
+            self._pop_turn()
+        while self.max_tokens is not None and self.tokens > self.max_tokens and self._turns > 1:
+            self._pop_turn()
+
+    def messages(self) -> list:
+        """系统消息 + 窗口内的消息，可直接传给 model.invoke"""
+        return self.pinned + [message for message, _ in self._window]
+
+    def clear(self) -> None:
+        """清空对话窗口（保留系统消息）"""
+        self._window.clear()
+        self._turns = 0
+        self.tokens = 0
+
+    @property
+    def turns(self) -> int:
+        return self._turns
+
+    def __len__(self) -> int:
+        return len(self.pinned) + len(self._window)
+
+    def __iter__(self):
+        return iter(self.messages())
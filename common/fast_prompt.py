@@ -0,0 +1,261 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+预编译的提示词模板（格式化快速路径）
+==================================
+
+问题：PromptTemplate.from_template / ChatPromptTemplate.from_messages / partial 每次构建都要解析、校验一遍，
+format_messages 每次调用都要走一遍通用的 Runnable / pydantic 流程（一次几十微秒）。
+
+做法：
+1. compile_template：用 string.Formatter().parse 把 f-string 模板解析成"字面量 + 变量槽位"，
+   再编译成一个等价的 f-string 函数（lambda v: f"...{v['role']}..."），结果按模板字符串缓存，
+   同一个模板只解析一次
+2. FastPromptTemplate / FastChatPromptTemplate：接口与 LangChain 对应类相近
+   （from_template、from_messages、partial、format、format_messages、invoke），
+   支持 MessagesPlaceholder 与 ("placeholder", "{history}")
+3. format_dicts 直接输出 {"role": ..., "content": ...} 字典列表，连消息对象都不用创建，最快
+
+只支持 f-string 语法（LangChain 默认的 template_format）；变量名里带 . 或 [] 的模板请用原生类。
+
+用法：
+    template = FastChatPromptTemplate.from_messages([
+        ("system", "你是一个{role}，擅长{expertise}。"),
+        ("user", "请给我{task}"),
+    ])
+    messages = template.format_messages(role="AI教授", expertise="大模型开发", task="解释什么是机器学习")
+    chain = template | model
+"""
+
+import ast
+import string
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, convert_to_messages
+from langchain_core.prompt_values import ChatPromptValue, StringPromptValue
+from langchain_core.runnables import Runnable
+
+_ROLES = {
+    'system': ('system', SystemMessage),
+    'user': ('user', HumanMessage),
+    'human': ('user', HumanMessage),
+    'assistant': ('assistant', AIMessage),
+    'ai': ('assistant', AIMessage),
+}
+_DICT_ROLES = {'system': 'system', 'human': 'user', 'ai': 'assistant', 'tool': 'tool'}
+
+
+class CompiledTemplate:
+    """解析后的模板：变量名（按出现顺序去重）+ 编译好的格式化函数"""
+
+    __slots__ = ('template', 'variables', 'render')
+
+    def __init__(self, template: str, variables: tuple, render: Callable[[dict], str]):
+        self.template = template
+        self.variables = variables
+        self.render = render
+
+
+@lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    """把 f-string 模板编译成 CompiledTemplate（按模板字符串缓存）"""
+    parts, variables = [], []
+    for literal, name, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            parts.append(ast.Constant(literal))
+        if name is None:
+            continue
+        if not name.isidentifier():
+            raise ValueError(f'不支持的模板变量 {{{name}}}：只支持普通变量名')
+        if spec and ('{' in spec or '}' in spec):
+            raise ValueError(f'不支持嵌套的格式说明 {{{name}:{spec}}}')
+        if name not in variables:
+            variables.append(name)
+        parts.append(ast.FormattedValue(
+            value=ast.Subscript(ast.Name('v', ast.Load()), ast.Constant(name), ast.Load()),
+            conversion=ord(conversion) if conversion else -1,
+            format_spec=ast.JoinedStr([ast.Constant(spec)]) if spec else None,
+        ))
+    body = ast.JoinedStr(parts) if parts else ast.Constant('')
+    args = ast.arguments(posonlyargs=[], args=[ast.arg('v')], kwonlyargs=[], kw_defaults=[], defaults=[])
+    tree = ast.fix_missing_locations(ast.Expression(ast.Lambda(args, body)))
+    render = eval(compile(tree, '<prompt template>', 'eval'))
+    return CompiledTemplate(template, tuple(variables), render)
+
+
+def _check(values: dict, required) -> None:
+    missing = [name for name in required if name not in values]
+    if missing:
+        raise KeyError(f'模板缺少变量: {missing}')
+
+
+class FastPromptTemplate(Runnable):
+    """
+    PromptTemplate 的快速版本
+
+    参数:
+        template: f-string 模板
+        partial_variables: 预先填好的变量（值可以是无参函数，格式化时再调用）
+    """
+
+    def __init__(self, template: str, partial_variables: Optional[dict] = None):
+        self.compiled = compile_template(template)
+        self.partial_variables = dict(partial_variables or {})
+        self.input_variables = [v for v in self.compiled.variables if v not in self.partial_variables]
+
+    @classmethod
+    def from_template(cls, template: str, **kwargs: Any) -> 'FastPromptTemplate':
+        return cls(template, **kwargs)
+
+    @property
+    def template(self) -> str:
+        return self.compiled.template
+
+    def partial(self, **kwargs: Any) -> 'FastPromptTemplate':
+        return type(self)(self.template, {**self.partial_variables, **kwargs})
+
+    def _values(self, kwargs: dict) -> dict:
+        if self.partial_variables:
+            partials = {k: v() if callable(v) else v for k, v in self.partial_variables.items()}
+            kwargs = {**partials, **kwargs}
+        _check(kwargs, self.input_variables)
+        return kwargs
+
+    def format(self, **kwargs: Any) -> str:
+        return self.compiled.render(self._values(kwargs))
+
+    def _prompt_value(self, input: dict) -> StringPromptValue:
+        return StringPromptValue(text=self.format(**input))
+
+    def invoke(self, input: dict, config=None, **kwargs: Any) -> StringPromptValue:
+        if config is None:  # 直接调用：没有回调 / 追踪配置，走快速路径
+            return self._prompt_value(input)
+        return self._call_with_config(self._prompt_value, input, config, run_type='prompt')
+
+    def __repr__(self) -> str:
+        return f'FastPromptTemplate(input_variables={self.input_variables}, template={self.template!r})'
+
+
+class _Placeholder:
+    __slots__ = ('name', 'optional')
+
+    def __init__(self, name: str, optional: bool):
+        self.name = name
+        self.optional = optional
+
+
+def _to_dict(message: Any) -> dict:
+    """消息对象、("user", "...") 元组或字符串 -> 字典；工具调用与工具结果的关联字段一并带上"""
+    if isinstance(message, dict):
+        return message
+    if not isinstance(message, BaseMessage):
+        message = convert_to_messages([message])[0]
+    result = {'role': _DICT_ROLES.get(message.type, message.type), 'content': message.content}
+    tool_calls = getattr(message, 'tool_calls', None)
+    if tool_calls:
+        result['tool_calls'] = [dict(call) for call in tool_calls]
+    tool_call_id = getattr(message, 'tool_call_id', None)
+    if tool_call_id is not None:
+        result['tool_call_id'] = tool_call_id
+    return result
+
+
+class FastChatPromptTemplate(Runnable):
+    """
+    ChatPromptTemplate 的快速版本
+
+    from_messages 接受：
+        ("system" / "user" / "human" / "assistant" / "ai", 模板字符串)
+        ("placeholder", "{变量名}")、MessagesPlaceholder
+        SystemMessagePromptTemplate / HumanMessagePromptTemplate / AIMessagePromptTemplate
+        现成的消息对象（原样保留）
+    """
+
+    def __init__(self, slots: list, partial_variables: Optional[dict] = None):
+        self.slots = slots
+        self.partial_variables = dict(partial_variables or {})
+        variables = []
+        for slot in slots:
+            names = slot[1].variables if slot[0] == 'template' else (
+                [slot[1].name] if slot[0] == 'placeholder' and not slot[1].optional else [])
+            variables.extend(v for v in names if v not in variables)
+        self.input_variables = [v for v in variables if v not in self.partial_variables]
+
+    @classmethod
+    def from_messages(cls, messages: list) -> 'FastChatPromptTemplate':
+        slots = []
+        for message in messages:
+            if isinstance(message, tuple):
+                role, template = message
+                if role == 'placeholder':
+                    name = template.strip()
+                    if not (name.startswith('{') and name.endswith('}')):
+                        raise ValueError(f'placeholder 应写成 "{{变量名}}"，收到 {template!r}')
+                    slots.append(('placeholder', _Placeholder(name[1:-1], True)))
+                elif role in _ROLES:
+                    slots.append(('template', compile_template(template), role))
+                else:
+                    raise ValueError(f'不支持的消息角色: {role}')
+            elif hasattr(message, 'variable_name'):  # MessagesPlaceholder
+                slots.append(('placeholder', _Placeholder(message.variable_name, message.optional)))
+            elif hasattr(message, 'prompt') and hasattr(message.prompt, 'template'):  # XxxMessagePromptTemplate
+                role = {'SystemMessagePromptTemplate': 'system', 'HumanMessagePromptTemplate': 'user',
+                        'AIMessagePromptTemplate': 'assistant'}[type(message).__name__]
+                slots.append(('template', compile_template(message.prompt.template), role))
+            else:
+                slots.append(('message', convert_to_messages([message])[0]))
+        return cls(slots)
+
+    def partial(self, **kwargs: Any) -> 'FastChatPromptTemplate':
+        return type(self)(self.slots, {**self.partial_variables, **kwargs})
+
+    def _values(self, kwargs: dict) -> dict:
+        if self.partial_variables:
+            partials = {k: v() if callable(v) else v for k, v in self.partial_variables.items()}
+            kwargs = {**partials, **kwargs}
+        _check(kwargs, self.input_variables)
+        return kwargs
+
+    def format_dicts(self, **kwargs: Any) -> list:
+        """输出 {"role": ..., "content": ...} 字典列表（可以直接传给 model.invoke）"""
+        values = self._values(kwargs)
+        result = []
+        for slot in self.slots:
+            kind = slot[0]
+            if kind == 'template':
+                result.append({'role': _ROLES[slot[2]][0], 'content': slot[1].render(values)})
+            elif kind == 'placeholder':
+                result.extend(_to_dict(m) for m in values.get(slot[1].name) or ())
+            else:
+                result.append(_to_dict(slot[1]))
+        return result
+
+    def format_messages(self, **kwargs: Any) -> list:
+        """输出消息对象列表，与 ChatPromptTemplate.format_messages 一致"""
+        values = self._values(kwargs)
+        result = []
+        for slot in self.slots:
+            kind = slot[0]
+            if kind == 'template':
+                result.append(_ROLES[slot[2]][1](content=slot[1].render(values)))
+            elif kind == 'placeholder':
+                history = values.get(slot[1].name)
+                if history:
+                    result.extend(convert_to_messages(history))
+            else:
+                result.append(slot[1])
+        return result
+
+    def _prompt_value(self, input: dict) -> ChatPromptValue:
+        return ChatPromptValue(messages=self.format_messages(**input))
+
+    def invoke(self, input: dict, config=None, **kwargs: Any) -> ChatPromptValue:
+        if config is None:  # 直接调用：没有回调 / 追踪配置，走快速路径
+            return self._prompt_value(input)
+        return self._call_with_config(self._prompt_value, input, config, run_type='prompt')
+
+    def __repr__(self) -> str:
+        return f'FastChatPromptTemplate(input_variables={self.input_variables})'
@@ -0,0 +1,114 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+延迟加载（缩短脚本启动时间）
+==========================
+
+问题：脚本顶部 `from langchain.agents import create_agent`、`from langgraph.checkpoint.memory import InMemorySaver`
+并在导入时就 get_chat_model(...)：光是导入 langchain.agents 就要 ~1.4 秒，构建模型（导入 langchain_openai / openai）
+还要 ~2 秒。运行单个示例、--help、或者只是导入一下模块，都要先付这笔开销。
+
+做法：
+1. lazy_callable("langchain.agents", "create_agent")：返回一个同名函数，第一次调用时才导入模块
+   （适用于函数和只用来构造实例的类，如 InMemorySaver、SystemMessage；需要 isinstance 的类请直接导入）；
+   参数里的 LazyChatModel 在调用前换成真正的模型
+2. LazyChatModel：聊天模型的代理，第一次 invoke / stream / bind_tools 时才真正构建；
+   get_chat_model(..., lazy=True) 返回的就是它
+
+LazyChatModel 不是 BaseChatModel / Runnable（isinstance 为 False，copy / pickle 得到的也只是代理），
+交给按类型判断模型的代码之前要换成真正的模型：
+- lazy_callable 包装的函数（create_agent 等）自动换
+- 直接导入的 create_agent、SummarizationMiddleware 以及 LCEL（prompt | model）请传 resolve(model)
+
+用法：
+    create_agent = lazy_callable("langchain.agents", "create_agent")
+    model = get_chat_model("deepseek-chat", temperature=0.5, lazy=True)
+
+    agent = create_agent(model=model, tools=[...])   # 此时才导入 langchain.agents、构建模型
+    chain = prompt | resolve(model)
+"""
+
+import importlib
+import threading
+from typing import Any, Callable, Optional
+
+
+def resolve(value: Any) -> Any:
+    """LazyChatModel 换成真正的模型（此时才构建），其它值原样返回"""
+    return value.resolve() if isinstance(value, LazyChatModel) else value
+
+
+def lazy_callable(module: str, name: str) -> Callable:
+    """
+    延迟导入的函数 / 类
+
+    参数:
+        module: 模块名，如 "langchain.agents"
+        name: 模块里的函数或类名，如 "create_agent"
+    """
+    target = None
+
+    def call(*args: Any, **kwargs: Any):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module), name)
+        args = [resolve(arg) for arg in args]
+        kwargs = {key: resolve(value) for key, value in kwargs.items()}
+        return target(*args, **kwargs)
+
+    call.__name__ = call.__qualname__ = name
+    call.__doc__ = f'{module}.{name}（第一次调用时导入）'
+    return call
+
+
+class LazyChatModel:
+    """
+    聊天模型的延迟构建代理
+
+    - 第一次访问任何属性（invoke、stream、bind_tools、model_name ...）时构建模型，之后直接转发
+    - model | other 可以直接用；按类型判断模型的地方（create_agent、prompt | model）请传 resolve(model)
+    - 本身不继承 Runnable：导入 langchain_core.runnables 就要几百毫秒，正是要省掉的开销
+
+    参数:
+        factory: 无参函数，返回真正的模型
+        name: 显示用的名字
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: Optional[str] = None):
+        self._factory = factory
+        self._name = name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def resolve(self):
+        """构建（只构建一次）并返回真正的模型"""
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+                model = self._model
+        return model
+
+    def __getattr__(self, name: str):
+        # 只有常规查找失败时才会进来；代理自身的字段与双下划线属性不转发，避免初始化前递归
+        if name in ('_factory', '_name', '_model', '_lock') or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __or__(self, other):
+        return self.resolve() | other
+
+    def __ror__(self, other):
+        return other | self.resolve()
+
+    def __repr__(self) -> str:
+        if self._model is not None:
+            return repr(self._model)
+        return f'LazyChatModel({self._name or "未加载"})'
@@ -0,0 +1,423 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+离线 DeepSeek 模拟服务（OpenAI chat-completions 协议）
+=====================================================
+
+用途：压测 / 基准测试时替代真实 API，不消耗额度、没有网络抖动。
+
+支持：
+1. POST /v1/chat/completions（非流式 + SSE 流式）
+2. tool_calls（由脚本规则决定何时调用哪个工具）
+3. usage 字段，包括 DeepSeek 的 prompt_cache_hit_tokens / prompt_cache_miss_tokens
+   （按 64 token 为单位模拟前缀缓存命中）
+4. 可配置的首包延迟 latency、生成速度 tokens_per_sec，可按规则或请求头单独覆盖
+
+启动：
+    python -m common.mock_server --port 8765 --latency 0.2 --tps 50 --script script.json
+
+然后把示例指向它：
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765/v1
+    DEEPSEEK_API_KEY=mock
+
+脚本文件格式（规则按顺序匹配最后一条用户消息，match 为子串，空串匹配一切）：
+    {
+      "default_reply": "这是离线模拟回复：{last}",
+      "rules": [
+        {"match": "天气", "tool_calls": [{"name": "get_weather", "arguments": {"city": "北京"}}]},
+        {"match": "你好", "reply": "你好！我是离线模拟助手。", "latency": 0.05, "tokens_per_sec": 200}
+      ]
+    }
+
+请求头 X-Mock-Latency / X-Mock-TPS 可以覆盖单个请求的延迟与速度。
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from common.token_counter import estimate_tokens
+
+# DeepSeek 按 64 token 为单位做前缀缓存
+CACHE_BLOCK_TOKENS = 64
+
+# 流式切分：中文逐字，英文按单词（带上后面的空白），其余字符逐个
+_PIECE_RE = re.compile(r'[一-鿿　-〿＀-￯]|[A-Za-z0-9_]+\s*|\s+|.', re.S)
+
+
+def split_pieces(text: str) -> list:
+    """把回复切成流式输出的片段"""
+    return _PIECE_RE.findall(text)
+
+
+@dataclass
+class MockConfig:
+    """
+    模拟服务配置
+
+    参数:
+        latency: 首包延迟（秒）
+        tokens_per_sec: 生成速度，<=0 表示不限速
+        rules: 脚本规则列表，见模块说明
+        default_reply: 没有规则命中时的回复模板，{last} 为最后一条用户消息
+        model: 未指定 model 时返回的模型名
+    """
+    latency: float = 0.0
+    tokens_per_sec: float = 0.0
+    rules: list = field(default_factory=list)
+    default_reply: str = '这是离线模拟回复：{last}'
+    model: str = 'deepseek-chat'
+
+    @classmethod
+    def from_file(cls, path: str, **overrides) -> 'MockConfig':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        data.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**data)
+
+
+def _content_text(content) -> str:
+    """OpenAI 消息的 content 可能是字符串，也可能是分段列表"""
+    if content is None:
+        return ''
+    if isinstance(content, str):
+        return content
+    return ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+
+
+class MockState:
+    """服务端状态：请求计数、前缀缓存（线程安全）"""
+
+    def __init__(self, max_prefixes: int = 100_000):
+        self._lock = threading.Lock()
+        self._prefixes = {}
+        self._max_prefixes = max_prefixes
+        self.requests = 0
+        self.stream_requests = 0
+        self.prompt_tokens = 0
+        self.cache_hit_tokens = 0
+        self.completion_tokens = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def prompt_usage(self, messages: list, tools: Optional[list]) -> tuple:
+        """
+        计算 prompt token 数与前缀缓存命中数
+
+        把 tools + 每条消息依次拼成前缀，命中过的最长前缀即缓存部分（向下取整到 64 token）
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(tools or [], sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        total = estimate_tokens(json.dumps(tools, ensure_ascii=False)) if tools else 0
+        hit = 0
+        keys = []
+        for message in messages:
+            text = json.dumps(message, sort_keys=True, ensure_ascii=False)
+            digest.update(text.encode('utf-8'))
+            total += estimate_tokens(_content_text(message.get('content'))) + 4
+            keys.append((digest.hexdigest(), total))
+
+        with self._lock:
+            for key, tokens in keys:
+                if key in self._prefixes:
+                    hit = tokens
+            if len(self._prefixes) > self._max_prefixes:
+                self._prefixes.clear()
+            for key, tokens in keys:
+                self._prefixes[key] = tokens
+        hit = hit // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+        return total, min(hit, total)
+
+    def record(self, prompt_tokens: int, hit_tokens: int, completion_tokens: int, stream: bool):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cache_hit_tokens += hit_tokens
+            self.completion_tokens += completion_tokens
+            if stream:
+                self.stream_requests += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'stream_requests': self.stream_requests,
+                'prompt_tokens': self.prompt_tokens,
+                'cache_hit_tokens': self.cache_hit_tokens,
+                'completion_tokens': self.completion_tokens,
+            }
+
+
+def plan_response(config: MockConfig, messages: list) -> dict:
+    """
+    根据脚本规则决定本次回复：文本还是工具调用，以及延迟/速度
+
+    只有最后一条是用户消息时才会触发 tool_calls，避免 Agent 死循环；
+    最后一条是工具结果时，直接把工具结果组织成文本回复。
+    """
+    last = messages[-1] if messages else {}
+    last_role = last.get('role')
+    last_text = _content_text(last.get('content'))
+    user_text = next(
+        (_content_text(m.get('content')) for m in reversed(messages) if m.get('role') == 'user'), ''
+    )
+
+    plan = {'latency': config.latency, 'tokens_per_sec': config.tokens_per_sec, 'tool_calls': None}
+
+    if last_role == 'tool':
+        results = [_content_text(m.get('content')) for m in messages[_last_ai_index(messages) + 1:]
+                   if m.get('role') == 'tool']
+        plan['reply'] = '根据工具结果：' + '；'.join(results)
+        return plan
+
+    for rule in config.rules:
+        if rule.get('match', '') in user_text:
+            plan['latency'] = rule.get('latency', plan['latency'])
+            plan['tokens_per_sec'] = rule.get('tokens_per_sec', plan['tokens_per_sec'])
+            if rule.get('tool_calls') and last_role == 'user':
+                plan['tool_calls'] = rule['tool_calls']
+                plan['reply'] = rule.get('reply', '')
+            else:
+                plan['reply'] = rule.get('reply', config.default_reply).replace('{last}', last_text)
+            return plan
+
+    plan['reply'] = config.default_reply.replace('{last}', last_text)
+    return plan
+
+
+def _last_ai_index(messages: list) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get('role') == 'assistant':
+            return i
+    return -1
+
+
+def _tool_calls_payload(tool_calls: list, request_id: int) -> list:
+    return [
+        {
+            'id': f'call_{i:02d}_{request_id}',
+            'type': 'function',
+            'function': {
+                'name': call['name'],
+                'arguments': json.dumps(call.get('arguments', {}), ensure_ascii=False),
+            },
+        }
+        for i, call in enumerate(tool_calls)
+    ]
+
+
+def _non_negative(text: str) -> float:
+    """请求头里的数值：必须是有限的非负数，否则 ValueError"""
+    value = float(text)
+    if not 0 <= value < float('inf'):
+        raise ValueError(text)
+    return value
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """处理单个 HTTP 请求；配置与状态挂在 server 上"""
+
+    protocol_version = 'HTTP/1.1'
+    server: 'MockServer'
+
+    def log_message(self, format, *args):
+        # 压测时不刷屏
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json({'object': 'list', 'data': [
+                {'id': 'deepseek-chat', 'object': 'model', 'owned_by': 'mock'},
+                {'id': 'deepseek-reasoner', 'object': 'model', 'owned_by': 'mock'},
+            ]})
+        elif self.path.rstrip('/').endswith('/mock/stats'):
+            self._send_json(self.server.state.snapshot())
+        else:
+            self._send_json({'error': {'message': f'not found: {self.path}'}}, status=404)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json({'error': {'message': f'not found: {self.path}'}}, status=404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError as e:
+            self._send_json({'error': {'message': f'invalid json: {e}'}}, status=400)
+            return
+
+        overrides = {}
+        for header, key in (('X-Mock-Latency', 'latency'), ('X-Mock-TPS', 'tokens_per_sec')):
+            if self.headers.get(header):
+                try:
+                    overrides[key] = _non_negative(self.headers[header])
+                except ValueError:
+                    self._send_json({'error': {'message': f'invalid {header}: {self.headers[header]!r}'}}, status=400)
+                    return
+
+        config = self.server.config
+        state = self.server.state
+        messages = body.get('messages') or []
+        request_id = state.next_id()
+        plan = plan_response(config, messages)
+        plan.update(overrides)
+
+        prompt_tokens, hit_tokens = state.prompt_usage(messages, body.get('tools'))
+        completion_tokens = estimate_tokens(plan['reply'])
+        if plan['tool_calls']:
+            completion_tokens += estimate_tokens(json.dumps(plan['tool_calls'], ensure_ascii=False))
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': hit_tokens},
+            'prompt_cache_hit_tokens': hit_tokens,
+            'prompt_cache_miss_tokens': prompt_tokens - hit_tokens,
+        }
+        stream = bool(body.get('stream'))
+        state.record(prompt_tokens, hit_tokens, completion_tokens, stream)
+
+        meta = {
+            'id': f'chatcmpl-mock-{request_id}',
+            'created': int(time.time()),
+            'model': body.get('model') or config.model,
+            'system_fingerprint': 'fp_mock',
+        }
+        if plan['latency'] > 0:
+            time.sleep(plan['latency'])
+        if stream:
+            self._stream(meta, plan, usage, request_id)
+        else:
+            self._complete(meta, plan, usage, request_id)
+
+    def _complete(self, meta: dict, plan: dict, usage: dict, request_id: int):
+        # 非流式：按速度把整段生成时间一次性睡完
+        if plan['tokens_per_sec'] > 0:
+            time.sleep(usage['completion_tokens'] / plan['tokens_per_sec'])
+        message = {'role': 'assistant', 'content': plan['reply']}
+        finish_reason = 'stop'
+        if plan['tool_calls']:
+            message['tool_calls'] = _tool_calls_payload(plan['tool_calls'], request_id)
+            finish_reason = 'tool_calls'
+        self._send_json({
+            **meta,
+            'object': 'chat.completion',
+            'choices': [{'index': 0, 'message': message, 'logprobs': None, 'finish_reason': finish_reason}],
+            'usage': usage,
+        })
+
+    def _stream(self, meta: dict, plan: dict, usage: dict, request_id: int):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> dict:
+            return {
+                **meta,
+                'object': 'chat.completion.chunk',
+                'choices': [{'index': 0, 'delta': delta, 'logprobs': None, 'finish_reason': finish_reason}],
+                **extra,
+            }
+
+        interval = 1.0 / plan['tokens_per_sec'] if plan['tokens_per_sec'] > 0 else 0.0
+        try:
+            self._send_event(chunk({'role': 'assistant', 'content': ''}))
+            for piece in split_pieces(plan['reply']):
+                if interval:
+                    time.sleep(interval)
+                self._send_event(chunk({'content': piece}))
+
+            finish_reason = 'stop'
+            if plan['tool_calls']:
+                finish_reason = 'tool_calls'
+                for i, call in enumerate(_tool_calls_payload(plan['tool_calls'], request_id)):
+                    self._send_event(chunk({'tool_calls': [{'index': i, **call}]}))
+            self._send_event(chunk({}, finish_reason=finish_reason, usage=usage))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开
+            pass
+
+    def _send_event(self, payload: dict):
+        self.wfile.write(b'data: ' + json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n\n')
+        self.wfile.flush()
+
+    def _send_json(self, payload: dict, status: int = 200):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockServer(ThreadingHTTPServer):
+    """多线程模拟服务，每个连接一个线程"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.state = MockState()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+
+def serve_in_thread(config: Optional[MockConfig] = None, host: str = '127.0.0.1', port: int = 0) -> MockServer:
+    """
+    在后台线程启动模拟服务（port=0 表示随机端口），用于基准测试脚本
+
+    返回:
+        MockServer，用 server.base_url 取地址，用完调用 server.shutdown()
+    """
+    server = MockServer((host, port), config or MockConfig())
+    threading.Thread(target=server.serve_forever, name='mock-deepseek', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线 DeepSeek（OpenAI 协议）模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=None, help='首包延迟（秒）')
+    parser.add_argument('--tps', type=float, default=None, help='生成速度 tokens/sec，0 表示不限速')
+    parser.add_argument('--script', default=None, help='规则脚本 JSON 文件')
+    args = parser.parse_args()
+
+    overrides = {'latency': args.latency, 'tokens_per_sec': args.tps}
+    if args.script:
+        config = MockConfig.from_file(args.script, **overrides)
+    else:
+        config = MockConfig(**{k: v for k, v in overrides.items() if v is not None})
+
+    server = MockServer((args.host, args.port), config)
+    print(f'模拟服务已启动：{server.base_url}')
+    print(f'设置 DEEPSEEK_BASE_URL={server.base_url} 即可让示例连到这里')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('\n已停止')
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+共享的聊天模型工厂
+==================
+
+问题：每个脚本、甚至每次循环都 init_chat_model 一次，每个客户端各自建立 TLS/HTTP 连接。
+
+做法：
+1. 按 (model, base_url, api_key, timeout) 缓存底层客户端，整个进程只建一次
+2. 所有客户端共用 keep-alive 的 httpx 连接池（同步一个；异步每个事件循环一个）
+3. temperature、max_tokens 等只影响请求体的参数，按基础模型的字段加上这些参数重新构造（走 pydantic 校验，
+   temperature="high" 之类会直接报错），并把基础模型的 openai 客户端传进去：
+   变体共享同一个客户端和连接池，创建开销很小，
+   而且仍然是 BaseChatModel，可以直接 bind_tools / 传给 create_agent
+   （RunnableBinding 在 bind_tools 时会丢掉绑定的参数，所以这里不用 .bind）
+
+用法：
+    from common.model_factory import get_chat_model
+    model = get_chat_model('deepseek-chat', temperature=0.5)
+"""
+
+import json
+import threading
+from os import getenv
+from typing import Any, Optional
+
+# 连接池参数：压测时并发较高，保持足够的空闲长连接
+POOL_MAX_CONNECTIONS = 100
+POOL_MAX_KEEPALIVE = 20
+POOL_KEEPALIVE_EXPIRY = 30.0
+
+# 底层 openai 客户端的构造参数：变体改了这些就不能共用基础模型的客户端（仍共用 httpx 连接池）
+_CLIENT_PARAMS = frozenset({'max_retries', 'default_headers', 'default_query', 'organization', 'openai_organization'})
+_CLIENT_FIELDS = ('client', 'async_client', 'root_client', 'root_async_client')
+
+_lock = threading.Lock()
+_base_models: dict = {}
+_variants: dict = {}
+_http_clients: dict = {}
+
+
+def _loop_local_async_client_class():
+    import httpx
+
+    class LoopLocalAsyncClient(httpx.AsyncClient):
+        """
+        每个事件循环一个真正的 httpx.AsyncClient
+
+        异步连接绑定在创建它的事件循环上，进程里先后有多个 asyncio.run 时，
+        共用一个 AsyncClient 会在第二个循环里报 "Event loop is closed"。
+        模型对象只持有这个壳，send 时按当前运行的循环取（或创建）对应的客户端；
+        已关闭循环的客户端直接丢弃（它的连接已随循环失效）。
+        """
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._kwargs = kwargs
+            self._per_loop: dict = {}
+            self._per_loop_lock = threading.Lock()
+
+        def _client_for_loop(self) -> httpx.AsyncClient:
+            import asyncio
+            import weakref
+
+            loop = asyncio.get_running_loop()
+            with self._per_loop_lock:
+                entry = self._per_loop.get(id(loop))
+                if entry is not None and entry[0]() is loop:
+                    return entry[1]
+                for key, (ref, _) in list(self._per_loop.items()):
+                    if ref() is None or ref().is_closed():
+                        del self._per_loop[key]
+                client = httpx.AsyncClient(**self._kwargs)
+                self._per_loop[id(loop)] = (weakref.ref(loop), client)
+                return client
+
+        async def send(self, request, **kwargs):
+            return await self._client_for_loop().send(request, **kwargs)
+
+        async def aclose(self) -> None:
+            import asyncio
+
+            loop = asyncio.get_running_loop()
+            with self._per_loop_lock:
+                entry = self._per_loop.pop(id(loop), None)
+            if entry is not None and entry[0]() is loop:
+                await entry[1].aclose()
+            await super().aclose()
+
+    return LoopLocalAsyncClient
+
+
+def shared_http_clients() -> tuple:
+    """
+    返回进程内共享的 (httpx.Client, httpx.AsyncClient)
+
+    返回:
+        同步、异步两个客户端，第一次调用时创建；
+        异步客户端内部按事件循环各建一个连接池，可以跨多个 asyncio.run 使用
+    """
+    with _lock:
+        if not _http_clients:
+            import httpx
+
+            limits = httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            )
+            _http_clients['sync'] = httpx.Client(limits=limits)
+            _http_clients['async'] = _loop_local_async_client_class()(limits=limits)
+        return _http_clients['sync'], _http_clients['async']
+
+
+def _base_model(model: str, base_url: Optional[str], api_key: Optional[str], timeout: Optional[float]):
+    # api_key 也在键里：不同密钥（多租户）不能共用同一个已经带了密钥的客户端
+    key = (model, base_url, api_key, timeout)
+    base = _base_models.get(key)
+    if base is not None:
+        return base
+
+    from langchain.chat_models import init_chat_model
+
+    http_client, http_async_client = shared_http_clients()
+    kwargs = {
+        'model': model,
+        'api_key': api_key,
+        'timeout': timeout,
+        'http_client': http_client,
+        'http_async_client': http_async_client,
+    }
+    if base_url:
+        kwargs['base_url'] = base_url
+    with _lock:
+        # 双重检查，避免并发时重复创建
+        base = _base_models.get(key)
+        if base is None:
+            base = init_chat_model(**kwargs)
+            _base_models[key] = base
+    return base
+
+
+def _variant(base, params: dict):
+    """按基础模型已设置的字段加上 params 重新构造（经过校验），默认共用基础模型的 openai 客户端"""
+    fields = {name: getattr(base, name) for name in base.model_fields_set}
+    if _CLIENT_PARAMS & params.keys():
+        for name in _CLIENT_FIELDS:
+            fields.pop(name, None)
+    return type(base)(**{**fields, **params})
+
+
+def get_chat_model(
+        model: str = 'deepseek-chat',
+        *,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        lazy: bool = False,
+        **params: Any,
+):
+    """
+    获取（缓存的）聊天模型
+
+    参数:
+        model: 模型名，如 "deepseek-chat"、"deepseek-reasoner"
+        base_url: 接口地址，默认读取环境变量 DEEPSEEK_BASE_URL
+        api_key: 密钥，默认读取环境变量 DEEPSEEK_API_KEY，不同的密钥使用不同的底层客户端
+        timeout: 请求超时（秒），不同的 timeout 使用不同的底层客户端
+        lazy: 为 True 时返回 LazyChatModel，第一次使用时才导入 langchain_openai 并构建模型
+        **params: temperature、max_tokens、streaming 等请求参数
+
+    返回:
+        BaseChatModel，相同参数多次调用返回同一个对象
+    """
+    if lazy:
+        from common.lazy import LazyChatModel
+
+        return LazyChatModel(
+            lambda: get_chat_model(model, base_url=base_url, api_key=api_key, timeout=timeout, **params),
+            name=model,
+        )
+    base_url = base_url or getenv('DEEPSEEK_BASE_URL') or None
+    api_key = api_key or getenv('DEEPSEEK_API_KEY')
+    base = _base_model(model, base_url, api_key, timeout)
+    if not params:
+        return base
+
+    # stop=['\n']、model_kwargs={...} 这类参数不可哈希，序列化成 JSON 作为键
+    key = (model, base_url, api_key, timeout, json.dumps(params, sort_keys=True, default=repr))
+    variant = _variants.get(key)
+    if variant is None:
+        variant = _variant(base, params)
+        with _lock:
+            variant = _variants.setdefault(key, variant)
+    return variant
+
+
+def clear_model_cache():
+    """清空缓存的模型（切换环境变量后使用），共享连接池保留"""
+    with _lock:
+        _base_models.clear()
+        _variants.clear()
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    first = get_chat_model('deepseek-chat', temperature=0.2, max_tokens=50)
+    second = get_chat_model('deepseek-chat', temperature=0.2, max_tokens=50)
+    third = get_chat_model('deepseek-chat', temperature=1.8, max_tokens=50)
+    print(f'相同参数是否同一对象：{first is second}')
+    print(f'不同参数是否共用连接：{first.root_client is third.root_client}')
@@ -0,0 +1,179 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+前缀稳定的请求组装（提高供应商前缀缓存命中率）
+==============================================
+
+DeepSeek 等供应商按"请求前缀"做缓存（DeepSeek 以 64 token 为单位）：只要本次请求开头的
+系统提示、工具定义、历史消息与之前某次请求逐字节相同，这部分输入就按缓存命中计费，首 token 也更快。
+07_memory_basics 日志里 cache_read 在 0 ~ 576 之间波动，说明前缀经常被打断。
+
+PrefixStableMiddleware（放在 create_agent 的 middleware 里）：
+1. 工具按名字排序，schema 只转换一次并缓存，保证每轮发送的工具定义逐字节相同
+2. 检查每个会话的请求前缀：系统提示或工具定义变了、旧的历史消息被改写/插入，都记为一次 prefix_break
+3. 读取每次响应的 usage_metadata，按会话统计输入 token、缓存命中 token 与命中率（cache_report()）
+
+配合使用：
+- 系统提示里不要放时间戳、随机数等每轮变化的内容
+- 摘要用 RollingSummarizationMiddleware(append_only=True)：新摘要追加在后面，旧摘要段不改写
+
+用法：
+    prefix = PrefixStableMiddleware()
+    agent = create_agent(model=model, tools=[...], middleware=[prefix])
+    ...
+    print(prefix.cache_report())
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from common.summarization import thread_key
+from common.tools import cached_schema
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class _ThreadStats:
+    __slots__ = ('calls', 'input_tokens', 'cache_read_tokens', 'prefix_breaks', 'system', 'tools', 'message_ids')
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.cache_read_tokens = 0
+        self.prefix_breaks = 0
+        self.system = None
+        self.tools = None
+        self.message_ids: tuple = ()
+
+    def summary(self) -> dict:
+        return {
+            'calls': self.calls,
+            'input_tokens': self.input_tokens,
+            'cache_read_tokens': self.cache_read_tokens,
+            'uncached_tokens': self.input_tokens - self.cache_read_tokens,
+            'cache_hit_ratio': round(self.cache_read_tokens / self.input_tokens, 4) if self.input_tokens else 0.0,
+            'prefix_breaks': self.prefix_breaks,
+        }
+
+
+class PrefixStableMiddleware(AgentMiddleware):
+    """
+    参数:
+        sort_tools: 是否按名字排序并固定工具 schema
+        max_threads: 最多统计多少个会话（LRU）
+    """
+
+    def __init__(self, *, sort_tools: bool = True, max_threads: int = 10_000):
+        super().__init__()
+        self.sort_tools = sort_tools
+        self.max_threads = max_threads
+        self._schemas: dict = {}  # 工具名 -> (工具对象, 转换好的 schema)
+        self._threads: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ 固定工具定义
+
+    def _schema(self, tool) -> dict:
+        if isinstance(tool, dict):
+            return tool
+        shared = cached_schema(tool)  # common.tools 里的工具：所有中间件 / bind_tools 共用一份缓存
+        if shared is not None:
+            return shared
+        name = getattr(tool, 'name', None) or getattr(tool, '__name__', repr(tool))
+        cached = self._schemas.get(name)
+        if cached is None or cached[0] is not tool:
+            cached = self._schemas[name] = (tool, convert_to_openai_tool(tool))
+        return cached[1]
+
+    def _stable_tools(self, tools: list) -> list:
+        schemas = [self._schema(tool) for tool in tools]
+        return sorted(schemas, key=lambda s: s.get('function', {}).get('name') or s.get('name') or _digest(s))
+
+    # ------------------------------------------------------------------ 前缀检查与统计
+
+    def _stats(self, key: str) -> _ThreadStats:
+        stats = self._threads.get(key)
+        if stats is None:
+            stats = self._threads[key] = _ThreadStats()
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+        self._threads.move_to_end(key)
+        return stats
+
+    def _check_prefix(self, key: str, request) -> None:
+        system = request.system_message.content if request.system_message is not None else None
+        system_digest = _digest(system)
+        tools_digest = _digest(request.tools)
+        message_ids = tuple(m.id for m in request.messages)
+        with self._lock:
+            stats = self._stats(key)
+            if stats.calls and (
+                    stats.system != system_digest
+                    or stats.tools != tools_digest
+                    or message_ids[:len(stats.message_ids)] != stats.message_ids
+            ):
+                stats.prefix_breaks += 1
+            stats.system, stats.tools, stats.message_ids = system_digest, tools_digest, message_ids
+
+    def _record(self, key: str, response) -> None:
+        for message in reversed(getattr(response, 'result', None) or [response]):
+            usage = getattr(message, 'usage_metadata', None)
+            if usage:
+                details = usage.get('input_token_details') or {}
+                with self._lock:
+                    stats = self._stats(key)
+                    stats.calls += 1
+                    stats.input_tokens += usage.get('input_tokens', 0)
+                    stats.cache_read_tokens += details.get('cache_read') or 0
+                return
+        with self._lock:
+            self._stats(key).calls += 1
+
+    def _prepare(self, request):
+        if self.sort_tools and request.tools:
+            request = request.override(tools=self._stable_tools(request.tools))
+        key = thread_key(request.messages)
+        self._check_prefix(key, request)
+        return key, request
+
+    def wrap_model_call(self, request, handler: Callable):
+        key, request = self._prepare(request)
+        response = handler(request)
+        self._record(key, response)
+        return response
+
+    async def awrap_model_call(self, request, handler: Callable):
+        key, request = self._prepare(request)
+        response = await handler(request)
+        self._record(key, response)
+        return response
+
+    def cache_report(self, thread_id: Optional[str] = None) -> dict:
+        """按会话的缓存命中统计；不指定 thread_id 时返回全部会话及合计"""
+        with self._lock:
+            if thread_id is not None:
+                stats = self._threads.get(str(thread_id))
+                return stats.summary() if stats else {}
+            threads = {key: stats.summary() for key, stats in self._threads.items()}
+        total_input = sum(s['input_tokens'] for s in threads.values())
+        total_hit = sum(s['cache_read_tokens'] for s in threads.values())
+        return {
+            'threads': threads,
+            'total': {
+                'calls': sum(s['calls'] for s in threads.values()),
+                'input_tokens': total_input,
+                'cache_read_tokens': total_hit,
+                'cache_hit_ratio': round(total_hit / total_input, 4) if total_input else 0.0,
+                'prefix_breaks': sum(s['prefix_breaks'] for s in threads.values()),
+            },
+        }
@@ -0,0 +1,247 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+模型调用的精确匹配缓存
+======================
+
+相同的系统提示 + 相同的问题反复出现时，直接返回上次的回复，省掉一次网络往返。
+
+实现为 LangChain 的 BaseCache，挂在模型的 cache 字段上即可生效：
+1. 键 = 规范化后的消息（去掉消息 id、response_metadata 等易变字段）+ 模型参数（llm_string，含 temperature 等）
+2. 第一层：内存 LRU（OrderedDict）
+3. 第二层：SQLite 磁盘缓存（可选），进程重启后依然命中
+4. 每条记录都有 TTL，过期视为未命中
+5. stats() 返回命中/未命中计数
+
+注意：只有 temperature 为 0（输出确定）或调用方明确同意时才应开启，见 enable_response_cache。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.load import dumps, loads
+
+# 规范化时忽略的消息字段：每次调用都会变，但不影响回复内容
+VOLATILE_KEYS = frozenset({'id', 'response_metadata', 'usage_metadata'})
+
+
+def _strip_volatile(node):
+    if isinstance(node, dict):
+        kwargs = node.get('kwargs')
+        if node.get('lc') == 1 and isinstance(kwargs, dict):
+            kwargs = {k: _strip_volatile(v) for k, v in kwargs.items() if k not in VOLATILE_KEYS}
+            if isinstance(kwargs.get('content'), str):
+                kwargs['content'] = kwargs['content'].strip()
+            return {**node, 'kwargs': kwargs}
+        return {k: _strip_volatile(v) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_strip_volatile(item) for item in node]
+    return node
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    规范化 LangChain 传给缓存的 prompt（消息列表的序列化 JSON）
+
+    参数:
+        prompt: BaseCache.lookup 收到的 prompt 字符串
+
+    返回:
+        去掉易变字段、键排序后的 JSON 字符串；不是 JSON 时原样去掉首尾空白
+    """
+    try:
+        data = json.loads(prompt)
+    except (TypeError, ValueError):
+        return prompt.strip()
+    return json.dumps(_strip_volatile(data), sort_keys=True, ensure_ascii=False)
+
+
+def prompt_messages(prompt: str, tool_calls: bool = False) -> list:
+    """
+    把 prompt 解析为 [(消息类型, 文本)] 列表，如 [('system', '...'), ('human', '...')]
+
+    不是消息列表时返回 [('human', prompt)]
+
+    参数:
+        tool_calls: 为 True 时把 AI 消息的 tool_calls 与工具消息的 tool_call_id 也拼进文本，
+            只有工具调用不同的两条消息不会被当成同一条
+    """
+    try:
+        data = json.loads(prompt)
+    except (TypeError, ValueError):
+        return [('human', prompt)]
+    if not isinstance(data, list):
+        return [('human', prompt)]
+
+    result = []
+    for item in data:
+        kwargs = item.get('kwargs', {}) if isinstance(item, dict) else {}
+        content = kwargs.get('content', '')
+        if isinstance(content, list):
+            content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+        text = str(content).strip()
+        if tool_calls:
+            calls = [(call.get('name'), call.get('args')) for call in kwargs.get('tool_calls') or []]
+            if calls or kwargs.get('tool_call_id'):
+                text += '\x00' + json.dumps([calls, kwargs.get('tool_call_id')], ensure_ascii=False, sort_keys=True)
+        result.append((kwargs.get('type', 'human'), text))
+    return result
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f'{normalize_prompt(prompt)}\x00{llm_string}'.encode('utf-8')).hexdigest()
+
+
+def _dumps_generations(generations: Sequence) -> str:
+    return json.dumps([dumps(gen) for gen in generations])
+
+
+def _loads_generations(text: str) -> list:
+    # 只允许反序列化 langchain_core 自己的类（ChatGeneration、AIMessage 等）
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', LangChainBetaWarning)
+        return [loads(item, allowed_objects='core') for item in json.loads(text)]
+
+
+class ResponseCache(BaseCache):
+    """
+    两级（内存 LRU + SQLite）精确匹配缓存
+
+    参数:
+        maxsize: 内存层最多保存的条数
+        ttl: 过期时间（秒），None 表示永不过期
+        path: SQLite 文件路径，None 表示只用内存
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600.0, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'updates': 0}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, value: list, expires_at: Optional[float]):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+                self._counters['expired'] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] is None or row[1] > now:
+                        value = _loads_generations(row[0])
+                        self._remember(key, value, row[1])
+                        self._counters['disk_hits'] += 1
+                        return value
+                    self._db.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+                    self._db.commit()
+                    self._counters['expired'] += 1
+
+            self._counters['misses'] += 1
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence) -> None:
+        key = cache_key(prompt, llm_string)
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        value = list(return_val)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._counters['updates'] += 1
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, _dumps_generations(value), expires_at),
+                )
+                self._db.commit()
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM response_cache')
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """命中统计：memory_hits / disk_hits / misses / expired / updates / hit_rate / size"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['size'] = len(self._memory)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['memory_hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        return counters
+
+
+def enable_response_cache(model, cache: Optional[BaseCache] = None, force: bool = False):
+    """
+    为模型开启响应缓存
+
+    参数:
+        model: BaseChatModel（如 get_chat_model 的返回值）
+        cache: 缓存实例，默认新建一个内存 ResponseCache
+        force: temperature 不为 0 时也开启（调用方接受回复不再随机）
+
+    返回:
+        带缓存的模型浅拷贝；不满足条件时原样返回 model
+    """
+    if not force and getattr(model, 'temperature', None) != 0:
+        return model
+    return model.model_copy(update={'cache': cache or ResponseCache()})
+
+
+if __name__ == '__main__':
+    import sys
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from common.model_factory import get_chat_model
+
+    load_dotenv()
+    cache = ResponseCache(maxsize=256, ttl=600)
+    model = enable_response_cache(get_chat_model('deepseek-chat', temperature=0), cache)
+    messages = [
+        {'role': 'system', 'content': '你是一个简洁的助手，回答限制在30字以内'},
+        {'role': 'user', 'content': '深度学习是什么'},
+    ]
+    for i in range(3):
+        start = time.perf_counter()
+        response = model.invoke(messages)
+        print(f'第{i + 1}次：{(time.perf_counter() - start) * 1000:.2f} ms  {response.content}')
+    print(cache.stats())
@@ -0,0 +1,352 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+本地倒排索引（BM25 排序）
+========================
+
+web_search 原来每次请求都遍历一遍 mock_results，对查询词和每个 key 调 .lower() 做子串匹配：
+结果条数一多就线性变慢，而且只能命中整个 key（"Python 教程" 找不到 "Python教程 - 菜鸟教程"）。
+
+SearchIndex：
+1. 分词：NFKC 归一化 + 小写；英文/数字按词切分，中文连续片段切成字符二元组（"机器学习" -> 机器/器学/学习），
+   单个汉字保留为一元词
+2. 倒排表：每个词一组 NumPy 数组（文档号 int32 + 词频 float32），容量不够时翻倍扩容；
+   文档号递增追加，倒排表天然有序
+3. add / add_documents 随时增量添加（批量添加时按词分组，一个词只拷贝一次数组）
+4. search：BM25 打分向量化计算，argpartition 取前 k 个；文档长度归一项在添加后懒计算一次
+5. 多词查询先给罕见词命中的文档算完整得分，常见词的得分上限追不上第 k 名时就不再扫描常见词的长倒排表
+   （MaxScore 剪枝，结果与全量打分一致）；常见词的单词查询结果缓存到下次添加文档为止
+
+用法：
+    index = SearchIndex()
+    index.add_documents(["Python教程 - 菜鸟教程", "LangChain官方文档"])
+    for doc_id, score in index.search("python 教程", k=3):
+        print(index.document(doc_id), score)
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+_CJK = '一-鿿㐀-䶿豈-﫿'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+_CHAMPIONS = 100
+
+
+def tokenize(text: str) -> list:
+    """分词：英文/数字整词，中文字符二元组（单字片段保留一元）"""
+    tokens = []
+    for piece in _TOKEN_RE.findall(unicodedata.normalize('NFKC', text).lower()):
+        if _CJK_RE.match(piece):
+            if len(piece) == 1:
+                tokens.append(piece)
+            else:
+                tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+        else:
+            tokens.append(piece)
+    return tokens
+
+
+class _Postings:
+    """单个词的倒排表：文档号与词频两个数组，容量翻倍扩容"""
+
+    __slots__ = ('ids', 'tfs', 'size', 'max_tf')
+
+    def __init__(self, capacity: int = 4):
+        self.ids = np.empty(capacity, dtype=np.int32)
+        self.tfs = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+        self.max_tf = 0.0
+
+    def extend(self, ids: np.ndarray, tfs: np.ndarray) -> None:
+        end = self.size + len(ids)
+        if end > len(self.ids):
+            capacity = max(end, len(self.ids) * 2)
+            for name in ('ids', 'tfs'):
+                old = getattr(self, name)
+                grown = np.empty(capacity, dtype=old.dtype)
+                grown[:self.size] = old[:self.size]
+                setattr(self, name, grown)
+        self.ids[self.size:end] = ids
+        self.tfs[self.size:end] = tfs
+        self.size = end
+        self.max_tf = max(self.max_tf, float(np.max(tfs)))
+
+    def append(self, doc_id: int, tf: float) -> None:
+        if self.size == len(self.ids):
+            self.extend(np.array((doc_id,), dtype=np.int32), np.array((tf,), dtype=np.float32))
+            return
+        self.ids[self.size] = doc_id
+        self.tfs[self.size] = tf
+        self.size += 1
+        if tf > self.max_tf:
+            self.max_tf = float(tf)
+
+
+class SearchIndex:
+    """
+    支持增量添加的 BM25 倒排索引（线程安全）
+
+    参数:
+        k1: BM25 词频饱和参数
+        b: BM25 文档长度归一化参数
+        candidate_budget: 多词查询时先精确打分的候选倒排条数上限（见 _search_pruned）
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, candidate_budget: int = 20_000):
+        self.k1 = k1
+        self.b = b
+        self.candidate_budget = candidate_budget
+        self._vocab: dict = {}  # 词 -> 词编号
+        self._postings: list = []  # 词编号 -> _Postings
+        self._documents: list = []
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._scores = np.zeros(1024, dtype=np.float32)  # 多词查询时累加得分，用完清零
+        self._mask = np.zeros(1024, dtype=bool)  # 剪枝时标记候选文档，用完清零
+        self._norm: Optional[np.ndarray] = None  # k1 * (1 - b + b * 文档长度 / 平均长度)
+        self._min_norm = k1
+        self._champions: dict = {}  # 长倒排表的单词查询结果（前 _CHAMPIONS 名），添加文档后失效
+        self._total_length = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    # ------------------------------------------------------------------ 添加
+
+    def _grow(self, size: int) -> None:
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, len(self._lengths) * 2)
+        lengths = np.zeros(capacity, dtype=np.float32)
+        lengths[:len(self._documents)] = self._lengths[:len(self._documents)]
+        self._lengths = lengths
+        self._scores = np.zeros(capacity, dtype=np.float32)
+        self._mask = np.zeros(capacity, dtype=bool)
+
+    def add(self, text: str, document: Any = None) -> int:
+        """添加一篇文档，返回文档号；document 为 search 结果对应的内容，默认就是 text"""
+        return self.add_documents([text], None if document is None else [document])[0]
+
+    def add_documents(self, texts: Iterable[str], documents: Optional[Iterable[Any]] = None) -> range:
+        """批量添加文档，返回这批文档的文档号范围"""
+        texts = list(texts)
+        documents = texts if documents is None else list(documents)
+        if len(documents) != len(texts):
+            raise ValueError('texts 与 documents 数量不一致')
+        with self._lock:
+            start = len(self._documents)
+            term_ids, doc_ids, tfs, lengths = [], [], [], []
+            vocab, postings = self._vocab, self._postings
+            for doc_id, text in enumerate(texts, start):
+                counts = Counter(tokenize(text))
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    term_id = vocab.get(term)
+                    if term_id is None:
+                        term_id = vocab[term] = len(postings)
+                        postings.append(_Postings())
+                    term_ids.append(term_id)
+                    doc_ids.append(doc_id)
+                    tfs.append(tf)
+
+            if len(texts) == 1:
+                for term_id, tf in zip(term_ids, tfs):
+                    postings[term_id].append(start, tf)
+            elif term_ids:
+                # 按词编号分组（稳定排序保证每组内文档号仍递增），每个词只追加一次
+                term_ids = np.asarray(term_ids, dtype=np.int64)
+                order = np.argsort(term_ids, kind='stable')
+                term_ids = term_ids[order]
+                doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+                tfs = np.asarray(tfs, dtype=np.float32)[order]
+                bounds = np.flatnonzero(np.diff(term_ids)) + 1
+                for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(term_ids)]))):
+                    postings[term_ids[lo]].extend(doc_ids[lo:hi], tfs[lo:hi])
+
+            end = start + len(texts)
+            self._grow(end)
+            self._lengths[start:end] = lengths
+            self._total_length += sum(lengths)
+            self._documents.extend(documents)
+            self._norm = None
+            self._champions.clear()
+        return range(start, end)
+
+    # ------------------------------------------------------------------ 查询
+
+    def _length_norm(self) -> np.ndarray:
+        if self._norm is None:
+            size = len(self._documents)
+            average = self._total_length / size or 1.0
+            self._norm = self.k1 * (1 - self.b + self.b * self._lengths[:size] / average)
+            self._min_norm = float(self._norm.min()) if size else self.k1
+        return self._norm
+
+    def _upper_bound(self, postings: _Postings, idf: float) -> float:
+        """这个词对任意一篇文档的最大得分贡献（词频取最大、文档长度取最短）"""
+        return idf * (self.k1 + 1) * postings.max_tf / (postings.max_tf + self._min_norm)
+
+    def _contribution(self, idf: float, tfs: np.ndarray, norm: np.ndarray) -> np.ndarray:
+        return (idf * (self.k1 + 1)) * tfs / (tfs + norm)
+
+    @staticmethod
+    def _top(candidates: np.ndarray, scores: np.ndarray, k: int) -> list:
+        if len(scores) > k:
+            # 第 k 名有并列时取文档号最小的几个，保证结果确定
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            top = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)
+            need = k - len(top)
+            if len(ties) > need:
+                ties = ties[np.argpartition(candidates[ties], need - 1)[:need]]
+            top = np.concatenate((top, ties))
+        else:
+            top = np.arange(len(scores))
+        top = top[np.lexsort((candidates[top], -scores[top]))]  # 得分相同按文档号
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def _search_pruned(self, terms: list, norm: np.ndarray, k: int) -> Optional[list]:
+        """
+        MaxScore 剪枝：前 head 个短倒排表（罕见词）里出现过的文档作为候选，算出完整得分与第 k 名的分数；
+        不在候选里的文档只可能含有剩下的长倒排表（常见词），得分不超过它们的贡献上限之和，
+        追不上第 k 名时结果就已确定。逐步增加 head，仍无法确定时返回 None，由调用方走全量打分。
+        """
+        size = len(self._documents)
+        for head in range(1, len(terms)):
+            head_terms, tail_terms = terms[:head], terms[head:]
+            bound = sum(self._upper_bound(p, idf) for p, idf in tail_terms)
+            head_size = sum(p.size for p, _ in head_terms)
+            if head_size < k:
+                continue
+
+            buffer, mask = self._scores, self._mask
+            for p, idf in head_terms:
+                ids = p.ids[:p.size]
+                buffer[ids] += self._contribution(idf, p.tfs[:p.size], norm[ids])
+                mask[ids] = True
+            if head_size * 16 < size:  # 候选少：排序去重
+                candidates = np.sort(np.concatenate([p.ids[:p.size] for p, _ in head_terms]))
+                candidates = candidates[np.concatenate(([True], candidates[1:] != candidates[:-1]))]
+            else:  # 候选多：直接扫描掩码，结果天然有序且不重复
+                candidates = np.flatnonzero(mask[:size])
+            for p, idf in tail_terms:
+                ids = p.ids[:p.size]
+                if len(candidates) * 32 < p.size:  # 候选少：在有序倒排表里二分查找
+                    pos = np.minimum(np.searchsorted(ids, candidates), p.size - 1)
+                    hit = ids[pos] == candidates
+                    ids, tfs = candidates[hit], p.tfs[pos[hit]]
+                else:  # 候选多：顺序扫一遍倒排表，用掩码筛出候选
+                    hit = mask[ids]
+                    ids, tfs = ids[hit], p.tfs[:p.size][hit]
+                buffer[ids] += self._contribution(idf, tfs, norm[ids])
+            scores = buffer[candidates]
+            buffer[candidates] = 0
+            mask[candidates] = False
+
+            results = self._top(candidates, scores, k)
+            if len(results) == k and results[-1][1] > bound:
+                return results
+            if len(candidates) > size // 4:
+                break
+        return None
+
+    def _search_exhaustive(self, terms: list, norm: np.ndarray, k: int) -> list:
+        scored = []
+        for p, idf in terms:
+            ids = p.ids[:p.size]
+            scored.append((ids, self._contribution(idf, p.tfs[:p.size], norm[ids])))
+        if len(scored) == 1:
+            return self._top(scored[0][0], scored[0][1], k)
+
+        buffer = self._scores
+        for ids, contribution in scored:
+            buffer[ids] += contribution  # 同一个词的倒排表里文档号不重复
+        candidates = np.concatenate([ids for ids, _ in scored])
+        scores = buffer[candidates]
+        buffer[candidates] = 0
+        # 一篇文档最多重复 len(scored) 次，取前 k * len(scored) 个再去重即可，不必对全部候选排序
+        results, seen = [], set()
+        for doc_id, score in self._top(candidates, scores, k * len(scored)):
+            if doc_id not in seen:
+                seen.add(doc_id)
+                results.append((doc_id, score))
+                if len(results) == k:
+                    break
+        return results
+
+    def search(self, query: str, k: int = 10) -> list:
+        """返回得分最高的 k 个 [(文档号, 得分)]，按得分从高到低；没有匹配时返回空列表"""
+        with self._lock:
+            term_ids = [self._vocab[t] for t in dict.fromkeys(tokenize(query)) if t in self._vocab]
+            if not term_ids or k <= 0:
+                return []
+            size = len(self._documents)
+            norm = self._length_norm()
+            terms = []  # [(倒排表, idf)]，倒排表从短到长
+            for p in sorted((self._postings[t] for t in term_ids), key=lambda p: p.size):
+                terms.append((p, math.log(1 + (size - p.size + 0.5) / (p.size + 0.5))))
+            if len(terms) == 1 and terms[0][0].size > self.candidate_budget and k <= _CHAMPIONS:
+                # 常见词的单词查询：前 _CHAMPIONS 名只算一次，直到下次添加文档
+                champions = self._champions.get(term_ids[0])
+                if champions is None:
+                    champions = self._champions[term_ids[0]] = self._search_exhaustive(terms, norm, _CHAMPIONS)
+                return champions[:k]
+            results = None
+            if len(terms) > 1 and sum(p.size for p, _ in terms) > self.candidate_budget:
+                results = self._search_pruned(terms, norm, k)
+            return results if results is not None else self._search_exhaustive(terms, norm, k)
+
+    def document_frequency(self, term: str) -> int:
+        """含有某个词（tokenize 之后的词）的文档数，即它的倒排表长度"""
+        with self._lock:
+            term_id = self._vocab.get(term)
+            return 0 if term_id is None else self._postings[term_id].size
+
+    def document(self, doc_id: int) -> Any:
+        return self._documents[doc_id]
+
+    def search_documents(self, query: str, k: int = 10) -> list:
+        """与 search 相同，但直接返回文档内容"""
+        return [self._documents[doc_id] for doc_id, _ in self.search(query, k)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._documents)
+            return {
+                'documents': size,
+                'terms': len(self._vocab),
+                'postings': sum(p.size for p in self._postings),
+                'avg_doc_length': round(self._total_length / size, 2) if size else 0.0,
+            }
+
+
+# 模拟搜索引擎的语料：(标题 - 来源, 主题)
+DEMO_CORPUS = [
+    ("Python官方网站 - https://www.python.org", "Python"),
+    ("Python教程 - 菜鸟教程", "Python"),
+    ("Python最佳实践 - Real Python", "Python"),
+    ("机器学习入门 - Coursera", "机器学习"),
+    ("Scikit-learn文档", "机器学习"),
+    ("机器学习实战 - GitHub", "机器学习"),
+    ("LangChain官方文档", "LangChain"),
+    ("LangChain GitHub仓库", "LangChain"),
+    ("LangChain教程 - YouTube", "LangChain"),
+]
+
+
+@lru_cache(maxsize=1)
+def demo_index() -> SearchIndex:
+    """web_search 工具使用的模拟语料索引（进程内只构建一次）"""
+    index = SearchIndex()
+    index.add_documents((f'{title} {topic}' for title, topic in DEMO_CORPUS), (title for title, _ in DEMO_CORPUS))
+    return index
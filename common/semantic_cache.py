@@ -0,0 +1,413 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+语义缓存（近似问题命中）
+========================
+
+精确缓存命中不了换个说法的问题，例如 "我多大来着？" 和 "我今年多大？"。
+
+做法：
+1. 最后一条用户消息 → 本地 CPU 向量（字符 1~2-gram 哈希到固定维度，无需下载模型；
+   先去掉语气词、统一"怎么 / 如何"这类同义问法）
+2. 分区键 = 系统提示 + 会话（thread_id）+ 最近 context_window 条消息（含工具调用与结果）的哈希，上下文不同绝不串用；
+   最后一条不是用户消息（工具结果之后的模型调用）时不查也不写缓存
+3. 每个分区一个 NumPy 向量索引，余弦相似度 >= threshold 且关键词一致（key_terms_match）才命中：
+   字符 n-gram 不懂语义，"100加50等于多少" 和 "100加60等于多少" 相似度很高，
+   所以数字 / 英文词不同、有短词替换（北京→上海、我→他）、"到 / 从" 两边对调时一律不命中
+4. 统计命中率；命中记录写入审计日志，可人工抽查并标记误命中
+
+阈值用 CALIBRATION_PAIRS（同义 / 非同义问题对）校准：calibrate() 给出能把两类分开的阈值，
+换了向量化器或业务问题时先用自己的问题对重新校准（python -m common.semantic_cache 打印校准结果）。
+
+用法：
+    cache = SemanticCache()
+    model = enable_response_cache(get_chat_model(temperature=0), cache)
+"""
+
+import difflib
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import deque
+from typing import Optional, Sequence
+
+import numpy as np
+from langchain_core.caches import BaseCache
+
+from common.response_cache import prompt_messages
+
+# 归一化时去掉的字符：空白与标点
+_PUNCT_RE = re.compile(r'[\s\W_]+', re.U)
+# 同义问法统一成一种写法（按顺序替换，长的在前）
+_SYNONYMS = (('怎么样', '如何'), ('怎样', '如何'), ('怎么', '如何'), ('咋样', '如何'), ('多少岁', '多大'), ('几岁', '多大'),
+             ('啥', '什么'))
+# 不影响问题含义的语气词 / 客套话
+_FILLERS = ('来着', '一下', '麻烦', '请问', '请', '了', '呢', '吗', '嘛', '呀', '啊', '吧', '哦')
+# 必须完全一致的关键词：数字、英文单词 / 标识符
+_KEY_TERM_RE = re.compile(r'\d+(?:\.\d+)?|[a-z][a-z0-9_\-]*')
+# 两边对调会改变含义的介词（北京到上海 ≠ 上海到北京）
+_DIRECTIONAL = '到从给比向对被把'
+
+DEFAULT_THRESHOLD = 0.55  # 由 calibrate(CALIBRATION_PAIRS) 得出
+
+# (问题 A, 问题 B, 是否同义)
+CALIBRATION_PAIRS = [
+    ('我多大来着？', '我今年多大？', True),
+    ('深度学习是什么', '什么是深度学习？', True),
+    ('北京天气怎么样', '北京天气如何', True),
+    ('帮我查一下我的信息', '帮我查查我的信息', True),
+    ('什么是LangChain？', 'LangChain是什么', True),
+    ('你好，我想咨询一下', '你好，想咨询一下', True),
+    ('我的用户 ID 是多少', '我的用户ID是多少？', True),
+    ('怎么退货', '如何退货', True),
+    ('今天北京天气怎么样', '北京今天天气怎么样？', True),
+    ('请介绍一下你自己', '介绍一下你自己', True),
+    ('我多大了', '我今年多大了', True),
+    ('机器学习和深度学习有什么区别', '深度学习和机器学习的区别是什么', True),
+    ('你们几点开门', '你们几点开门呀', True),
+    ('怎么注册账号', '如何注册账号？', True),
+    ('推荐一本书', '给我推荐一本书吧', True),
+    ('退货要多久', '退货需要多久', True),
+    ('100加50等于多少', '100加60等于多少', False),
+    ('北京天气怎么样', '上海天气怎么样', False),
+    ('我多大来着？', '他多大来着？', False),
+    ('深度学习是什么', '机器学习是什么', False),
+    ('什么是LangChain？', '什么是LangGraph？', False),
+    ('帮我查一下我的信息', '帮我删一下我的信息', False),
+    ('怎么退货', '怎么换货', False),
+    ('我的用户 ID 是 123', '我的用户 ID 是 456', False),
+    ('今天北京天气怎么样', '明天北京天气怎么样', False),
+    ('张三多大', '李四多大', False),
+    ('北京到上海多远', '上海到北京多远', False),
+    ('你好', '你是谁', False),
+    ('北京天气怎么样', '北京有什么好玩的', False),
+    ('我的订单到哪了', '我的订单怎么取消', False),
+    ('深度学习是什么', '深度学习怎么入门', False),
+    ('帮我查一下我的信息', '帮我修改我的信息', False),
+    ('LangChain怎么安装', 'LangChain怎么卸载', False),
+    ('我多大来着？', '我叫什么来着？', False),
+    ('退货要多久', '退款要多久', False),
+    ('你们几点开门', '你们几点关门', False),
+    ('推荐一本书', '推荐一部电影', False),
+    ('怎么注册账号', '怎么注销账号', False),
+]
+
+
+class HashingEmbedder:
+    """
+    字符 n-gram 哈希向量（hashing trick）
+
+    参数:
+        dim: 向量维度
+        ngram_range: n-gram 长度范围；中文短问题用 1~2，三字组会把换了说法的问题拉得太开
+    """
+
+    def __init__(self, dim: int = 1024, ngram_range: tuple = (1, 2)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = _PUNCT_RE.sub('', unicodedata.normalize('NFKC', text).lower())
+        for old, new in _SYNONYMS:
+            text = text.replace(old, new)
+        for filler in _FILLERS:
+            text = text.replace(filler, '')
+        return text
+
+    def embed(self, text: str) -> np.ndarray:
+        """返回 L2 归一化后的 float32 向量；空文本返回零向量"""
+        vec = np.zeros(self.dim, dtype=np.float32)
+        text = self.normalize(text)
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                # crc32 在不同进程间稳定（内置 hash 会随机化）
+                h = zlib.crc32(text[i:i + n].encode('utf-8'))
+                vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = float(np.linalg.norm(vec))
+        if norm:
+            vec /= norm
+        return vec
+
+
+def key_terms_match(a: str, b: str) -> bool:
+    """
+    两个问题的关键信息是否一致（相似度之外的第二道检查，宁可不命中也不串答）
+
+    不一致的情况：数字或英文词不同（按出现顺序比较）；有短词替换（任一边不超过 2 个字，或两边等长，
+    如 北京→上海、我→他、查→修改）；"到 / 从" 等介词两边的内容对调
+    """
+    terms_a = _KEY_TERM_RE.findall(unicodedata.normalize('NFKC', a).lower())
+    terms_b = _KEY_TERM_RE.findall(unicodedata.normalize('NFKC', b).lower())
+    if terms_a != terms_b:
+        return False
+    a, b = HashingEmbedder.normalize(a), HashingEmbedder.normalize(b)
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == 'replace' and (i2 - i1 == j2 - j1 or min(i2 - i1, j2 - j1) <= 2):
+            return False
+    for word in _DIRECTIONAL:
+        if a.count(word) == 1 and b.count(word) == 1:
+            left_a, _ = a.split(word)
+            left_b, right_b = b.split(word)
+            if left_a and left_a != left_b and left_a in right_b:
+                return False
+    return True
+
+
+def calibrate(pairs: Sequence = CALIBRATION_PAIRS, embedder: Optional['HashingEmbedder'] = None) -> dict:
+    """
+    用标注好的问题对校准阈值
+
+    参数:
+        pairs: [(问题 A, 问题 B, 是否同义)]
+        embedder: 向量化器，默认 HashingEmbedder()
+
+    返回:
+        threshold（同义对最低分与通过关键词检查的非同义对最高分的中点，分不开时取使误判最少的分数），
+        以及该阈值下的 hits / false_hits / misses 明细
+    """
+    embedder = embedder or HashingEmbedder()
+    scored = [(float(embedder.embed(a) @ embedder.embed(b)), key_terms_match(a, b), a, b, same) for a, b, same in pairs]
+    positives = [score for score, ok, _, _, same in scored if same and ok]
+    negatives = [score for score, ok, _, _, same in scored if not same and ok]
+    low, high = min(positives, default=1.0), max(negatives, default=0.0)
+    if high < low:
+        threshold = round((low + high) / 2, 2)
+    else:
+        candidates = sorted(set(positives + negatives))
+        threshold = min(candidates, key=lambda t: sum(s < t for s in positives) + sum(s >= t for s in negatives))
+    hit = lambda score, ok: ok and score >= threshold
+    return {
+        'threshold': threshold,
+        'hits': [(a, b, round(score, 3)) for score, ok, a, b, same in scored if same and hit(score, ok)],
+        'misses': [(a, b, round(score, 3)) for score, ok, a, b, same in scored if same and not hit(score, ok)],
+        'false_hits': [(a, b, round(score, 3)) for score, ok, a, b, same in scored if not same and hit(score, ok)],
+    }
+
+
+class VectorIndex:
+    """按行追加的向量矩阵，容量不够时翻倍扩容；search 为一次矩阵乘法"""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+
+    def add(self, vec: np.ndarray) -> int:
+        if self.size == len(self._matrix):
+            grown = np.zeros((len(self._matrix) * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self._matrix[:self.size]
+            self._matrix = grown
+        self._matrix[self.size] = vec
+        self.size += 1
+        return self.size - 1
+
+    def set(self, idx: int, vec: np.ndarray):
+        self._matrix[idx] = vec
+
+    def search(self, vec: np.ndarray) -> tuple:
+        """返回 (最相似的行号, 相似度)，索引为空时返回 (-1, 0.0)"""
+        if not self.size:
+            return -1, 0.0
+        scores = self._matrix[:self.size] @ vec
+        idx = int(np.argmax(scores))
+        return idx, float(scores[idx])
+
+    def top(self, vec: np.ndarray, k: int) -> list:
+        """相似度最高的 k 个 [(行号, 相似度)]，从高到低"""
+        if not self.size:
+            return []
+        scores = self._matrix[:self.size] @ vec
+        k = min(k, self.size)
+        idx = np.argpartition(-scores, k - 1)[:k]
+        return [(int(i), float(scores[i])) for i in idx[np.argsort(-scores[idx])]]
+
+
+class _Partition:
+    def __init__(self, dim: int):
+        self.index = VectorIndex(dim)
+        self.entries = []  # [(问题, 回复, 过期时间)]
+
+
+class SemanticCache(BaseCache):
+    """
+    基于本地向量的语义缓存
+
+    参数:
+        threshold: 余弦相似度阈值，越高越保守；默认值由 calibrate(CALIBRATION_PAIRS) 得出
+        ttl: 过期时间（秒），None 表示永不过期
+        context_window: 计入分区键的最近历史消息条数（不含系统消息），None 表示全部历史；
+            默认 0：同一会话里后面换个说法再问也能命中（全部历史会让每一轮都落在新分区，永远命不中）；
+            回答依赖前文时调大
+        per_thread: 分区键带上 thread_id（LangGraph 运行时的 configurable.thread_id），
+            不同用户 / 会话不会拿到彼此的回复；没有 thread_id 时按系统提示共享
+        max_entries: 每个分区最多条数，超出时丢弃最早的一半
+        embedder: 向量化器，默认 HashingEmbedder()
+        audit_size: 审计日志保留的命中条数
+    """
+
+    def __init__(
+            self,
+            threshold: float = DEFAULT_THRESHOLD,
+            ttl: Optional[float] = 3600.0,
+            context_window: Optional[int] = 0,
+            per_thread: bool = True,
+            max_entries: int = 10_000,
+            embedder: Optional[HashingEmbedder] = None,
+            audit_size: int = 1000,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.context_window = context_window
+        self.per_thread = per_thread
+        self.max_entries = max_entries
+        self.embedder = embedder or HashingEmbedder()
+        self._partitions: dict = {}
+        self._lock = threading.Lock()
+        self._audit = deque(maxlen=audit_size)
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'updates': 0, 'false_hits': 0, 'bypassed': 0,
+                          'guarded': 0}
+
+    def _split(self, prompt: str, llm_string: str) -> tuple:
+        """
+        拆成 (分区键, 最后一条用户消息)
+
+        最后一条不是用户消息时（工具调用之后的那次模型调用）分区键为 None：
+        这时要看的是工具结果而不是问题，按问题相似度命中会拿回带 tool_calls 的旧回复，导致反复调用工具
+        """
+        messages = prompt_messages(prompt, tool_calls=True)
+        if messages and messages[-1][0] != 'human':
+            return None, ''
+        last = len(messages) - 1
+        question = messages[last][1] if last >= 0 else ''
+        context = messages[:last] if last >= 0 else messages
+        if self.context_window is not None:
+            system = [m for m in context if m[0] == 'system']
+            history = [m for m in context if m[0] != 'system']
+            context = system + (history[-self.context_window:] if self.context_window else [])
+        thread_id = None
+        if self.per_thread:
+            try:
+                from langgraph.config import get_config
+                thread_id = get_config().get('configurable', {}).get('thread_id')
+            except RuntimeError:
+                pass  # 不在 LangGraph 运行时里（直接调用模型）
+        payload = [context, llm_string, None if thread_id is None else str(thread_id)]
+        digest = hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest(), question
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        key, question = self._split(prompt, llm_string)
+        if key is None:
+            with self._lock:
+                self._counters['bypassed'] += 1
+            return None
+        vec = self.embedder.embed(question)
+        with self._lock:
+            partition = self._partitions.get(key)
+            candidates = partition.index.top(vec, 5) if partition is not None else []
+            for idx, score in candidates:
+                if score < self.threshold:
+                    break
+                cached_question, value, expires_at = partition.entries[idx]
+                if not key_terms_match(question, cached_question):
+                    self._counters['guarded'] += 1
+                    continue
+                if expires_at is not None and expires_at <= time.time():
+                    self._counters['expired'] += 1
+                    continue
+                self._counters['hits'] += 1
+                self._audit.append({
+                    'query': question,
+                    'matched': cached_question,
+                    'score': round(score, 4),
+                    'time': time.time(),
+                })
+                return value
+            self._counters['misses'] += 1
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence) -> None:
+        key, question = self._split(prompt, llm_string)
+        if key is None:
+            return
+        vec = self.embedder.embed(question)
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        entry = (question, list(return_val), expires_at)
+        with self._lock:
+            partition = self._partitions.setdefault(key, _Partition(self.embedder.dim))
+            idx, score = partition.index.search(vec)
+            if idx >= 0 and score >= 0.9999:
+                # 同一个问题（过期后重新生成）直接覆盖
+                partition.entries[idx] = entry
+            else:
+                if partition.index.size >= self.max_entries:
+                    partition = self._compact(key, partition)
+                partition.index.add(vec)
+                partition.entries.append(entry)
+            self._counters['updates'] += 1
+
+    def _compact(self, key: str, partition: _Partition) -> _Partition:
+        """丢弃最早的一半条目，重建索引"""
+        fresh = _Partition(self.embedder.dim)
+        for question, value, expires_at in partition.entries[len(partition.entries) // 2:]:
+            fresh.index.add(self.embedder.embed(question))
+            fresh.entries.append((question, value, expires_at))
+        self._partitions[key] = fresh
+        return fresh
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def audit_log(self, below: Optional[float] = None) -> list:
+        """
+        返回命中审计记录
+
+        参数:
+            below: 只返回相似度低于该值的记录（阈值附近最容易误命中，优先抽查）
+        """
+        with self._lock:
+            records = list(self._audit)
+        if below is not None:
+            records = [r for r in records if r['score'] < below]
+        return records
+
+    def report_false_hit(self, query: str) -> int:
+        """人工确认某次命中是误命中时调用：标记审计记录并计入 false_hit_rate，返回新标记的记录数"""
+        with self._lock:
+            marked = 0
+            for record in self._audit:
+                if record['query'] == query and not record.get('false_hit'):
+                    record['false_hit'] = True
+                    marked += 1
+            self._counters['false_hits'] += marked
+            return marked
+
+    def stats(self) -> dict:
+        """
+        hits / misses / expired / updates / false_hits / bypassed（工具结果之后不查缓存）/
+        guarded（相似度够但关键词不一致而放弃的候选）/ hit_rate / false_hit_rate / size
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            counters['size'] = sum(p.index.size for p in self._partitions.values())
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = counters['hits'] / lookups if lookups else 0.0
+        counters['false_hit_rate'] = counters['false_hits'] / counters['hits'] if counters['hits'] else 0.0
+        return counters
+
+
+if __name__ == '__main__':
+    result = calibrate()
+    print(f"校准阈值：{result['threshold']}（默认 {DEFAULT_THRESHOLD}）")
+    for name in ('hits', 'misses', 'false_hits'):
+        print(f'\n{name}：')
+        for a, b, score in result[name]:
+            print(f'  {a} vs {b}：{score}')
@@ -0,0 +1,126 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+异步多会话调度
+==============
+
+不同 thread_id 的会话互不共享状态，可以并发；同一个 thread_id 的多轮必须严格按顺序，
+否则后一轮读不到前一轮写入 checkpointer 的记忆。
+
+SessionDriver：
+1. 每个 thread_id 一把 asyncio.Lock（FIFO），同一会话的轮次按提交顺序串行
+2. 全局 asyncio.Semaphore 限制同时在跑的模型调用数
+3. 先拿会话锁、再拿全局名额：排队等同一会话的请求不会占用全局名额（避免队头阻塞）
+4. 会话空闲后自动删除它的锁，成千上万个 thread_id 也不会堆积
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Optional, Sequence, Union
+
+
+class SessionDriver:
+    """
+    参数:
+        agent: 带 checkpointer 的 Agent（create_agent 的返回值）
+        max_concurrency: 同时进行的模型调用上限
+    """
+
+    def __init__(self, agent, max_concurrency: int = 64):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._locks: dict = {}
+        self._refs: dict = {}
+        self.running = 0
+
+    @staticmethod
+    def _inputs(message: Union[str, dict]) -> dict:
+        if isinstance(message, str):
+            message = {'role': 'user', 'content': message}
+        return {'messages': [message]}
+
+    @staticmethod
+    def _config(thread_id: str, config: Optional[dict]) -> dict:
+        config = dict(config or {})
+        config['configurable'] = {**config.get('configurable', {}), 'thread_id': thread_id}
+        return config
+
+    def _lock_for(self, thread_id: str) -> asyncio.Lock:
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = self._locks[thread_id] = asyncio.Lock()
+        self._refs[thread_id] = self._refs.get(thread_id, 0) + 1
+        return lock
+
+    def _release(self, thread_id: str):
+        self._refs[thread_id] -= 1
+        if not self._refs[thread_id]:
+            del self._refs[thread_id]
+            del self._locks[thread_id]
+
+    async def send(self, thread_id: str, message: Union[str, dict], config: Optional[dict] = None) -> dict:
+        """
+        提交一轮对话并等待结果
+
+        参数:
+            thread_id: 会话 ID
+            message: 用户消息（字符串或 {"role": ..., "content": ...}）
+            config: 额外配置，thread_id 会自动填入
+
+        返回:
+            Agent 的完整状态（含 messages）
+        """
+        lock = self._lock_for(thread_id)
+        try:
+            async with lock:
+                async with self._semaphore:
+                    self.running += 1
+                    try:
+                        return await self.agent.ainvoke(self._inputs(message), config=self._config(thread_id, config))
+                    finally:
+                        self.running -= 1
+        finally:
+            self._release(thread_id)
+
+    async def stream(
+            self,
+            thread_id: str,
+            message: Union[str, dict],
+            config: Optional[dict] = None,
+            stream_mode: str = 'messages',
+    ) -> AsyncIterator[Any]:
+        """与 send 相同的排队规则，但逐块产出 astream 的结果"""
+        lock = self._lock_for(thread_id)
+        try:
+            async with lock:
+                async with self._semaphore:
+                    self.running += 1
+                    try:
+                        async for chunk in self.agent.astream(
+                                self._inputs(message), config=self._config(thread_id, config), stream_mode=stream_mode
+                        ):
+                            yield chunk
+                    finally:
+                        self.running -= 1
+        finally:
+            self._release(thread_id)
+
+    async def run(self, turns: Sequence[tuple], return_exceptions: bool = True) -> list:
+        """
+        批量提交 [(thread_id, message), ...]
+
+        不同会话并发，同一会话按列表中的先后顺序执行；返回结果与 turns 顺序一致
+        """
+        tasks = [asyncio.create_task(self.send(thread_id, message)) for thread_id, message in turns]
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    def stats(self) -> dict:
+        """active_threads：有请求在跑或在排队的会话数；running：正在调用模型的请求数"""
+        return {
+            'active_threads': len(self._locks),
+            'queued_turns': sum(self._refs.values()),
+            'running': self.running,
+            'max_concurrency': self.max_concurrency,
+        }
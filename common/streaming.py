@@ -0,0 +1,252 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+逐 token 流式输出与首字延迟统计
+==============================
+
+问题：agent.stream(..., stream_mode="updates") 要等一个节点（一次完整的模型调用）结束才产出，
+模型设置了 streaming=True 也看不到逐字输出；用户感受到的等待时间其实是首个 token 的延迟（TTFT）。
+
+做法：用 stream_mode="messages" 消费模型节点产出的 AIMessageChunk，每来一块就渲染，并按轮记录：
+- ttft：从提交到第一个文本 token 的时间（含前面的工具调用轮次，即用户实际等待的时间）
+- itl：同一次模型调用内相邻两块之间的间隔（inter-token latency），跨工具调用的空档不计
+- tokens_per_sec：输出 token 数 / 各次模型调用从首块到末块的生成时间之和
+  输出 token 数优先取流式 usage_metadata（接口在最后一块返回 usage 时），否则按块数估算
+
+用法：
+    metrics = StreamMetrics()
+    turn = stream_turn(agent, {"messages": [{"role": "user", "content": "北京天气如何？"}]}, metrics=metrics)
+    print(turn.as_dict())        # 本轮：ttft / itl / tokens_per_sec ...
+    print(metrics.stats())       # 多轮汇总：p50 / p95
+
+    # 异步（服务端）
+    turn = await astream_turn(agent, inputs, config=config, on_token=send_to_client)
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+# 只渲染模型节点产出的文本；create_agent 的模型节点名为 "model"
+MODEL_NODES = ('model', 'agent')
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def print_token(text: str) -> None:
+    """默认的渲染：直接写到终端，不换行"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def print_tool(name: str, content: str) -> None:
+    """默认的工具结果渲染"""
+    preview = content if len(content) <= 80 else content[:80] + '...'
+    print(f'\n[工具 {name}] {preview}', flush=True)
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    # 多模态 / 分块内容：只取文本块
+    return ''.join(part.get('text', '') for part in content if isinstance(part, dict) and part.get('type') == 'text')
+
+
+class TurnMetrics:
+    """
+    一轮对话（一次 stream_turn）的流式指标
+
+    时间单位均为秒；text 为本轮渲染出的全部文本（多次模型调用拼接）
+    """
+
+    __slots__ = ('start', 'end', 'first_token', 'chunks', 'output_tokens', 'usage_tokens', 'model_calls',
+                 'tool_calls', 'generation_time', 'gaps', 'text', '_call_id', '_call_first', '_call_last')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.chunks = 0
+        self.output_tokens = 0
+        self.usage_tokens = 0
+        self.model_calls = 0
+        self.tool_calls = 0
+        self.generation_time = 0.0
+        self.gaps: list = []
+        self.text = ''
+        self._call_id = None
+        self._call_first: Optional[float] = None
+        self._call_last: Optional[float] = None
+
+    def _finish_call(self):
+        if self._call_first is not None:
+            self.generation_time += self._call_last - self._call_first
+        self._call_id = self._call_first = self._call_last = None
+
+    def feed(self, message, metadata: dict, on_token: Optional[Callable], on_tool: Optional[Callable]) -> None:
+        """处理 stream_mode="messages" 产出的一个 (消息块, 元数据)"""
+        now = time.perf_counter()
+        kind = getattr(message, 'type', None)
+        if kind == 'tool':
+            self._finish_call()
+            self.tool_calls += 1
+            if on_tool is not None:
+                on_tool(getattr(message, 'name', None) or '-', _text(message.content))
+            return
+        if kind not in ('AIMessageChunk', 'ai') or metadata.get('langgraph_node') not in MODEL_NODES:
+            return
+
+        if message.id != self._call_id:
+            # 新的一次模型调用
+            self._finish_call()
+            self._call_id = message.id
+            self.model_calls += 1
+        usage = getattr(message, 'usage_metadata', None)
+        if usage:
+            self.usage_tokens += usage.get('output_tokens', 0)
+
+        text = _text(message.content)
+        if not text and not getattr(message, 'tool_call_chunks', None):
+            return
+        # 文本块与工具参数块都算生成出来的 token
+        self.chunks += 1
+        if self._call_last is not None:
+            self.gaps.append(now - self._call_last)
+        if self._call_first is None:
+            self._call_first = now
+        self._call_last = now
+        if text:
+            if self.first_token is None:
+                self.first_token = now
+            self.text += text
+            if on_token is not None:
+                on_token(text)
+
+    def close(self) -> 'TurnMetrics':
+        self._finish_call()
+        self.end = time.perf_counter()
+        self.output_tokens = self.usage_tokens or self.chunks
+        return self
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token is None else self.first_token - self.start
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.output_tokens / self.generation_time if self.generation_time else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'ttft': round(self.ttft, 4) if self.ttft is not None else None,
+            'itl_p50': round(percentile(self.gaps, 0.5), 4),
+            'itl_p95': round(percentile(self.gaps, 0.95), 4),
+            'itl_max': round(max(self.gaps), 4) if self.gaps else 0.0,
+            'output_tokens': self.output_tokens,
+            'tokens_source': 'usage' if self.usage_tokens else 'chunks',
+            'tokens_per_sec': round(self.tokens_per_sec, 2),
+            'model_calls': self.model_calls,
+            'tool_calls': self.tool_calls,
+            'total_time': round((self.end or time.perf_counter()) - self.start, 4),
+        }
+
+
+class StreamMetrics:
+    """
+    多轮流式指标汇总（线程安全，可在服务端多个会话间共享）
+
+    参数:
+        window: 保留多少个最近的样本用于计算分位数
+    """
+
+    def __init__(self, window: int = 10_000):
+        self.turns = 0
+        self.output_tokens = 0
+        self.generation_time = 0.0
+        self.ttfts: deque = deque(maxlen=window)
+        self.gaps: deque = deque(maxlen=window)
+        self.totals: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, turn: TurnMetrics) -> None:
+        with self._lock:
+            self.turns += 1
+            self.output_tokens += turn.output_tokens
+            self.generation_time += turn.generation_time
+            if turn.ttft is not None:
+                self.ttfts.append(turn.ttft)
+            self.gaps.extend(turn.gaps)
+            self.totals.append(turn.end - turn.start)
+
+    def stats(self) -> dict:
+        """TTFT、逐 token 间隔、整轮耗时的分位数，以及整体生成速度"""
+        with self._lock:
+            return {
+                'turns': self.turns,
+                'output_tokens': self.output_tokens,
+                'tokens_per_sec': round(self.output_tokens / self.generation_time, 2) if self.generation_time else 0.0,
+                'ttft_p50': round(percentile(self.ttfts, 0.5), 4),
+                'ttft_p95': round(percentile(self.ttfts, 0.95), 4),
+                'itl_p50': round(percentile(self.gaps, 0.5), 4),
+                'itl_p95': round(percentile(self.gaps, 0.95), 4),
+                'turn_p50': round(percentile(self.totals, 0.5), 4),
+                'turn_p95': round(percentile(self.totals, 0.95), 4),
+            }
+
+
+def stream_turn(
+        agent,
+        inputs: Any,
+        config: Optional[dict] = None,
+        on_token: Optional[Callable[[str], None]] = print_token,
+        on_tool: Optional[Callable[[str, str], None]] = print_tool,
+        metrics: Optional[StreamMetrics] = None,
+) -> TurnMetrics:
+    """
+    以 stream_mode="messages" 运行一轮，边生成边渲染
+
+    参数:
+        agent: create_agent 的返回值（或任何 LangGraph 图）
+        inputs: 输入，如 {"messages": [...]}
+        config: 运行配置（thread_id、callbacks 等）
+        on_token: 每个文本块的回调，None 表示不渲染
+        on_tool: 每个工具结果的回调 (工具名, 内容)，None 表示不渲染
+        metrics: 可选的汇总器，本轮结束后加入
+
+    返回:
+        TurnMetrics（含本轮文本与指标）
+    """
+    turn = TurnMetrics()
+    for message, metadata in agent.stream(inputs, config=config, stream_mode='messages'):
+        turn.feed(message, metadata, on_token, on_tool)
+    turn.close()
+    if metrics is not None:
+        metrics.add(turn)
+    return turn
+
+
+async def astream_turn(
+        agent,
+        inputs: Any,
+        config: Optional[dict] = None,
+        on_token: Optional[Callable[[str], None]] = print_token,
+        on_tool: Optional[Callable[[str, str], None]] = print_tool,
+        metrics: Optional[StreamMetrics] = None,
+) -> TurnMetrics:
+    """stream_turn 的异步版本（agent.astream），参数相同"""
+    turn = TurnMetrics()
+    async for message, metadata in agent.astream(inputs, config=config, stream_mode='messages'):
+        turn.feed(message, metadata, on_token, on_tool)
+    turn.close()
+    if metrics is not None:
+        metrics.add(turn)
+    return turn
@@ -0,0 +1,617 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+后台（非阻塞）摘要中间件
+========================
+
+问题：SummarizationMiddleware 在 before_model 里同步调用摘要模型，触发阈值的那一轮
+用户要多等一整次 LLM 往返。
+
+BackgroundSummarizationMiddleware（SummarizationMiddleware 的子类，参数相同）：
+1. after_agent：本轮回复结束后判断是否达到 trigger，达到则把"旧消息 -> 摘要"提交到后台线程池
+   （每个 thread_id 同时只有一个任务）
+2. before_model：下一轮开始时如果摘要已经完成，用"摘要 + 保留的消息"替换历史；没完成就不等
+3. wrap_model_call：摘要还没就绪而历史已超过 fallback_max_tokens 时，只对本次模型调用做
+   trim_messages 裁剪（不改动 state），保证请求不会超长
+
+这样用户看到的延迟永远不包含摘要调用。
+
+用法：
+    summarizer = BackgroundSummarizationMiddleware(model=model, trigger=("tokens", 3000))
+    agent = create_agent(model=model, tools=[...], checkpointer=..., middleware=[summarizer])
+
+滚动摘要（RollingSummaryStore / RollingSummarizationMiddleware）
+--------------------------------------------------------------
+SummarizationMiddleware 每次触发都把"旧摘要 + 所有待摘要消息"整段重新读一遍，摘要本身也会越写越长。
+RollingSummaryStore 按会话保存一份摘要：
+1. 只把新"过期"的消息折叠进已有摘要（记录最后一条已覆盖消息的 id，它和之前的消息不会再读；
+   历史只在末尾追加，所以一个 id 就够，内存不随轮数增长）
+2. 新消息太多时按 max_fold_tokens 分批折叠，每次模型调用的输入有上限
+3. 摘要超过 max_summary_tokens 时把摘要自身再压缩；压缩结果仍然超出就再压缩一次，
+   还超出则直接截断到 max_summary_tokens，摘要大小有硬上限
+4. 摘要消息使用固定 id（rolling-summary:<thread_id>），每次替换同一条消息
+5. 摘要随消息一起保存在 checkpointer 的 state 里；折叠前先用 state 中的摘要消息同步（sync），
+   进程重启、换用 SqliteSaver 或多个服务进程共用会话时，摘要不会丢失，追加段的编号也会接着往下排
+
+这样每轮摘要的成本与对话总长度无关。BackgroundSummarizationMiddleware 也可以传入 store 使用滚动摘要。
+
+两个中间件只借用 SummarizationMiddleware 的构造参数（trigger、keep、token_counter、summary_prompt 等公开属性），
+触发判断、保留消息的切分点和整段摘要都在 _SummaryPolicy 里按这些公开属性实现，
+不依赖父类的私有方法，升级 langchain 时不会因为内部重构而失效。
+
+append_only=True（追加模式，配合供应商的前缀缓存）：
+每次折叠不改写已有摘要，而是为新过期的消息生成一段新的摘要追加在后面
+（rolling-summary:<thread_id>、rolling-summary:<thread_id>#1、#2 ……），
+已有摘要段逐字节不变，请求前缀（系统提示 + 旧摘要段）可以继续命中缓存；
+各段总长超过 max_summary_tokens 时才合并压缩成一段（此时前缀缓存失效一次）。
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+from langchain.agents.middleware import SummarizationMiddleware
+from langchain_core.messages import (
+    AIMessage, HumanMessage, RemoveMessage, ToolMessage, get_buffer_string, trim_messages,
+)
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from common.token_counter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ID_PREFIX = 'rolling-summary:'
+_SUMMARY_HEADER = '以下是此前对话的摘要：\n\n'
+_CONTINUED_HEADER = '此前对话的摘要（续）：\n\n'
+
+FOLD_PROMPT = """你在维护一段对话的滚动摘要。
+请把"新增对话"中的重要信息合并进"已有摘要"，输出更新后的完整摘要：
+- 保留用户的身份、偏好、目标、已做出的决定和未完成的事项
+- 删除寒暄和重复内容，不要编造
+- 只输出摘要正文
+
+<已有摘要>
+{summary}
+</已有摘要>
+
+<新增对话>
+{messages}
+</新增对话>"""
+
+CHUNK_PROMPT = """你在为一段对话分段写摘要。请为"新增对话"写一段摘要：
+- 只写新增对话里的重要信息（身份、偏好、目标、决定、未完成事项），已有摘要里有的不要重复
+- 删除寒暄，不要编造
+- 只输出摘要正文
+
+<已有摘要>
+{summary}
+</已有摘要>
+
+<新增对话>
+{messages}
+</新增对话>"""
+
+COMPRESS_PROMPT = """下面的对话摘要太长了，请在保留关键事实（身份、偏好、目标、决定、未完成事项）的前提下，
+压缩到 {max_tokens} 个 token 以内。只输出压缩后的摘要正文。
+
+<摘要>
+{summary}
+</摘要>"""
+
+_SUMMARY_CONFIG = {'metadata': {'lc_source': 'summarization'}, 'tags': ['summarization']}
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """保留开头、按 estimate_tokens 截断到 max_tokens 以内（二分查找截断位置）"""
+    marker = '……'
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid] + marker) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + marker
+
+
+def thread_key(messages: Sequence) -> Optional[str]:
+    """优先用 thread_id 区分会话；拿不到（未配置 checkpointer）时退化为第一条消息的 id"""
+    try:
+        from langgraph.config import get_config
+        thread_id = get_config().get('configurable', {}).get('thread_id')
+    except RuntimeError:
+        thread_id = None
+    if thread_id is not None:
+        return str(thread_id)
+    if not messages:
+        return None
+    first_id = messages[0].id or ''
+    # 第一条是摘要消息时，它的 id 就是 SUMMARY_ID_PREFIX + 会话标识
+    return first_id[len(SUMMARY_ID_PREFIX):] if first_id.startswith(SUMMARY_ID_PREFIX) else first_id
+
+
+def is_summary_message(message: Any) -> bool:
+    """滚动摘要或 SummarizationMiddleware 生成的摘要消息"""
+    if (message.id or '').startswith(SUMMARY_ID_PREFIX):
+        return True
+    return message.additional_kwargs.get('lc_source') == 'summarization'
+
+
+@dataclass
+class RollingSummary:
+    text: str = ''
+    chunks: list = field(default_factory=list)  # 追加模式下的各段摘要
+    last_covered_id: Optional[str] = None  # 最后一条已折叠进摘要的消息
+    covered: int = 0
+    folds: int = 0
+    compressions: int = 0
+    truncations: int = 0
+
+
+class RollingSummaryStore:
+    """
+    参数:
+        model: 生成摘要的模型
+        max_summary_tokens: 摘要大小上限（硬上限），超过后把摘要再压缩，压缩不下来就截断
+        max_fold_tokens: 单次折叠最多读入多少 token 的新消息，超过则分批
+        append_only: 追加模式，已有摘要段不再改写，新摘要作为新的一段追加
+    """
+
+    def __init__(
+            self,
+            model,
+            *,
+            max_summary_tokens: int = 800,
+            max_fold_tokens: int = 4000,
+            append_only: bool = False,
+    ):
+        self.model = model
+        self.max_summary_tokens = max_summary_tokens
+        self.max_fold_tokens = max_fold_tokens
+        self.append_only = append_only
+        self._summaries: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, thread_id: str) -> RollingSummary:
+        with self._lock:
+            return self._summaries.setdefault(thread_id, RollingSummary())
+
+    def sync(self, thread_id: str, messages: Sequence) -> RollingSummary:
+        """
+        以 state 为准：messages 中该会话的摘要消息与内存里的摘要不一致时（进程重启、其它进程写过），
+        用摘要消息重建；被折叠过的消息已经从 state 里删掉，所以重建后 last_covered_id 从空开始
+
+        参数:
+            messages: 会话的完整消息列表（state['messages']）
+        """
+        prefix = SUMMARY_ID_PREFIX + str(thread_id)
+        found = []
+        for message in messages:
+            message_id = message.id or ''
+            suffix = message_id[len(prefix) + 1:]
+            if message_id == prefix or (message_id.startswith(prefix + '#') and suffix.isdigit()):
+                index = int(suffix or 0)
+                text = message.text
+                for header in (_SUMMARY_HEADER, _CONTINUED_HEADER):
+                    if text.startswith(header):
+                        text = text[len(header):]
+                        break
+                found.append((index, text))
+        chunks = [text for _, text in sorted(found)]
+
+        summary = self.get(thread_id)
+        current = summary.chunks if self.append_only else [summary.text] if summary.text else []
+        if chunks != current:
+            summary.text = '\n'.join(chunks)
+            summary.chunks = chunks if self.append_only else []
+            summary.last_covered_id = None
+        return summary
+
+    def _invoke(self, prompt: str) -> str:
+        return self.model.invoke(prompt, config=_SUMMARY_CONFIG).text.strip()
+
+    def _batches(self, messages: list):
+        batch, tokens = [], 0
+        for message in messages:
+            size = estimate_tokens(get_buffer_string([message]))
+            if batch and tokens + size > self.max_fold_tokens:
+                yield batch
+                batch, tokens = [], 0
+            batch.append(message)
+            tokens += size
+        if batch:
+            yield batch
+
+    def fold(self, thread_id: str, messages: Sequence) -> RollingSummary:
+        """把 messages 中尚未覆盖的消息折叠进该会话的摘要（摘要消息本身会被跳过）"""
+        summary = self.get(thread_id)
+        start = next((i + 1 for i, m in enumerate(messages) if m.id == summary.last_covered_id), 0)
+        new = [m for m in messages[start:] if not is_summary_message(m)]
+        for batch in self._batches(new):
+            if self.append_only:
+                self._append_chunk(summary, batch)
+            else:
+                summary.text = self._invoke(FOLD_PROMPT.format(
+                    summary=summary.text or '（无）',
+                    messages=get_buffer_string(batch),
+                ))
+            summary.last_covered_id = batch[-1].id
+            summary.covered += len(batch)
+            summary.folds += 1
+            if estimate_tokens(summary.text) > self.max_summary_tokens:
+                self._compress(summary)
+        return summary
+
+    def _compress(self, summary: RollingSummary) -> None:
+        """压缩摘要；模型不听话（压缩后仍超出）时再压一次，最后按 max_summary_tokens 截断"""
+        text = summary.text
+        for _ in range(2):
+            text = self._invoke(COMPRESS_PROMPT.format(summary=text, max_tokens=self.max_summary_tokens // 2))
+            summary.compressions += 1
+            if estimate_tokens(text) <= self.max_summary_tokens:
+                break
+        else:
+            text = _truncate(text, self.max_summary_tokens)
+            summary.truncations += 1
+        summary.text = text
+        summary.chunks = [text] if self.append_only else []
+
+    def _append_chunk(self, summary: RollingSummary, batch: list) -> None:
+        chunk = self._invoke(CHUNK_PROMPT.format(
+            summary=summary.text or '（无）',
+            messages=get_buffer_string(batch),
+        ))
+        summary.chunks.append(chunk)
+        summary.text = '\n'.join(summary.chunks)
+
+    def messages(self, thread_id: str) -> list:
+        """该会话的摘要消息（固定 id，可直接放在历史最前面）；追加模式下每段一条"""
+        summary = self.get(thread_id)
+        chunks = summary.chunks if self.append_only else [summary.text]
+        return [
+            HumanMessage(
+                content=(_SUMMARY_HEADER if i == 0 else _CONTINUED_HEADER) + chunk,
+                id=SUMMARY_ID_PREFIX + str(thread_id) + (f'#{i}' if i else ''),
+                additional_kwargs={'lc_source': 'summarization'},
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+
+    def drop(self, thread_id: str) -> None:
+        with self._lock:
+            self._summaries.pop(thread_id, None)
+
+    def stats(self) -> dict:
+        """会话数、累计折叠 / 压缩 / 截断次数、已覆盖消息数"""
+        with self._lock:
+            summaries = list(self._summaries.values())
+        return {
+            'threads': len(summaries),
+            'folds': sum(s.folds for s in summaries),
+            'compressions': sum(s.compressions for s in summaries),
+            'truncations': sum(s.truncations for s in summaries),
+            'covered_messages': sum(s.covered for s in summaries),
+        }
+
+
+def _trigger_clauses(trigger) -> list:
+    """("tokens", 3000) / {"tokens": 3000, "messages": 10} / 两者的列表 -> 条件列表（列表内为"或"，条件内为"且"）"""
+    if trigger is None:
+        return []
+    items = trigger if isinstance(trigger, list) else [trigger]
+    return [dict([item]) if isinstance(item, tuple) else dict(item) for item in items]
+
+
+class _SummaryPolicy:
+    """
+    按 SummarizationMiddleware 的公开属性（model、trigger、keep、token_counter、summary_prompt、
+    trim_tokens_to_summarize）实现触发判断、切分点和整段摘要
+    """
+
+    def _max_input_tokens(self) -> Optional[int]:
+        profile = getattr(self.model, 'profile', None)
+        limit = profile.get('max_input_tokens') if isinstance(profile, dict) else None
+        return limit if isinstance(limit, int) else None
+
+    def _limit(self, kind: str, value) -> Optional[int]:
+        """把 ("tokens", n) / ("fraction", f) 换算成 token 数；模型没有上下文上限信息时返回 None"""
+        if kind == 'tokens':
+            return int(value)
+        max_input = self._max_input_tokens()
+        return None if max_input is None else max(int(max_input * value), 1)
+
+    def _triggered(self, messages: list) -> bool:
+        tokens = None
+        for clause in _trigger_clauses(self.trigger):
+            met = True
+            for kind, value in clause.items():
+                if kind == 'messages':
+                    met = len(messages) >= value
+                else:
+                    limit = self._limit(kind, value)
+                    if limit is not None and tokens is None:
+                        tokens = self.token_counter(messages)
+                    met = limit is not None and tokens >= limit
+                if not met:
+                    break
+            if met:
+                return True
+        return False
+
+    def _cutoff(self, messages: list) -> int:
+        """保留末尾 keep 指定的消息，返回待摘要部分的结束下标（0 表示不摘要）"""
+        kind, value = self.keep
+        limit = None if kind == 'messages' else self._limit(kind, value)
+        if limit is None:
+            keep = value if kind == 'messages' else 20
+            cutoff = len(messages) - keep if len(messages) > keep else 0
+        elif self.token_counter(messages) <= limit:
+            return 0
+        else:
+            # 二分查找：末尾能放进 limit 的最长后缀的起点；至少保留最后一条
+            low, high = 0, len(messages) - 1
+            while low < high:
+                mid = (low + high) // 2
+                if self.token_counter(messages[mid:]) <= limit:
+                    high = mid
+                else:
+                    low = mid + 1
+            cutoff = low
+        return self._safe_cutoff(messages, cutoff)
+
+    @staticmethod
+    def _safe_cutoff(messages: list, cutoff: int) -> int:
+        """切分点落在 ToolMessage 上时前移到发起这些调用的 AIMessage，工具调用和结果不被拆开"""
+        if cutoff >= len(messages) or not isinstance(messages[cutoff], ToolMessage):
+            return cutoff
+        end = cutoff
+        call_ids = set()
+        while end < len(messages) and isinstance(messages[end], ToolMessage):
+            call_ids.add(messages[end].tool_call_id)
+            end += 1
+        for i in range(cutoff - 1, -1, -1):
+            message = messages[i]
+            if isinstance(message, AIMessage) and call_ids & {call.get('id') for call in message.tool_calls}:
+                return i
+        return end
+
+    @staticmethod
+    def _assign_ids(messages: list) -> None:
+        """add_messages 按 id 替换 / 删除消息，摘要前先给没有 id 的消息补上"""
+        for message in messages:
+            if message.id is None:
+                message.id = str(uuid.uuid4())
+
+    def _summary_text(self, messages: list) -> str:
+        """不使用滚动摘要时：把待摘要的消息整段交给模型"""
+        if self.trim_tokens_to_summarize is not None:
+            messages = trim_messages(
+                messages,
+                max_tokens=self.trim_tokens_to_summarize,
+                token_counter=self.token_counter,
+                start_on='human',
+                strategy='last',
+                allow_partial=True,
+                include_system=True,
+            ) or messages[-15:]
+        prompt = self.summary_prompt.format(messages=get_buffer_string(messages)).rstrip()
+        return self.model.invoke(prompt, config=_SUMMARY_CONFIG).text.strip()
+
+    @staticmethod
+    def _summary_messages(summary: str) -> list:
+        return [HumanMessage(content=_SUMMARY_HEADER + summary, additional_kwargs={'lc_source': 'summarization'})]
+
+
+class RollingSummarizationMiddleware(_SummaryPolicy, SummarizationMiddleware):
+    """
+    SummarizationMiddleware 的滚动摘要版本（同步执行，参数相同）
+
+    参数:
+        store: RollingSummaryStore，默认用 model 新建一个
+        max_summary_tokens、max_fold_tokens、append_only: 新建 store 时使用
+    """
+
+    def __init__(
+            self,
+            model,
+            *,
+            store: Optional[RollingSummaryStore] = None,
+            max_summary_tokens: int = 800,
+            max_fold_tokens: int = 4000,
+            append_only: bool = False,
+            **kwargs: Any,
+    ):
+        super().__init__(model, **kwargs)
+        self.store = store or RollingSummaryStore(
+            self.model,
+            max_summary_tokens=max_summary_tokens,
+            max_fold_tokens=max_fold_tokens,
+            append_only=append_only,
+        )
+
+    def _summarize(self, messages: list) -> Optional[dict]:
+        self._assign_ids(messages)
+        if not self._triggered(messages):
+            return None
+        cutoff = self._cutoff(messages)
+        if cutoff <= 0:
+            return None
+        key = thread_key(messages)
+        self.store.sync(key, messages)
+        self.store.fold(key, messages[:cutoff])
+        return {
+            'messages': [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                *self.store.messages(key),
+                *messages[cutoff:],
+            ]
+        }
+
+    def before_model(self, state, runtime) -> Optional[dict]:
+        return self._summarize(state['messages'])
+
+    async def abefore_model(self, state, runtime) -> Optional[dict]:
+        import asyncio
+        return await asyncio.to_thread(self._summarize, state['messages'])
+
+
+class _Job:
+    __slots__ = ('future', 'last_id')
+
+    def __init__(self, future: Future, last_id: str):
+        self.future = future
+        self.last_id = last_id  # 被摘要的最后一条消息的 id
+
+
+class BackgroundSummarizationMiddleware(_SummaryPolicy, SummarizationMiddleware):
+    """
+    参数:
+        model、trigger、keep、token_counter 等: 同 SummarizationMiddleware
+        fallback_max_tokens: 摘要未就绪时，单次模型调用允许的最大历史 token 数；
+            默认取 trigger 里的 ("tokens", n)，没有则不裁剪
+        max_workers: 后台摘要线程数
+        store: 传入 RollingSummaryStore 时使用滚动摘要，否则每次整段重新摘要
+    """
+
+    def __init__(
+            self,
+            model,
+            *,
+            fallback_max_tokens: Optional[int] = None,
+            max_workers: int = 2,
+            store: Optional[RollingSummaryStore] = None,
+            **kwargs: Any,
+    ):
+        super().__init__(model, **kwargs)
+        self.store = store
+        if fallback_max_tokens is None:
+            fallback_max_tokens = next(
+                (clause['tokens'] for clause in _trigger_clauses(self.trigger) if 'tokens' in clause), None
+            )
+        self.fallback_max_tokens = fallback_max_tokens
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summarize')
+        self._jobs: dict = {}
+        self._lock = threading.Lock()
+        self.counters = {'scheduled': 0, 'applied': 0, 'discarded': 0, 'failed': 0, 'fallback_trims': 0}
+
+    # ------------------------------------------------------------------ 下一轮：应用已完成的摘要
+
+    def _apply_ready_summary(self, messages: list) -> Optional[dict]:
+        key = thread_key(messages)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or not job.future.done():
+                return None
+            del self._jobs[key]
+
+        try:
+            summary = job.future.result()
+        except Exception:
+            logger.exception('后台摘要失败（thread=%s），本轮继续使用完整历史', key)
+            self._count('failed')
+            return None
+
+        # 摘要期间历史只会在末尾追加；找不到分界消息说明历史被改写过（如清空会话），丢弃这次结果
+        index = next((i for i, m in enumerate(messages) if m.id == job.last_id), None)
+        if index is None:
+            self._count('discarded')
+            return None
+
+        self._count('applied')
+        summary_messages = self.store.messages(key) if self.store is not None else self._summary_messages(summary)
+        return {
+            'messages': [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                *summary_messages,
+                *messages[index + 1:],
+            ]
+        }
+
+    def before_model(self, state, runtime) -> Optional[dict]:
+        return self._apply_ready_summary(state['messages'])
+
+    async def abefore_model(self, state, runtime) -> Optional[dict]:
+        return self._apply_ready_summary(state['messages'])
+
+    # ------------------------------------------------------------------ 本轮结束：调度后台摘要
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _schedule(self, messages: list) -> None:
+        self._assign_ids(messages)
+        if not self._triggered(messages):
+            return
+        cutoff = self._cutoff(messages)
+        if cutoff <= 0:
+            return
+
+        key = thread_key(messages)
+        with self._lock:
+            if key in self._jobs:
+                return  # 上一个任务还没被应用，不重复提交
+            to_summarize = list(messages[:cutoff])
+            if self.store is not None:
+                self.store.sync(key, messages)
+                future = self._executor.submit(self.store.fold, key, to_summarize)
+            else:
+                future = self._executor.submit(self._summary_text, to_summarize)
+            self._jobs[key] = _Job(future, to_summarize[-1].id)
+            self.counters['scheduled'] += 1
+
+    def after_agent(self, state, runtime) -> None:
+        self._schedule(state['messages'])
+
+    async def aafter_agent(self, state, runtime) -> None:
+        self._schedule(state['messages'])
+
+    # ------------------------------------------------------------------ 摘要未就绪：只裁剪本次请求
+
+    def _trim_request(self, request):
+        if self.fallback_max_tokens is None or self.token_counter(request.messages) <= self.fallback_max_tokens:
+            return request
+        trimmed = trim_messages(
+            request.messages,
+            max_tokens=self.fallback_max_tokens,
+            strategy='last',
+            token_counter=self.token_counter,
+            start_on='human',
+            allow_partial=False,
+        )
+        if not trimmed:
+            return request
+        self._count('fallback_trims')
+        return request.override(messages=trimmed)
+
+    def wrap_model_call(self, request, handler: Callable):
+        return handler(self._trim_request(request))
+
+    async def awrap_model_call(self, request, handler: Callable):
+        return await handler(self._trim_request(request))
+
+    # ------------------------------------------------------------------ 其它
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """等待所有进行中的后台摘要完成（测试、演示或退出前使用）"""
+        with self._lock:
+            futures = [job.future for job in self._jobs.values()]
+        for future in futures:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        """已调度 / 已应用 / 丢弃 / 失败的摘要数，以及兜底裁剪次数"""
+        with self._lock:
+            pending = sum(not job.future.done() for job in self._jobs.values())
+            return {**self.counters, 'pending': pending}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,178 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+离线 token 计数器（近似 DeepSeek 分词，针对中英混排调过）
+=========================================================
+
+问题：
+1. trim_messages(token_counter=len) 数的是消息条数，不是 token
+2. SummarizationMiddleware(trigger=("tokens", 3000)) 每轮都要把整段历史重新数一遍，O(n)/轮
+
+TokenCounter：
+1. 单条消息的计数按 message.id 缓存（内容长度变了会自动重算；没有 id 的按内容缓存）
+2. 对同一段会话维护累计值：新列表只是在上次的基础上往后追加时，只数新增的消息
+3. 可以直接作为 trim_messages / SummarizationMiddleware 的 token_counter
+
+用法：
+    counter = TokenCounter()
+    trim_messages(messages, max_tokens=1000, strategy="last", token_counter=counter)
+    SummarizationMiddleware(model=model, trigger=("tokens", 3000), token_counter=counter)
+
+估算规则（DeepSeek 官方经验值：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token）：
+- 中文字符 0.6；英文单词按字母数 × 0.3，至少 1；数字每 3 位 1 个；标点 0.5；空白不计
+- 每条消息另加 MESSAGE_OVERHEAD（角色、分隔符等）
+"""
+
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable
+
+# 每条消息的固定开销（角色标记、分隔符）
+MESSAGE_OVERHEAD = 4
+
+_TOKEN_RE = re.compile(
+    r'(?P<cjk>[一-鿿㐀-䶿])|(?P<word>[A-Za-z]+)|(?P<digit>\d+)|(?P<space>\s+)|(?P<punct>.)',
+    re.S,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算一段文本的 token 数（非空文本至少为 1）
+    """
+    if not text:
+        return 0
+    total = 0.0
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'cjk':
+            total += 0.6
+        elif kind == 'word':
+            total += max(1.0, len(match.group()) * 0.3)
+        elif kind == 'digit':
+            total += math.ceil(len(match.group()) / 3)
+        elif kind == 'punct':
+            total += 0.5
+    return max(1, math.ceil(total))
+
+
+def message_text(message: Any) -> str:
+    """取出消息里参与计数的文本：content（含多段内容块）+ tool_calls 的名字与参数"""
+    content = message.content
+    if isinstance(content, str):
+        parts = [content]
+    else:
+        parts = []
+        for block in content or ():
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and isinstance(block.get('text'), str):
+                parts.append(block['text'])
+    for call in getattr(message, 'tool_calls', None) or ():
+        parts.append(call.get('name') or '')
+        parts.append(json.dumps(call.get('args') or {}, ensure_ascii=False))
+    return '\n'.join(parts)
+
+
+def _signature(message: Any) -> tuple:
+    """廉价的"内容是否变了"指纹：同一个 id 的消息被改写时用来识别失效"""
+    content = message.content
+    return message.type, len(content) if content else 0, len(getattr(message, 'tool_calls', None) or ())
+
+
+class TokenCounter:
+    """
+    带缓存的 token 计数器，可直接当作 token_counter 传入
+
+    参数:
+        maxsize: 单条消息计数缓存的容量
+        max_sessions: 累计值缓存的会话数（按第一条消息的 id 区分会话）
+    """
+
+    def __init__(self, maxsize: int = 65536, max_sessions: int = 1024):
+        self.maxsize = maxsize
+        self.max_sessions = max_sessions
+        self._memo: OrderedDict = OrderedDict()  # message.id 或 (type, content) -> (指纹, token 数)
+        self._totals: OrderedDict = OrderedDict()  # 第一条消息 id -> (条数, 最后一条 id, 累计 token)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+
+    def count_message(self, message: Any) -> int:
+        """单条消息的 token 数（含 MESSAGE_OVERHEAD）"""
+        key = getattr(message, 'id', None)
+        if key is None:
+            # 没有 id 的纯文本消息按内容缓存（str 的哈希值会被缓存，重复查找几乎没有开销）
+            if not isinstance(message.content, str) or getattr(message, 'tool_calls', None):
+                self.misses += 1
+                return estimate_tokens(message_text(message)) + MESSAGE_OVERHEAD
+            key = (message.type, message.content)
+
+        signature = _signature(message)
+        with self._lock:
+            cached = self._memo.get(key)
+            if cached is not None and cached[0] == signature:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+
+        tokens = estimate_tokens(message_text(message)) + MESSAGE_OVERHEAD
+        with self._lock:
+            self.misses += 1
+            self._memo[key] = (signature, tokens)
+            if len(self._memo) > self.maxsize:
+                self._memo.popitem(last=False)
+        return tokens
+
+    def __call__(self, messages: Iterable) -> int:
+        messages = list(messages)
+        if messages and not all(hasattr(m, 'content') for m in messages):
+            from langchain_core.messages import convert_to_messages
+            messages = convert_to_messages(messages)
+        if not messages:
+            return 0
+
+        # 快速路径：和上次同一段会话、只在末尾追加了消息，只数新增部分
+        # （判断依据是首条 id、上次最后一条 id 的位置；中间被改写但长度不变的情况请调用 reset()）
+        first_id = messages[0].id
+        previous = self._totals.get(first_id) if first_id is not None else None
+        if previous is not None:
+            count, last_id, total = previous
+            if last_id is not None and count <= len(messages) and messages[count - 1].id == last_id:
+                self.incremental += 1
+                total += sum(self.count_message(m) for m in messages[count:])
+                self._remember_total(first_id, messages, total)
+                return total
+
+        total = sum(self.count_message(m) for m in messages)
+        if first_id is not None:
+            self._remember_total(first_id, messages, total)
+        return total
+
+    def _remember_total(self, first_id: str, messages: list, total: int):
+        with self._lock:
+            self._totals[first_id] = (len(messages), messages[-1].id, total)
+            self._totals.move_to_end(first_id)
+            while len(self._totals) > self.max_sessions:
+                self._totals.popitem(last=False)
+
+    def reset(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._memo.clear()
+            self._totals.clear()
+
+    def stats(self) -> dict:
+        """单条缓存命中 / 未命中次数，以及走增量路径的次数"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'incremental': self.incremental,
+            'cached_messages': len(self._memo),
+        }
@@ -0,0 +1,189 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+工具结果缓存（TTL + LRU）
+========================
+
+get_weather、web_search、get_used_info 这类工具是纯查询：同样的参数在 TTL 内结果不变，
+而 Agent 在同一会话、甚至不同会话里经常用相同参数重复调用它们。
+
+cached_tool 装饰器放在 @tool 下面（先缓存、再注册为工具），不改变工具的名字、参数与说明：
+
+    @tool
+    @cached_tool(ttl=600, normalize={'city': normalize_city})
+    def get_weather(city: str) -> str:
+        ...
+
+特性：
+1. 每个工具单独设置 ttl（秒）与 maxsize（超出按 LRU 淘汰）
+2. normalize：参数归一化后再作为缓存键，如 {'city': normalize_city, 'query': casefold_query}；
+   也可以传一个函数，接收 {参数名: 值} 返回归一化后的字典
+3. 只缓存正常返回的结果（抛异常不缓存）；cache_if 可以进一步过滤（如"未找到"的结果不缓存）
+4. 命中率统计：tool_cache_stats() 汇总所有工具，单个工具用 get_weather.func.cache_stats()
+5. 同时支持同步函数与 async 函数
+
+注意：归一化后的参数既用作缓存键，也会传给工具函数本身（保证"北京市"和"北京"查到的是同一份结果）。
+"""
+
+import functools
+import inspect
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Union
+
+_registry: dict = {}
+
+
+def normalize_city(city: str) -> str:
+    """城市名归一化：全半角统一、去空白、去掉结尾的"市"（"北京市 " -> "北京"）"""
+    city = unicodedata.normalize('NFKC', str(city)).strip()
+    return city[:-1] if len(city) > 2 and city.endswith('市') else city
+
+
+def casefold_query(query: str) -> str:
+    """搜索词归一化：全半角统一、忽略大小写、合并连续空白"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', str(query))).strip().casefold()
+
+
+class ToolCache:
+    """
+    单个工具的结果缓存
+
+    参数:
+        ttl: 结果有效期（秒），None 表示不过期
+        maxsize: 最多缓存多少个结果
+    """
+
+    def __init__(self, ttl: Optional[float] = 300, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()  # key -> (过期时间, 结果)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key) -> tuple:
+        """返回 (是否命中, 结果)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+        return False, None
+
+    def put(self, key, value) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _freeze(value: Any):
+    """把参数值转换成可哈希的缓存键"""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def cached_tool(
+        ttl: Optional[float] = 300,
+        maxsize: int = 1024,
+        normalize: Union[dict, Callable[[dict], dict], None] = None,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+):
+    """
+    工具结果缓存装饰器（放在 @tool 下面）
+
+    参数:
+        ttl: 结果有效期（秒），None 表示不过期
+        maxsize: 最多缓存多少个结果，超出按 LRU 淘汰
+        normalize: {参数名: 归一化函数}，或接收全部参数字典、返回归一化字典的函数
+        cache_if: 判断结果是否值得缓存，默认全部缓存
+    """
+
+    def decorator(func: Callable) -> Callable:
+        cache = ToolCache(ttl=ttl, maxsize=maxsize)
+        signature = inspect.signature(func)
+
+        def prepare(args: tuple, kwargs: dict) -> tuple:
+            """参数归一化，返回 (缓存键, 归一化后的参数)"""
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            values = dict(bound.arguments)
+            if callable(normalize):
+                values = normalize(values)
+            elif normalize:
+                values = {k: normalize[k](v) if k in normalize and v is not None else v for k, v in values.items()}
+            bound.arguments.update(values)
+            return tuple((k, _freeze(v)) for k, v in sorted(values.items())), bound
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                key, bound = prepare(args, kwargs)
+                hit, value = cache.get(key)
+                if hit:
+                    return value
+                value = await func(*bound.args, **bound.kwargs)
+                if cache_if is None or cache_if(value):
+                    cache.put(key, value)
+                return value
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key, bound = prepare(args, kwargs)
+                hit, value = cache.get(key)
+                if hit:
+                    return value
+                value = func(*bound.args, **bound.kwargs)
+                if cache_if is None or cache_if(value):
+                    cache.put(key, value)
+                return value
+
+        wrapper.cache = cache
+        wrapper.cache_stats = cache.stats
+        wrapper.cache_clear = cache.clear
+        _registry[f'{func.__module__}.{func.__qualname__}'] = cache  # 不同模块里的同名函数各自一份
+        return wrapper
+
+    return decorator
+
+
+def tool_cache_stats() -> dict:
+    """所有带缓存的工具的命中统计：{模块.函数限定名: stats}"""
+    return {name: cache.stats() for name, cache in _registry.items()}
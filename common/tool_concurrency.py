@@ -0,0 +1,135 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+工具调用并发上限与超时
+======================
+
+"北京天气如何？顺便算一下 100 加 50" 这类问题，模型一次会给出多个互不依赖的 tool_calls。
+create_agent 已经把同一条 AIMessage 里的每个 tool_call 作为一个独立任务（Send）放在同一步执行：
+同步调用时在线程池里并行、异步调用时 asyncio 并发，ToolMessage 按 tool_calls 的顺序写回。
+
+缺的是两件事，由 ToolConcurrencyMiddleware（wrap_tool_call / awrap_tool_call）补上：
+1. 并发上限：所有会话共享一个信号量，后端接口扛不住时限制同时执行的工具调用数
+2. 单次调用超时：超时后返回 status="error" 的 ToolMessage，模型可以据此换个办法或直接回答，
+   不会因为一个慢工具卡住整轮对话
+
+说明：同步工具超时后，正在执行的线程无法被强行终止，会在后台跑完（并继续占用并发名额直到结束）；
+async 工具超时会被取消。
+
+用法：
+    agent = create_agent(
+        model=model,
+        tools=[get_weather, calculator],
+        middleware=[ToolConcurrencyMiddleware(max_concurrency=8, timeout=10, timeouts={"web_search": 5})],
+    )
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    """
+    参数:
+        max_concurrency: 同时执行的工具调用数上限（所有会话共享）
+        timeout: 默认的单次调用超时（秒），None 表示不限
+        timeouts: 按工具名单独设置的超时，如 {"web_search": 5}
+    """
+
+    def __init__(self, max_concurrency: int = 8, timeout: Optional[float] = 30, timeouts: Optional[dict] = None):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._async_loop = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='tool')
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'timeouts': 0, 'running': 0, 'max_running': 0}
+
+    def _timeout_for(self, request) -> Optional[float]:
+        return self.timeouts.get(request.tool_call['name'], self.timeout)
+
+    @staticmethod
+    def _timeout_message(request, timeout: float) -> ToolMessage:
+        name = request.tool_call['name']
+        return ToolMessage(
+            content=f'工具 {name} 调用超时（超过 {timeout:g} 秒），请稍后重试或换一种方式回答',
+            tool_call_id=request.tool_call['id'],
+            name=name,
+            status='error',
+        )
+
+    def _enter(self):
+        with self._lock:
+            self.counters['calls'] += 1
+            self.counters['running'] += 1
+            self.counters['max_running'] = max(self.counters['max_running'], self.counters['running'])
+
+    def _exit(self, *_):
+        with self._lock:
+            self.counters['running'] -= 1
+
+    # ------------------------------------------------------------------ 同步
+
+    def wrap_tool_call(self, request, handler: Callable):
+        timeout = self._timeout_for(request)
+        self._semaphore.acquire()
+        self._enter()
+        if timeout is None:
+            try:
+                return handler(request)
+            finally:
+                self._exit()
+                self._semaphore.release()
+
+        # 在独立线程里执行，保留当前上下文（LangGraph 的 config 等 contextvars）
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, handler, request)
+        future.add_done_callback(self._exit)
+        future.add_done_callback(lambda _: self._semaphore.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.counters['timeouts'] += 1
+            return self._timeout_message(request, timeout)
+
+    # ------------------------------------------------------------------ 异步
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._async_semaphore is None or self._async_loop is not loop:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._async_loop = loop
+        return self._async_semaphore
+
+    async def awrap_tool_call(self, request, handler: Callable):
+        timeout = self._timeout_for(request)
+        async with self._get_async_semaphore():
+            self._enter()
+            try:
+                return await asyncio.wait_for(handler(request), timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self.counters['timeouts'] += 1
+                return self._timeout_message(request, timeout)
+            finally:
+                self._exit()
+
+    def stats(self) -> dict:
+        """累计调用数、超时数、当前与峰值并发数"""
+        with self._lock:
+            return dict(self.counters)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,116 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+共享工具包（按名字懒加载）
+========================
+
+calculator / get_weather / web_search 原来在 04、05、06 各有一份拷贝，每个 main.py 一启动就全部导入。
+现在统一放在这里，用注册表按名字解析：
+
+- 工具模块在第一次用到时才导入（@tool 在导入时才生成参数模型），没用到的工具不花启动时间
+- tool_schema(name) 第一次调用时生成 OpenAI 格式的工具定义并缓存，之后直接复用；
+  bind_tools 可以直接传 tool_schemas(...)，PrefixStableMiddleware 固定工具定义时也复用这份缓存
+- 也可以直接 `from common.tools import calculator`，同样只导入对应的模块
+
+用法：
+    from common.tools import get_tools
+    agent = create_agent(model=model, tools=get_tools("get_weather", "calculator"))
+
+新增工具：在 common/tools/ 下新建模块，然后在 _REGISTRY 里登记 "工具名": "模块名:变量名"，
+或在运行时调用 register("工具名", "包.模块:变量名")。
+模块名不要与工具名相同：导入子模块时包属性会被绑定成模块对象，from common.tools import 工具名 会拿到模块。
+"""
+
+import importlib
+import threading
+from typing import Optional
+
+# 工具名 -> "模块:变量名"（模块相对于本包）
+_REGISTRY = {
+    'calculator': 'arithmetic:calculator',
+    'calculator_batch': 'arithmetic:calculator_batch',
+    'evaluate_expression': 'expression:evaluate_expression',
+    'get_used_info': 'user_info:get_used_info',
+    'get_weather': 'weather:get_weather',
+    'web_search': 'search:web_search',
+}
+_tools: dict = {}
+_schemas: dict = {}
+_lock = threading.RLock()
+
+__all__ = ['available_tools', 'cached_schema', 'get_tool', 'get_tools', 'register', 'tool_schema', 'tool_schemas',
+           *_REGISTRY]
+
+
+def available_tools() -> list:
+    """已登记的工具名（不会导入任何工具模块）"""
+    return list(_REGISTRY)
+
+
+def register(name: str, target: str) -> None:
+    """
+    登记一个懒加载的工具
+
+    参数:
+        name: 工具名
+        target: "模块:变量名"，模块可以是本包内的相对名或完整的包路径
+    """
+    with _lock:
+        _REGISTRY[name] = target
+        _tools.pop(name, None)
+        _schemas.pop(name, None)
+
+
+def get_tool(name: str):
+    """按名字取工具对象，第一次调用时才导入所在模块"""
+    tool = _tools.get(name)
+    if tool is not None:
+        return tool
+    with _lock:
+        if name not in _tools:
+            if name not in _REGISTRY:
+                raise KeyError(f'未登记的工具: {name}，可用的工具: {available_tools()}')
+            module_name, attr = _REGISTRY[name].split(':')
+            package = __name__ if '.' not in module_name else None
+            module = importlib.import_module(f'.{module_name}' if package else module_name, package)
+            _tools[name] = getattr(module, attr)
+        return _tools[name]
+
+
+def get_tools(*names: str) -> list:
+    """按名字取多个工具，保持给定顺序"""
+    return [get_tool(name) for name in names]
+
+
+def tool_schema(name: str) -> dict:
+    """工具的 OpenAI 格式定义（第一次调用时生成并缓存）"""
+    schema = _schemas.get(name)
+    if schema is None:
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        tool = get_tool(name)
+        with _lock:
+            schema = _schemas.setdefault(name, convert_to_openai_tool(tool))
+    return schema
+
+
+def tool_schemas(*names: str) -> list:
+    """按名字取多个工具定义，保持给定顺序（可直接传给 model.bind_tools）"""
+    return [tool_schema(name) for name in names]
+
+
+def cached_schema(tool) -> Optional[dict]:
+    """tool 是注册表里已加载的那个工具对象时返回它的缓存定义，否则返回 None（不会导入任何工具模块）"""
+    name = getattr(tool, 'name', None)
+    if name is None or _tools.get(name) is not tool:
+        return None
+    return tool_schema(name)
+
+
+def __getattr__(name: str):
+    # 支持 from common.tools import calculator（只导入用到的工具模块）
+    if name in _REGISTRY:
+        return get_tool(name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
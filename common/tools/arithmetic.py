@@ -0,0 +1,171 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+自定义工具：计算器
+==================
+
+演示带多个参数的工具；calculator_batch 为批量版本（NumPy 向量化，一次调用算一批）
+"""
+
+import json
+import operator
+from typing import List, Union
+
+from langchain_core.tools import tool
+
+# 运算名 -> 二元函数（模块级，只建一次；同名的 numpy ufunc 用于批量计算）
+OPERATIONS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+}
+_SUPPORTED = ", ".join(OPERATIONS)
+_DIVIDE_BY_ZERO = "错误：除数不能为零"
+
+
+@tool
+def calculator(operation: str, a: float, b: float) -> str:
+    """
+    执行基本的数学计算
+
+    参数:
+        operation: 运算类型，支持 "add"(加), "subtract"(减), "multiply"(乘), "divide"(除)
+        a: 第一个数字
+        b: 第二个数字
+
+    返回:
+        计算结果字符串
+    """
+    func = OPERATIONS.get(operation)
+    if func is None:
+        return f"不支持的运算类型：{operation}。支持的类型：{_SUPPORTED}"
+    if operation == "divide" and b == 0:
+        return f"{a} {operation} {b} = {_DIVIDE_BY_ZERO}"
+
+    try:
+        result = func(a, b)
+        return f"{a} {operation} {b} = {result}"
+    except Exception as e:
+        return f"计算错误：{e}"
+
+
+def batch_calculate(operations, a, b) -> tuple:
+    """
+    用 NumPy 一次算完一批 (operation, a, b)
+
+    参数:
+        operations: 一个运算名（对所有元素生效）或与 a、b 等长的运算名列表
+        a: 第一个数字的列表（或单个数字，自动广播）
+        b: 第二个数字的列表（或单个数字，自动广播）
+
+    返回:
+        (results, errors)：results 为 float64 数组，出错的位置为 nan；
+        errors 为 {下标: 错误信息}（除数为零、不支持的运算、结果溢出）
+
+    异常:
+        ValueError: a、b 含有不能转换成数字的值，或各参数长度不一致且无法广播
+    """
+    import numpy as np
+
+    # 先各自转换：不是数字的输入单独报错，不会被误报成"长度不一致"
+    numbers = []
+    for name, value in (("a", a), ("b", b)):
+        try:
+            numbers.append(np.asarray(value, dtype=np.float64))
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} 应为数字或数字列表")
+    try:
+        a, b, ops = np.broadcast_arrays(*numbers, np.asarray(operations, dtype=object))
+    except ValueError:
+        raise ValueError("operations、a、b 的长度不一致")
+    a, b, ops = np.atleast_1d(a), np.atleast_1d(b), np.atleast_1d(ops)
+    results = np.full(a.shape, np.nan)
+    errors = {}
+
+    # 按运算名分组，每组一次 ufunc（批量里通常只有少数几种运算）
+    if ops.size and (ops[0] == ops).all():
+        groups = [(ops[0], None)]
+    else:
+        names, codes = np.unique(ops.astype(str), return_inverse=True)
+        groups = [(name, codes == i) for i, name in enumerate(names)]
+
+    for name, mask in groups:
+        if name not in OPERATIONS:
+            for index in (range(a.size) if mask is None else np.flatnonzero(mask)):
+                errors[int(index)] = f"不支持的运算类型：{name}。支持的类型：{_SUPPORTED}"
+            continue
+        ufunc = getattr(np, name)  # np.add / np.subtract / np.multiply / np.divide
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            if mask is None:
+                ufunc(a, b, out=results)
+            else:
+                results[mask] = ufunc(a[mask], b[mask])
+        if name == "divide":
+            zero = b == 0 if mask is None else mask & (b == 0)
+            results[zero] = np.nan
+            for index in np.flatnonzero(zero):
+                errors[int(index)] = _DIVIDE_BY_ZERO
+    for index in np.flatnonzero(~np.isfinite(results)):
+        errors.setdefault(int(index), "错误：结果溢出或不是有限数")
+    return results, errors
+
+
+@tool
+def calculator_batch(
+        operations: Union[str, List[str]],
+        a: Union[float, List[float]],
+        b: Union[float, List[float]],
+) -> str:
+    """
+    批量执行基本的数学计算，一次调用可以算成千上万组
+
+    参数:
+        operations: 运算类型，"add"、"subtract"、"multiply"、"divide" 之一（对所有元素生效），或与 a、b 等长的列表
+        a: 第一个数字的列表（单个数字会自动广播）
+        b: 第二个数字的列表（单个数字会自动广播）
+
+    返回:
+        JSON：{"count": 总数, "results": [结果，出错的位置为 null], "errors": [{"index": 下标, "error": 信息}]}
+    """
+    try:
+        results, errors = batch_calculate(operations, a, b)
+    except ValueError as e:
+        return f"计算错误：{e}"
+    values = results.tolist()
+    for index in errors:
+        values[index] = None
+    return json.dumps({
+        "count": len(values),
+        "results": values,
+        "errors": [{"index": index, "error": errors[index]} for index in sorted(errors)],
+    }, ensure_ascii=False)
+
+
+# 测试工具：python -m common.tools.arithmetic
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("测试计算器工具：")
+    print(calculator.invoke({"operation": "add", "a": 10, "b": 5}))
+    print(calculator.invoke({"operation": "multiply", "a": 7, "b": 8}))
+    print(calculator.invoke({"operation": "divide", "a": 20, "b": 4}))
+    print(calculator_batch.invoke({"operations": ["add", "divide", "divide", "power"], "a": [1, 2, 3, 4], "b": [2, 0, 4, 5]}))
+
+    n = 10_000
+    args = {
+        "operations": [random.choice(list(OPERATIONS)) for _ in range(n)],
+        "a": [random.uniform(-100, 100) for _ in range(n)],
+        "b": [random.randint(0, 9) for _ in range(n)],
+    }
+    start = time.perf_counter()
+    for operation, x, y in zip(args["operations"], args["a"], args["b"]):
+        calculator.invoke({"operation": operation, "a": x, "b": y})
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    calculator_batch.invoke(args)
+    batch = time.perf_counter() - start
+    print(f"{n} 组计算：逐个调用 calculator {single * 1000:.0f}ms，calculator_batch 一次 {batch * 1000:.1f}ms")
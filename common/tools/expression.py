@@ -0,0 +1,280 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+自定义工具：表达式计算
+====================
+
+calculator 一次只能算一个二元运算，"(100*2)-15%" 这样的问题要 模型→工具→模型 往返好几轮。
+evaluate_expression 一次算完整个表达式：
+
+- 安全：ast.parse 后按白名单逐个节点求值（只有数字、四则运算、乘方、括号和少数函数），不用 eval
+- 精确：中间结果用 Fraction，0.1 + 0.2 = 0.3、1/3*3 = 1；输出时转成 Decimal（28 位有效数字）
+- 百分号不带单位：15% = 0.15，所以 (100*2)-15% = 199.85；"10 % 3" 这种两边都有数的仍是取余
+- 有界：表达式长度、乘方指数、每个中间结果的位数都有上限，"9**9**9" 之类会直接报错而不是卡住进程
+"""
+
+import ast
+import io
+import math
+import tokenize
+from decimal import Decimal, localcontext
+from fractions import Fraction
+
+from langchain_core.tools import tool
+
+MAX_LENGTH = 500  # 表达式最长字符数
+MAX_EXPONENT = 1000  # 乘方指数的绝对值上限
+MAX_BITS = 4096  # 每个中间结果分子 / 分母的位数上限
+PRECISION = 28  # 输出与无理运算（sqrt、非整数次幂）的有效数字位数
+
+_PERCENT = '__percent__'
+_CONSTANTS = {
+    'pi': Fraction(Decimal('3.141592653589793238462643383')),
+    'e': Fraction(Decimal('2.718281828459045235360287471')),
+}
+
+
+class ExpressionError(ValueError):
+    """表达式不合法或超出限制"""
+
+
+def _decimal(value: Fraction) -> Decimal:
+    with localcontext() as ctx:
+        ctx.prec = PRECISION
+        return Decimal(value.numerator) / Decimal(value.denominator)
+
+
+def _bounded(value: Fraction) -> Fraction:
+    """每个中间结果都检查位数：加、乘、整除、floor / ceil 反复叠加也不会构造出巨大的整数"""
+    if max(value.numerator.bit_length(), value.denominator.bit_length()) > MAX_BITS:
+        raise ExpressionError(f'计算结果过大（超过 {MAX_BITS} 位）')
+    return value
+
+
+def _sqrt(x: Fraction) -> Fraction:
+    if x < 0:
+        raise ExpressionError('负数不能开平方')
+    with localcontext() as ctx:
+        ctx.prec = PRECISION
+        return Fraction(_decimal(x).sqrt())
+
+
+def _round(x: Fraction, ndigits: Fraction = None) -> Fraction:
+    if ndigits is None:
+        return Fraction(round(x))
+    if ndigits.denominator != 1 or abs(ndigits) > 100:
+        raise ExpressionError('round 的位数应为 -100 ~ 100 之间的整数')
+    return round(x, int(ndigits))
+
+
+_FUNCTIONS = {
+    _PERCENT: lambda x: x / 100,
+    'abs': abs,
+    'round': _round,
+    'min': min,
+    'max': max,
+    'sqrt': _sqrt,
+    'floor': lambda x: Fraction(math.floor(x)),
+    'ceil': lambda x: Fraction(math.ceil(x)),
+}
+
+
+def _power(base: Fraction, exponent: Fraction) -> Fraction:
+    if abs(exponent) > MAX_EXPONENT:
+        raise ExpressionError(f'指数过大（绝对值上限 {MAX_EXPONENT}）')
+    if exponent.denominator == 1:
+        n = int(exponent)
+        if base == 0 and n < 0:
+            raise ExpressionError('除数不能为零')
+        # 结果的分子 / 分母位数约为底数位数 × 指数，先估算再算，避免构造巨大的整数
+        bits = max(base.numerator.bit_length(), base.denominator.bit_length()) * abs(n)
+        if bits > MAX_BITS:
+            raise ExpressionError(f'乘方结果过大（超过 {MAX_BITS} 位）')
+        return base ** n
+    # 非整数次幂（如开方）：结果一般是无理数，按 Decimal 精度计算
+    if base < 0:
+        raise ExpressionError('负数不能做非整数次幂')
+    if base == 0:
+        return Fraction(0)
+    with localcontext() as ctx:
+        ctx.prec = PRECISION
+        result = _decimal(base) ** _decimal(exponent)
+    if abs(result.adjusted()) > MAX_BITS:
+        raise ExpressionError(f'乘方结果过大（超过 {MAX_BITS} 位）')
+    return Fraction(result)
+
+
+def _binary(op: ast.operator, left: Fraction, right: Fraction) -> Fraction:
+    return _bounded(_apply(op, left, right))
+
+
+def _apply(op: ast.operator, left: Fraction, right: Fraction) -> Fraction:
+    if isinstance(op, ast.Add):
+        return left + right
+    if isinstance(op, ast.Sub):
+        return left - right
+    if isinstance(op, ast.Mult):
+        return left * right
+    if isinstance(op, ast.Pow):
+        return _power(left, right)
+    if right == 0:
+        raise ExpressionError('除数不能为零')
+    if isinstance(op, ast.Div):
+        return left / right
+    if isinstance(op, ast.FloorDiv):
+        return Fraction(left // right)
+    if isinstance(op, ast.Mod):
+        return left % right
+    raise ExpressionError(f'不支持的运算符：{type(op).__name__}')
+
+
+def _preprocess(expression: str) -> str:
+    """
+    统一写法并把后缀百分号改成函数调用
+
+    ^ → **，× ÷ → * /，全角括号 → 半角；
+    "15%"、"(a+b)%"、"sqrt(4)%" 后面不再跟操作数时是百分号，改写成 __percent__(...)，
+    函数调用比乘方绑定得更紧，所以 2**50% 是 2 的 0.5 次方
+    """
+    expression = (expression.replace('×', '*').replace('÷', '/').replace('（', '(').replace('）', ')')
+                  .replace('％', '%').replace('^', '**'))
+    try:
+        tokens = [t for t in tokenize.generate_tokens(io.StringIO(expression).readline)
+                  if t.type not in (tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER, tokenize.INDENT,
+                                    tokenize.DEDENT)]
+    except (tokenize.TokenError, IndentationError, SyntaxError) as e:
+        raise ExpressionError(f'表达式不完整：{e}')
+
+    out: list = []
+    for i, token in enumerate(tokens):
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        is_percent = (
+            token.string == '%' and out
+            and (nxt is None or nxt.string in (')', ',', '+', '-', '*', '/', '//', '**', '%'))
+        )
+        if not is_percent:
+            out.append(token.string)
+            continue
+        # 找到百分号作用的操作数：数字、常量，或者一整个括号（含函数名）
+        start = len(out) - 1
+        if out[start] == ')':
+            depth = 0
+            while start >= 0:
+                depth += out[start] == ')'
+                depth -= out[start] == '('
+                if depth == 0:
+                    break
+                start -= 1
+            if start > 0 and out[start - 1].isidentifier():
+                start -= 1
+        if start < 0:
+            raise ExpressionError('括号不匹配')
+        out[start:] = [_PERCENT, '(', *out[start:], ')']
+    return ' '.join(out)
+
+
+def _eval(node: ast.AST) -> Fraction:
+    if isinstance(node, ast.Expression):
+        return _eval(node.body)
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, Fraction)):
+            raise ExpressionError(f'不支持的常量：{node.value!r}')
+        return _bounded(Fraction(node.value))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _eval(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        return _binary(node.op, _eval(node.left), _eval(node.right))
+    if isinstance(node, ast.Name):
+        if node.id not in _CONSTANTS:
+            raise ExpressionError(f'未知的名字：{node.id}')
+        return _CONSTANTS[node.id]
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+            raise ExpressionError(f'不支持的函数：{ast.unparse(node.func)}')
+        args = [_eval(arg) for arg in node.args]
+        try:
+            return _bounded(Fraction(_FUNCTIONS[node.func.id](*args)))
+        except ExpressionError:
+            raise
+        except (TypeError, ValueError):
+            raise ExpressionError(f'函数 {node.func.id} 的参数个数不对')
+    raise ExpressionError(f'不支持的语法：{type(node).__name__}')
+
+
+def _exact_literals(tree: ast.AST, source: str) -> None:
+    """浮点字面量按源码里的写法转成精确值（0.1 是 1/10，而不是最接近它的二进制浮点数）"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, float):
+            literal = Decimal(ast.get_source_segment(source, node).replace('_', ''))
+            if abs(literal.adjusted()) > MAX_BITS:
+                raise ExpressionError(f'数字过大或过小：{literal}')
+            node.value = Fraction(literal)
+
+
+def evaluate(expression: str) -> Fraction:
+    """
+    安全地计算算术表达式，返回精确的 Fraction
+
+    参数:
+        expression: 如 "(100*2)-15%"、"1/3 + 2^10"、"sqrt(2) * 3"
+
+    异常:
+        ExpressionError: 语法不支持、除数为零、超出长度 / 指数 / 位数限制
+    """
+    if len(expression) > MAX_LENGTH:
+        raise ExpressionError(f'表达式过长（上限 {MAX_LENGTH} 个字符）')
+    source = _preprocess(expression)
+    if not source:
+        raise ExpressionError('表达式为空')
+    try:
+        tree = ast.parse(source, mode='eval')
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ExpressionError(f'表达式语法错误：{getattr(e, "msg", e)}')
+    _exact_literals(tree, source)
+    try:
+        return _eval(tree)
+    except RecursionError:
+        raise ExpressionError('表达式嵌套过深')
+
+
+def format_number(value: Fraction) -> str:
+    """整数原样输出（位数超过 PRECISION 时用科学计数法）；其余转成 Decimal，循环小数附上分数形式"""
+    if value.denominator == 1 and abs(value.numerator) < 10 ** PRECISION:
+        return str(value.numerator)
+    decimal = _decimal(value).normalize()
+    text = f'{decimal:f}' if abs(decimal.adjusted()) < PRECISION else str(decimal)
+    if value.denominator != 1 and Fraction(decimal) != value and value.denominator < 10 ** 6:
+        text += f'（= {value.numerator}/{value.denominator}）'
+    return text
+
+
+@tool
+def evaluate_expression(expression: str) -> str:
+    """
+    计算完整的算术表达式，多步运算一次完成
+
+    参数:
+        expression: 算术表达式，支持 + - * / //（整除）%（取余）** 或 ^（乘方）和括号；
+            数字后面单独的 % 表示百分数（15% = 0.15，如 "(100*2)-15%"、"200*(1-15%)"）；
+            函数 abs、round、min、max、sqrt、floor、ceil，常量 pi、e
+
+    返回:
+        "表达式 = 结果"，出错时返回错误说明
+    """
+    try:
+        return f"{expression} = {format_number(evaluate(expression))}"
+    except ExpressionError as e:
+        return f"计算错误：{e}"
+
+
+# 测试工具：python -m common.tools.expression
+if __name__ == "__main__":
+    print("测试表达式工具：")
+    for text in ["(100*2)-15%", "200*(1-15%)", "0.1 + 0.2", "1/3", "10 % 3", "2^10 + sqrt(16)",
+                 "round(pi, 4)", "9**9**9", "1/0", "sqrt(-4)", "round(1.234, 1000)", "round(1.5, 0.5)",
+                 "abs(1, 2)", "9**1000*" * 10 + "1", "floor(1e4000)*1e4000", "2**1000",
+                 "__import__('os')"]:
+        print(evaluate_expression.invoke({"expression": text}))
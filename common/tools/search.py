@@ -1,3 +1,7 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
 """
 自定义工具：网页搜索（模拟）
 ============================
@@ -6,45 +10,25 @@
 """
 
 from langchain_core.tools import tool
+from common.search_index import demo_index
+from common.tool_cache import cached_tool, casefold_query
 from typing import Optional
 
 @tool
+@cached_tool(ttl=3600, normalize={'query': casefold_query})  # 纯查询，相同参数在有效期内直接复用结果
 def web_search(query: str, num_results: Optional[int] = 1) -> str:
     """
     在网上搜索信息（模拟）
 
     参数:
         query: 搜索关键词
-        num_results: 返回结果数量，默认3条
+        num_results: 返回结果数量，默认1条
 
     返回:
         搜索结果字符串
     """
-    # 模拟搜索结果
-    mock_results = {
-        "Python": [
-            "Python官方网站 - https://www.python.org",
-            "Python教程 - 菜鸟教程",
-            "Python最佳实践 - Real Python"
-        ],
-        "机器学习": [
-            "机器学习入门 - Coursera",
-            "Scikit-learn文档",
-            "机器学习实战 - GitHub"
-        ],
-        "LangChain": [
-            "LangChain官方文档",
-            "LangChain GitHub仓库",
-            "LangChain教程 - YouTube"
-        ]
-    }
-
-    # 查找结果
-    results = []
-    for key in mock_results:
-        if key.lower() in query.lower():
-            results = mock_results[key][:num_results]
-            break
+    # 在本地倒排索引里按 BM25 相关度检索
+    results = demo_index().search_documents(query, k=num_results if num_results is not None else 10)
 
     if not results:
         return f"未找到关于'{query}'的结果"
@@ -56,7 +40,7 @@ def web_search(query: str, num_results: Optional[int] = 1) -> str:
 
     return output.strip()
 
-# 测试工具
+# 测试工具：python -m common.tools.search
 if __name__ == "__main__":
     print("测试搜索工具：")
     print(web_search.invoke({"query": "Python"}))
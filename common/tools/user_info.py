@@ -0,0 +1,39 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+自定义工具：用户信息查询（客服场景）
+==================================
+
+07_memory_basics、08_context_management、09_agent_service 的客服 Agent 共用同一份工具和系统提示，
+只在这里维护，避免各章节的拷贝互相漂移。
+"""
+
+from langchain_core.tools import tool
+from common.tool_cache import cached_tool
+
+CUSTOMER_SERVICE_PROMPT = """
+你是一个客服助手。
+特点：
+- 记住用户说过的话
+- 友好、有耐心
+- 使用 get_used_info 工具查询用户信息时需要用户 ID"""
+
+
+@tool
+@cached_tool(ttl=300, normalize={'used_id': str.strip})
+def get_used_info(used_id: str) -> str:
+    """获取简单的用户消息"""
+    users = {
+        "123": "张三，25岁，工程师",
+        "456": "李四，30岁，设计师"
+    }
+    return users.get(used_id, '未找到该用户')
+
+
+# 测试工具：python -m common.tools.user_info
+if __name__ == "__main__":
+    print("测试用户信息工具：")
+    print(f"123: {get_used_info.invoke({'used_id': ' 123 '})}")
+    print(f"999: {get_used_info.invoke({'used_id': '999'})}")
@@ -1,3 +1,7 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
 """
 自定义工具：天气查询
 ====================
@@ -6,8 +10,10 @@
 """
 
 from langchain_core.tools import tool
+from common.tool_cache import cached_tool, normalize_city
 
 @tool
+@cached_tool(ttl=600, normalize={'city': normalize_city})  # 纯查询，相同参数在有效期内直接复用结果
 def get_weather(city: str) -> str:
     """
     获取指定城市的天气信息
@@ -28,7 +34,7 @@ def get_weather(city: str) -> str:
 
     return weather_data.get(city, f"抱歉，暂时没有{city}的天气数据")
 
-# 测试工具
+# 测试工具：python -m common.tools.weather
 if __name__ == "__main__":
     print("测试天气工具：")
     print(f"北京天气: {get_weather.invoke({'city': '北京'})}")
@@ -0,0 +1,224 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+Token 用量与费用台账
+====================
+
+UsageLedger 是一个回调（BaseCallbackHandler），记录每一次模型调用的 usage_metadata：
+输入 / 输出 / 缓存命中 token 数、耗时、费用，并按三个维度汇总：
+1. thread_id（LangGraph 会把 configurable 里的 thread_id 放进 metadata；也可以自己在 metadata 里传）
+2. 模型名
+3. 提示词模板（metadata 里的 prompt_template，没有则记为 "-"）
+
+report() 给出总量、缓存命中率、吞吐、耗时分位数与费用；dump(path) 输出 JSON。
+
+用法：
+    ledger = UsageLedger()
+    config = {"callbacks": [ledger], "metadata": {"thread_id": "user_1", "prompt_template": "chatbot"}}
+    chain.invoke(inputs, config=config)
+    print(ledger.report()["total"])
+    ledger.dump("usage.json")
+
+费用按 DeepSeek 官方价格（元 / 百万 tokens，缓存命中输入、缓存未命中输入、输出）估算，
+价格调整时通过 prices 参数覆盖。
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 元 / 百万 tokens：(缓存命中输入, 缓存未命中输入, 输出)
+DEFAULT_PRICES = {
+    'deepseek-chat': (0.2, 2.0, 3.0),
+    'deepseek-reasoner': (0.2, 2.0, 3.0),
+}
+
+_DIMENSIONS = ('thread', 'model', 'template')
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class _Bucket:
+    __slots__ = ('calls', 'errors', 'input_tokens', 'output_tokens', 'cache_read_tokens', 'cost', 'latency',
+                 'latencies')
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+        self.cost = 0.0
+        self.latency = 0.0
+        self.latencies: deque = deque(maxlen=window)
+
+    def add(self, record: dict):
+        self.calls += 1
+        self.input_tokens += record['input_tokens']
+        self.output_tokens += record['output_tokens']
+        self.cache_read_tokens += record['cache_read_tokens']
+        self.cost += record['cost']
+        self.latency += record['latency']
+        self.latencies.append(record['latency'])
+
+    def summary(self) -> dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'total_tokens': self.input_tokens + self.output_tokens,
+            'cache_read_tokens': self.cache_read_tokens,
+            'cache_hit_rate': round(self.cache_read_tokens / self.input_tokens, 4) if self.input_tokens else 0.0,
+            'cost': round(self.cost, 6),
+            'output_tokens_per_sec': round(self.output_tokens / self.latency, 2) if self.latency else 0.0,
+            'latency_p50': round(percentile(self.latencies, 0.5), 4),
+            'latency_p95': round(percentile(self.latencies, 0.95), 4),
+            'latency_p99': round(percentile(self.latencies, 0.99), 4),
+        }
+
+
+class UsageLedger(BaseCallbackHandler):
+    """
+    参数:
+        prices: 模型名 -> (缓存命中输入, 缓存未命中输入, 输出) 的单价（元 / 百万 tokens）
+        window: 每个汇总项保留多少个最近的耗时样本用于计算分位数
+        keep_records: 保留多少条最近的调用明细（dump 时一并输出），0 表示不保留
+    """
+
+    raise_error = False
+    run_inline = True
+
+    def __init__(self, prices: Optional[dict] = None, window: int = 10_000, keep_records: int = 1000):
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self.window = window
+        self._pending: dict = {}
+        self._total = _Bucket(window)
+        self._buckets: dict = {dimension: {} for dimension in _DIMENSIONS}
+        self.records: deque = deque(maxlen=keep_records)
+        self._lock = threading.Lock()
+        self._first_call: Optional[float] = None
+
+    # ------------------------------------------------------------------ 回调
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID,
+                            metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        params = kwargs.get('invocation_params') or {}
+        self._pending[run_id] = {
+            'start': time.perf_counter(),
+            'thread': str(metadata.get('thread_id', '-')),
+            'model': metadata.get('ls_model_name') or params.get('model') or params.get('model_name') or '-',
+            'template': str(metadata.get('prompt_template', '-')),
+        }
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self.on_chat_model_start(serialized, [], run_id=run_id, **kwargs)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        input_tokens, output_tokens, cache_read = self._usage(response)
+        record = {
+            'thread': pending['thread'],
+            'model': pending['model'],
+            'template': pending['template'],
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'cache_read_tokens': cache_read,
+            'latency': time.perf_counter() - pending['start'],
+            'cost': self.cost(pending['model'], input_tokens, output_tokens, cache_read),
+            'time': time.time(),
+        }
+        with self._lock:
+            if self._first_call is None:
+                self._first_call = pending['start']
+            self._total.add(record)
+            for dimension in _DIMENSIONS:
+                self._bucket(dimension, record[dimension]).add(record)
+            self.records.append(record)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        with self._lock:
+            self._total.errors += 1
+            for dimension in _DIMENSIONS:
+                self._bucket(dimension, pending[dimension]).errors += 1
+
+    # ------------------------------------------------------------------ 统计
+
+    def _bucket(self, dimension: str, key: str) -> _Bucket:
+        buckets = self._buckets[dimension]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _Bucket(self.window)
+        return bucket
+
+    @staticmethod
+    def _usage(response) -> tuple:
+        """优先读 AIMessage.usage_metadata，没有再读 llm_output['token_usage']"""
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if usage:
+                    details = usage.get('input_token_details') or {}
+                    return usage.get('input_tokens', 0), usage.get('output_tokens', 0), details.get('cache_read') or 0
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        return (
+            usage.get('prompt_tokens', 0),
+            usage.get('completion_tokens', 0),
+            usage.get('prompt_cache_hit_tokens', 0),
+        )
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int, cache_read: int) -> float:
+        """一次调用的费用（元），未知模型按 0 计"""
+        hit, miss, output = self.prices.get(model, (0.0, 0.0, 0.0))
+        return (cache_read * hit + (input_tokens - cache_read) * miss + output_tokens * output) / 1e6
+
+    def report(self) -> dict:
+        """总量与按 thread / model / template 的汇总"""
+        with self._lock:
+            total = self._total.summary()
+            elapsed = time.perf_counter() - self._first_call if self._first_call is not None else 0.0
+            total['calls_per_sec'] = round(total['calls'] / elapsed, 3) if elapsed else 0.0
+            total['tokens_per_sec'] = round(total['total_tokens'] / elapsed, 2) if elapsed else 0.0
+            result = {'total': total}
+            for dimension in _DIMENSIONS:
+                result[f'by_{dimension}'] = {key: bucket.summary() for key, bucket in self._buckets[dimension].items()}
+        return result
+
+    def top(self, dimension: str = 'thread', by: str = 'cost', n: int = 10) -> list:
+        """按某项指标排序的前 n 个汇总项，如 top('thread', 'total_tokens')"""
+        items = self.report()[f'by_{dimension}'].items()
+        return sorted(items, key=lambda item: item[1][by], reverse=True)[:n]
+
+    def dump(self, path: str, include_records: bool = True) -> None:
+        """把 report()（以及最近的调用明细）写成 JSON 文件"""
+        data = self.report()
+        if include_records:
+            with self._lock:
+                data['records'] = list(self.records)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._total = _Bucket(self.window)
+            self._buckets = {dimension: {} for dimension in _DIMENSIONS}
+            self.records.clear()
+            self._first_call = None
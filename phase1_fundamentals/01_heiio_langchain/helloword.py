@@ -5,7 +5,11 @@
 
 from dotenv import load_dotenv
 from os import getenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
 from langchain_core.messages import SystemMessage, HumanMessage
 
 # import dotenv
@@ -13,6 +17,7 @@ from langchain_core.messages import SystemMessage, HumanMessage
 # from langchain_openai import ChatOpenAI
 
 # init_chat_model方式（还有chainopenai方式）
+# 现统一由 common.model_factory.get_chat_model 创建（内部仍是 init_chat_model，按参数缓存、共享连接池）
 
 # 加载环境变量
 load_dotenv()
@@ -35,10 +40,11 @@ if not api_key:
     raise ValueError("API key is required")
 
 # 初始化模型 - 添加参数
-model = init_chat_model(
+model = get_chat_model(
     model="deepseek-chat",
     base_url=base_url,
     api_key=api_key,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -106,8 +112,9 @@ def example_3_dict_invoke():
 # 配置模型参数
 def example_4_model_parameters():
     tem_lst = [0.2, 1, 1.8]
+    # 循环内不再每次新建客户端：不同 temperature 共用同一个客户端与连接池
     for i in tem_lst:
-        model_deterministic = init_chat_model(
+        model_deterministic = get_chat_model(
             model="deepseek-chat",
             temperature=i,
             max_tokens=50,
@@ -142,7 +149,7 @@ def example_4_model_parameters():
 
 # invoke方法的返回值
 def example_5_response_structure():
-    model_response = init_chat_model(
+    model_response = get_chat_model(
         model="deepseek-chat",
         temperature=1.8,
         max_tokens=200,
@@ -157,7 +164,7 @@ def example_5_response_structure():
 # 异常处理
 def example_6_error_handing():
     try:
-        model_error = init_chat_model(
+        model_error = get_chat_model(
             model="deepseek-chat",
         )
         res = model_error.invoke('hello')
@@ -174,7 +181,7 @@ def example_7_models_text():
     model_list = ['deepseek-chat', 'deepseek-reasoner']
     for model in model_list:
         try:
-            model_text = init_chat_model(
+            model_text = get_chat_model(
                 model=model,
             )
             res = model_text.invoke('hello')
@@ -4,7 +4,12 @@
 # ----------------------------------------------------------------------------------------------------------------------
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.usage import UsageLedger
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -12,13 +17,14 @@ load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 base_url = getenv("DEEPSEEK_BASE_URL")
 
-model = init_chat_model(
+model = get_chat_model(
     model="deepseek-chat",
     api_key=api_key,
     base_url=base_url,
     max_tokens=200,
     temperature=1,
     timeout=15.0,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -64,28 +70,30 @@ def chat_prompt_template():
 
 
 def chat_invoke():
-    turn = chat_prompt_template()[2]
-    chat_template_list = chat_prompt_template()[0]
-    list_questions = chat_prompt_template()[3]
+    chat_template_list, total_tokens_used, turn, list_questions = chat_prompt_template()
+    # 用量台账：每次模型调用的 token 用量都记在这里，按会话 / 模型 / 模板汇总
+    ledger = UsageLedger()
+    config = {'callbacks': [ledger], 'metadata': {'thread_id': 'chat_invoke', 'prompt_template': 'chatbot'}}
     for question in list_questions:
         chat_template_list.append(
             {'role': 'user', 'content': question}
         )
 
-        response = model.invoke(chat_template_list)
+        response = model.invoke(chat_template_list, config=config)
         print()
         print(response.content)
         print()
         turn += 1
-        print(turn, tokens_used(response))
+        total_tokens_used += tokens_used(response)
+        print(turn, total_tokens_used)
         chat_template_list.append({'role': 'assistant', 'content': response.content})
+    print(ledger.report()['total'])
 
 
 def tokens_used(response):
-    total_tokens_used = chat_prompt_template()[1]
-    usage = response.response_metadata['token_usage']
-    total_tokens_used = total_tokens_used + usage['total_tokens']
-    return total_tokens_used
+    # 本轮的 token 用量（累计值由调用方维护）
+    usage = response.usage_metadata or {}
+    return usage.get('total_tokens', 0)
 
 
 def main():
@@ -4,7 +4,13 @@
 # ----------------------------------------------------------------------------------------------------------------------
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.lazy import resolve
+from common.fast_prompt import FastChatPromptTemplate
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
@@ -12,10 +18,11 @@ load_dotenv()
 base_url = getenv("DEEPSEEK_BASE_URL")
 api_key = getenv('DEEPSEEK_API_KEY')
 
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
     max_tokens=50,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -161,7 +168,7 @@ def example_5_message_prompt_template():
         question='原理与用法',
     )
 
-    model_reasoner = init_chat_model(
+    model_reasoner = get_chat_model(
         model='deepseek-reasoner',
         base_url=base_url,
         api_key=api_key,
@@ -213,7 +220,7 @@ def example_7_lcel_chains():
         ("user", "{input}"),
     ])
 
-    chain = template | model
+    chain = template | resolve(model)  # LCEL 按类型判断，先换成真正的模型
 
     res = chain.invoke({
         "role": "幽默的程序员",
@@ -222,6 +229,28 @@ def example_7_lcel_chains():
     print(res.content)
 
 
+# 预编译模板（性能优化）
+def example_8_fast_template():
+    # 模板只解析一次并编译成格式化函数，接口与 ChatPromptTemplate 基本一致
+    # 基准对比见 benchmarks/bench_prompt_templates.py
+    template = FastChatPromptTemplate.from_messages([
+        ("system", "你是一个{role}，擅长{expertise}。"),
+        ("user", "请给我{task}"),
+    ])
+    partially_filled = template.partial(role='AI教授', expertise='大模型开发')
+
+    # format_dicts 直接生成字典格式的消息，省去创建消息对象的开销
+    messages = partially_filled.format_dicts(task='解释什么是机器学习')
+    print(messages)
+
+    res = model.invoke(messages)
+    print(res.content)
+
+    # 同样可以用在 LCEL 链里
+    chain = partially_filled | resolve(model)
+    print(chain.invoke({'task': '解释什么是深度学习'}).content)
+
+
 def main():
     try:
         example_1_why_template()
@@ -231,6 +260,7 @@ def main():
         example_5_message_prompt_template()
         example_6_partial_variable()
         example_7_lcel_chains()
+        example_8_fast_template()
     except Exception as e:
         print(e)
 
@@ -4,19 +4,24 @@
 # ----------------------------------------------------------------------------------------------------------------------
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 # 实例：构建一个简单的聊天机器人
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
-model = init_chat_model(
+model = get_chat_model(
     model="deepseek-chat",
     api_key=api_key,
     max_tokens=200,
     temperature=1,
     timeout=15.0,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
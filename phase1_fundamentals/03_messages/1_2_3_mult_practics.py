@@ -8,7 +8,13 @@
 
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.lazy import resolve
+from common.usage import UsageLedger
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables import RunnablePassthrough
@@ -16,10 +22,11 @@ from langchain_core.runnables import RunnablePassthrough
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
     temperature=0.7,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -45,7 +52,7 @@ def chat_template_and_chain():
             RunnablePassthrough()
             | prepare_params
             | chat_sys_template
-            | model
+            | resolve(model)  # LCEL 按类型判断，先换成真正的模型
     )
 
     return chain
@@ -72,6 +79,9 @@ def chat_params():
 
 def chat_response():
     total_used = 0
+    # 用量台账：记录每次调用的输入 / 输出 / 缓存命中 token，按会话和模板汇总
+    ledger = UsageLedger()
+    config = {'callbacks': [ledger], 'metadata': {'thread_id': 'mult_practics', 'prompt_template': 'profession_chat'}}
     chain = chat_template_and_chain()
     prompt_params, chat_history_list, question_list = chat_params()
 
@@ -83,19 +93,21 @@ def chat_response():
             'input': question,
         }
 
-        response = chain.invoke(input_list)
+        response = chain.invoke(input_list, config=config)
         print(f'AI回复：{response.content}')
 
         chat_history_list.append(HumanMessage(content=question))
         chat_history_list.append(AIMessage(content=response.content))
 
         tokens_used, total_used = tokens_total_used(response, total_used)
-        print(f'本轮Token使用量：{tokens_used["total_tokens"]}')
+        print(f'本轮Token使用量：{tokens_used.get("total_tokens", 0)}')
+    report = ledger.report()['total']
+    print(f"缓存命中率：{report['cache_hit_rate']:.0%}，预估费用：{report['cost']:.6f} 元")
     return total_used, chat_history_list
 
 
 def tokens_total_used(response, total_used):
-    tokens_used = response.response_metadata.get('token_usage', {})
+    tokens_used = response.usage_metadata or {}
     total_used += tokens_used.get('total_tokens', 0)
     return tokens_used, total_used
 
@@ -5,17 +5,23 @@
 # 消息类型与对话管理
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.conversation import ConversationBuffer
 from langchain_core.messages import SystemMessage, HumanMessage
 
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
 # 初始化模型
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
     temperature=0.5,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -67,16 +73,12 @@ def example_2_conversation_history():
 
 
 def example_3_optimise_history():
-    # 只保留最近N条对话历史
+    # 只保留最近N轮对话历史
     def keep_recent_history(messages, max_pairs=2):
-        # ststem与对话分离
-        system_mes = [message for message in messages if message.get('role') == 'system']
-        conversation_mes = [message for message in messages if message.get('role') != 'system']
-
-        # 保留最近2条
-        max_message_count = max_pairs * 2
-        optimised_mes = conversation_mes[-max_message_count:]
-        return system_mes + optimised_mes
+        # system 消息固定在最前面，其余消息进入有上限的窗口，超出的旧轮次自动淘汰
+        buffer = ConversationBuffer(max_pairs=max_pairs)
+        buffer.extend(messages)
+        return buffer.messages()
 
     messages = [
         {"role": "system", "content": "你是助手"},
@@ -98,9 +100,11 @@ def example_3_optimise_history():
 
 
 def example_4_practice_save_history():
-    conversation = [
-        {"role": "system", "content": "你是一个友好的助手"}
-    ]
+    # 对话缓冲区：系统消息固定，只保留最近 10 轮，历史不会无限增长
+    conversation = ConversationBuffer(
+        {"role": "system", "content": "你是一个友好的助手"},
+        max_pairs=10,
+    )
 
     questions = [
         "我叫李明，今年25岁",
@@ -121,11 +125,11 @@ def example_4_practice_save_history():
         print(f"\n--- 第 {i} 轮 ---")
         print(f"用户: {q}")
 
-        conversation.append({"role": "user", "content": q})
-        response = model.invoke(conversation)
+        conversation.add_user(q)
+        response = model.invoke(conversation.messages())
 
         print(f"AI: {response.content}")
-        conversation.append({"role": "assistant", "content": response.content})
+        conversation.add_assistant(response.content)
 
 
 def main():
@@ -7,7 +7,11 @@
 from os import getenv
 
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
@@ -15,10 +19,11 @@ load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
 # 初始化模型
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-reasoner',
     api_key=api_key,
     temperature=0.8,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
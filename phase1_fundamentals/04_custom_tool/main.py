@@ -36,15 +36,19 @@
 
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from tools.web_search import web_search
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.tools import tool_schemas  # 共享工具包，只导入 web_search 一个模块
 # from langchain_core.tools import tool_calls
 
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
 # 初始化模型
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
     temperature=0.5,
@@ -60,7 +64,7 @@ print("示例：工具绑定到模型（预览）")
 print("="*70)
 
 # 绑定工具到模型
-model_with_tools = model.bind_tools([web_search])
+model_with_tools = model.bind_tools(tool_schemas("web_search"))  # 工具定义第一次生成后缓存复用
 
 print("模型已绑定工具：")
 print("web_search")
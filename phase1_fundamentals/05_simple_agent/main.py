@@ -15,24 +15,32 @@ LangChain 1.0 - Simple Agent (使用 create_agent)
 
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langchain.agents import create_agent  # ✅ LangChain 1.0 API
-from langchain_core.messages import SystemMessage
-from langgraph.checkpoint.memory import InMemorySaver  # 用于多轮对话
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.batch import run_batch, question_inputs, final_answer
+from common.lazy import lazy_callable
+
+# LangChain / LangGraph 较重，第一次调用时才导入（等价于 from langchain.agents import create_agent 等）
+create_agent = lazy_callable("langchain.agents", "create_agent")  # ✅ LangChain 1.0 API
+SystemMessage = lazy_callable("langchain_core.messages", "SystemMessage")
+InMemorySaver = lazy_callable("langgraph.checkpoint.memory", "InMemorySaver")  # 用于多轮对话
+ToolConcurrencyMiddleware = lazy_callable("common.tool_concurrency", "ToolConcurrencyMiddleware")
 
 # 导入自定义工具
-from tools.weather import get_weather
-from tools.calculator import calculator
-from tools.web_search import web_search
+from common.tools import get_tools  # 共享工具包，按名字懒加载
 
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
 # 初始化模型
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
     temperature=0.5,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -48,7 +56,7 @@ def example_1_basic_agent():
 
     agent = create_agent(
         model=model,
-        tools=[get_weather],
+        tools=get_tools("get_weather"),
         system_prompt='你是一个有帮助的助手。'
     )
 
@@ -79,32 +87,36 @@ def example_2_multi_tool_agent():
     # 创建配置多个工具的 Agent
     agent = create_agent(
         model=model,
-        tools=[get_weather, calculator, web_search],
+        tools=get_tools("get_weather", "calculator", "evaluate_expression", "web_search"),
         system_prompt="你是一个有帮助的助手。"
     )
 
     print("\n配置的工具：")
     print("  - get_weather（天气查询）")
     print("  - calculator（计算器）")
+    print("  - evaluate_expression（整个算式一次算完）")
     print("  - web_search（网页搜索）")
 
     # 测试不同类型的问题
     tests = [
         "上海的天气怎么样？",  # 应该用 get_weather
         "15 乘以 23 等于多少？",  # 应该用 calculator
+        "(100*2) 减去 15% 是多少？再加上 3 的平方呢？",  # 应该用 evaluate_expression，一次调用算完
     ]
 
-    for i, question in enumerate(tests, 1):
+    # 问题之间互不依赖：并发执行，总耗时≈最慢的一个；结果顺序与 tests 一致，单个出错不影响其它
+    results = run_batch(agent, question_inputs(tests), max_concurrency=4)
+
+    for i, (question, result) in enumerate(zip(tests, results), 1):
         print(f"\n{'=' * 70}")
         print(f"测试 {i}：{question}")
         print(f"{'=' * 70}")
 
-        response = agent.invoke({
-            "messages": [{"role": "user", "content": question}]
-        })
-
         # 显示最终回答
-        print(f"\nAgent 回复：{response['messages'][-1].content}")
+        if isinstance(result, Exception):
+            print(f"\n出错：{result}")
+        else:
+            print(f"\nAgent 回复：{final_answer(result)}")
 
     print("\n关键点：")
     print("  - Agent 从多个工具中选择最合适的")
@@ -133,10 +145,13 @@ def example_3_agent_with_system_prompt():
         - 结果用表格或列表清晰展示
         """)
 
+    # 一次回复里的多个 tool_calls（查天气 + 计算）会并行执行；这里再限制并发数与单次调用超时
+    concurrency = ToolConcurrencyMiddleware(max_concurrency=4, timeout=10)
     agent = create_agent(
         model=model,
-        tools=[get_weather, calculator],
-        system_prompt=system_message  # ✅ 使用 system_prompt 参数
+        tools=get_tools("get_weather", "calculator"),
+        system_prompt=system_message,  # ✅ 使用 system_prompt 参数
+        middleware=[concurrency],
     )
 
     print("\n测试：自定义行为的 Agent")
@@ -145,6 +160,7 @@ def example_3_agent_with_system_prompt():
     })
 
     print(f"\nAgent 回复：{response['messages'][-1].content}")
+    print(f"工具调用统计：{concurrency.stats()}")
 
     print("\n关键点：")
     print("  - system_prompt 参数定义 Agent 的系统提示")
@@ -165,7 +181,7 @@ def example_4_agent_execution_details():
 
     agent = create_agent(
         model=model,
-        tools=[calculator],
+        tools=get_tools("calculator"),
         system_prompt="你是一个有帮助的助手。"
     )
 
@@ -200,7 +216,7 @@ def example_5_memory_saver():
     # 创建配置多个工具的 Agent
     agent = create_agent(
         model=model,
-        tools=[get_weather, calculator, web_search],
+        tools=get_tools("get_weather", "calculator", "web_search"),
         system_prompt="你是一个有帮助的助手。",
         checkpointer=memory,
         # checkpointmemory=memory,create_agent() got an unexpected keyword argument 'checkpointmemory'
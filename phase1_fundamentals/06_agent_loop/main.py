@@ -1,21 +1,28 @@
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
-from langchain.agents import create_agent
+import sys
+from pathlib import Path
 
-from tools.calculator import calculator
-from tools.weather import get_weather
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.lazy import lazy_callable
+from common.tools import get_tools  # 共享工具包，按名字懒加载
+from common.streaming import StreamMetrics, stream_turn  # 逐 token 渲染 + 首字延迟统计
+
+create_agent = lazy_callable("langchain.agents", "create_agent")  # 第一次调用时才导入 langchain.agents
+InMemorySaver = lazy_callable("langgraph.checkpoint.memory", "InMemorySaver")
 
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
 
 # 初始化模型
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
     temperature=0.5,
     streaming=True,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
@@ -23,7 +30,7 @@ def example_2_streaming():
     """
     示例2：实时查看 Agent 的输出
 
-    使用 .stream() 方法
+    使用 stream_turn（.stream(stream_mode="messages")）逐 token 渲染，并统计首字延迟与生成速度
     """
     print("\n" + "=" * 70)
     print("示例 2：流式输出")
@@ -31,32 +38,34 @@ def example_2_streaming():
 
     agent = create_agent(
         model=model,
-        tools=[calculator, get_weather],
-        system_prompt="你是一个有帮助的助手。"
+        tools=get_tools("calculator", "get_weather"),
+        system_prompt="你是一个有帮助的助手。",
+        checkpointer=InMemorySaver(),  # 两轮共用一个 thread_id，第二轮能看到第一轮
     )
 
     print("\n问题：北京天气如何？然后计算 10 加 20")
     print("\n流式输出（实时显示）：")
     print("-" * 70)
 
-    # 使用 stream 方法
-    for chunk in agent.stream({
-        "messages": [{"role": "user", "content": "北京天气如何？"}]
-    }, stream_mode="updates"):
-        # 错误获取
-        if 'messages' in chunk:
-            # 获取最新的消息
-            latest_msg = chunk['messages'][-1]
-
-            # 如果是 AI 的最终回答
-            if hasattr(latest_msg, 'content') and latest_msg.content:
-                if not hasattr(latest_msg, 'tool_calls') or not latest_msg.tool_calls:
-                    print(f"\n最终回答: {latest_msg.content}")
+    # stream_mode="messages"：模型每生成一块就产出一块（"updates" 要等整个节点结束，
+    # 且产出的是 {节点名: 状态更新}，顶层没有 'messages' 键）
+    metrics = StreamMetrics()
+    for question in ["北京天气如何？", "然后计算 10 加 20"]:
+        print(f"\n用户: {question}\nAI: ", end="")
+        turn = stream_turn(
+            agent,
+            {"messages": [{"role": "user", "content": question}]},
+            config={"configurable": {"thread_id": "streaming_demo"}},
+            metrics=metrics,
+        )
+        print(f"\n本轮指标: {turn.as_dict()}")
+
+    print(f"\n汇总: {metrics.stats()}")
 
     print("\n关键点：")
-    print("  - stream() 返回生成器，逐步返回结果")
-    print("  - 用于实时显示进度")
-    print("  - 适合长时间运行的任务")
+    print("  - stream_mode=\"messages\" 逐 token 返回 (消息块, 元数据)")
+    print("  - 首字延迟（TTFT）才是用户感受到的等待时间")
+    print("  - tokens/sec 反映生成速度，逐 token 间隔的 p95 反映卡顿")
 
 
 def example_4_inspect_state():
@@ -71,7 +80,7 @@ def example_4_inspect_state():
 
     agent = create_agent(
         model=model,
-        tools=[calculator],
+        tools=get_tools("calculator"),
         system_prompt="你是一个有帮助的助手。"
     )
 
@@ -143,8 +152,8 @@ def example_3_agent_with_system_prompt():
 
 def main():
     try:
-        # example_2_streaming()
-        example_3_agent_with_system_prompt()
+        example_2_streaming()
+        # example_3_agent_with_system_prompt()
         # example_4_inspect_state()
     except Exception as e:
         print(e)
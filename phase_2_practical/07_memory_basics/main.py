@@ -10,41 +10,42 @@ LangChain 1.0 - Memory Basics (内存管理基础)
 2. checkpointer 参数 - 为 Agent 添加内存
 3. thread_id - 会话管理
 4. 多轮对话状态保持
+5. SqliteSaver - 持久化到本地 SQLite，重启后会话仍在（common/checkpoint）
 """
 
+import asyncio
+import tempfile
 from os import getenv
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.lazy import resolve  # 直接导入的 create_agent 按类型判断模型，传入前换成真正的模型
+from common.session_driver import SessionDriver
+from common.checkpoint import SqliteSaver
+from common.prefix_cache import PrefixStableMiddleware
+from common.tools.user_info import CUSTOMER_SERVICE_PROMPT, get_used_info  # 与 08、09 共用的客服工具和提示
 from langchain.agents import create_agent
 from langgraph.checkpoint.memory import InMemorySaver
-from langchain_core.tools import tool
 
 # from langchain_openai import ChatOpenAI
 
 load_dotenv()
 api_key = getenv("DEEPSEEK_API_KEY")
 
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
-    temperature=0.6
+    temperature=0.6,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
 
-# 创建一个简单的工具
-@tool
-def get_used_info(used_id: str) -> str:
-    """获取简单的用户消息"""
-    users = {
-        "123": "张三，25岁，工程师",
-        "456": "李四，30岁，设计师"
-    }
-    return users.get(used_id, '未找到该用户')
-
-
 def example_1_with_memory():
     agent = create_agent(
-        model=model,
+        model=resolve(model),
         system_prompt='你是一位大模型开发工程师。',
         checkpointer=InMemorySaver()
     )
@@ -71,7 +72,7 @@ def example_2_multiple_threads():
     print("=" * 70)
 
     agent = create_agent(
-        model=model,
+        model=resolve(model),
         tools=[],
         system_prompt="你是一个有帮助的助手。",
         checkpointer=InMemorySaver()
@@ -123,18 +124,17 @@ def example_3_practical_use():
     简单的实际场景应用
     模拟一个记住用户消息的客服场景
     """
-    system_prompt = """
-    你是一个客服助手。
-    特点：
-    - 记住用户说过的话
-    - 友好、有耐心
-    - 使用 get_user_info 工具查询用户信息时需要用户 ID"""
-
+    # 固定工具定义、检查请求前缀，并统计每个会话的缓存命中率（见下方日志里的 cache_read）
+    prefix = PrefixStableMiddleware()
     agent = create_agent(
-        model=model,
+        model=resolve(model),
         tools=[get_used_info],
-        system_prompt=system_prompt,
-        checkpointer=InMemorySaver()
+        system_prompt=CUSTOMER_SERVICE_PROMPT,
+        # 客服场景需要跨进程保留会话：用 SQLite 持久化（接口与 InMemorySaver 相同）
+        # 演示每次运行用一个新的临时文件，避免重跑时 '客服1号' 带着上一次的历史；
+        # 实际服务用固定路径，见 09_agent_service
+        checkpointer=SqliteSaver(str(Path(tempfile.mkdtemp(prefix='memory-basics-')) / 'checkpoints.sqlite')),
+        middleware=[prefix]
     )
 
     config = {'configurable': {'thread_id': '客服1号'}}
@@ -150,6 +150,7 @@ def example_3_practical_use():
         response = agent.stream({'messages': [messages]}, config=config)
         for chunk in response:
             print(chunk)
+    print(f"缓存命中统计：{prefix.cache_report('客服1号')}")
 
 
 # 流式输出如下
@@ -167,11 +168,46 @@ def example_3_practical_use():
 """
 
 
+def example_4_async_sessions():
+    """
+    示例4：异步多会话调度
+    不同 thread_id 并发处理，同一 thread_id 的多轮严格按顺序
+    """
+    print("\n" + "=" * 70)
+    print("示例 4：异步多会话")
+    print("=" * 70)
+
+    agent = create_agent(
+        model=resolve(model),
+        tools=[],
+        system_prompt="你是一个有帮助的助手。",
+        checkpointer=InMemorySaver()
+    )
+    driver = SessionDriver(agent, max_concurrency=32)
+
+    # Alice 与 Bob 的轮次交错提交：两人之间并发，各自内部按顺序
+    turns = [
+        ("user_alice", "我叫 Alice"),
+        ("user_bob", "我叫 Bob"),
+        ("user_alice", "我叫什么？"),
+        ("user_bob", "我叫什么？"),
+    ]
+    results = asyncio.run(driver.run(turns))
+    for (thread_id, question), result in zip(turns, results):
+        answer = result if isinstance(result, Exception) else result['messages'][-1].content
+        print(f"[{thread_id}] {question} -> {answer}")
+
+    print("\n关键点：")
+    print("  - 会话之间没有队头阻塞，单进程可服务大量用户")
+    print("  - 同一会话加锁排队，记忆不会错乱")
+
+
 def main():
     try:
         example_1_with_memory()
         example_2_multiple_threads()
         example_3_practical_use()
+        example_4_async_sessions()
     except Exception as e:
         print(e)
 
@@ -10,53 +10,38 @@ LangChain 1.0 - Context Management (上下文管理)
 2. trim_messages - 消息修剪工具
 3. 管理对话长度，避免超 token
 4. 中间件的使用
+5. BackgroundSummarizationMiddleware - 后台摘要，用户等待时间不包含摘要调用
 """
 
 import os
+import time
 from dotenv import load_dotenv
-from langchain.chat_models import init_chat_model
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.token_counter import TokenCounter
+from common.summarization import BackgroundSummarizationMiddleware, RollingSummarizationMiddleware
+from common.lazy import resolve  # 直接导入的 create_agent / SummarizationMiddleware 按类型判断模型
+from common.tools.user_info import CUSTOMER_SERVICE_PROMPT, get_used_info  # 与 07、09 共用的客服工具和提示
+from common.tools import evaluate_expression  # 整个算式一次算完，不用每个二元运算各走一轮工具调用
 from langchain.agents import create_agent
-from langchain.tools import tool
 from langchain.agents.middleware import SummarizationMiddleware
 from langgraph.checkpoint.memory import InMemorySaver
 
 load_dotenv()
 api_key = os.getenv("DEEPSEEK_API_KEY")
 
-model = init_chat_model(
+model = get_chat_model(
     model='deepseek-chat',
     api_key=api_key,
-    temperature=0.6
+    temperature=0.6,
+    lazy=True,  # 第一次使用时才导入 langchain_openai 并构建模型
 )
 
-
-@tool
-def calculate(operation: str, a: float, b: float) -> str:
-    """
-    简单的计算器
-    :param operation: +-*/
-    :param a: 数字
-    :param b: 数字
-    :return: 字符串
-    """
-    option = {
-        '+': lambda a, b: a + b,
-        '-': lambda a, b: a - b,
-        '*': lambda a, b: a * b,
-        '/': lambda a, b: a / b,
-    }
-    result = option.get(operation, 'wrong')(a, b)
-    return f"{a} {operation} {b} = {result}"
-
-
-@tool
-def get_used_info(used_id: str) -> str:
-    """获取简单的用户消息"""
-    users = {
-        "123": "张三，25岁，工程师",
-        "456": "李四，30岁，设计师"
-    }
-    return users.get(used_id, '未找到该用户')
+# 离线 token 计数器：按消息 id 缓存单条计数，多轮对话只数新增消息
+token_counter = TokenCounter()
 
 
 # 问题 - 对话历史无限增长
@@ -66,15 +51,19 @@ def example_1_summarization_middleware():
     示例1：使用 SummarizationMiddleware 自动摘要
     关键：LangChain 1.0 新增的中间件
     当消息数超过阈值时，自动摘要旧消息
+    这里用的是滚动摘要版本：每次只把新过期的消息折叠进已有摘要，摘要大小有上限，
+    对话到几百轮时每次摘要的成本也不会增长
     """
-    summarizer = SummarizationMiddleware(
-        model=model,
+    summarizer = RollingSummarizationMiddleware(
+        model=resolve(model),
         trigger=("tokens", 3000),
+        token_counter=token_counter,
+        max_summary_tokens=800,
     )
 
     agent = create_agent(
-        model=model,
-        tools=[calculate],
+        model=resolve(model),
+        tools=[evaluate_expression],
         system_prompt="你是一个有帮助的助手。",
         checkpointer=InMemorySaver(),
         middleware=[summarizer]
@@ -100,6 +89,7 @@ def example_1_summarization_middleware():
         print(f"Agent: {response.get('messages')[-1].content}")
 
     print(f"\n消息数: {len(response['messages'])}")
+    print(f"摘要统计: {summarizer.store.stats()}")
     print("\n关键点：")
     print("  - SummarizationMiddleware 会自动摘要旧消息")
     print("  - 保持对话历史在可控范围内")
@@ -130,11 +120,11 @@ def example_2_manual_trimming():
 
     trimmed = trim_messages(
         messages,
-        max_tokens=5,  # 或使用 token 数限制
+        max_tokens=30,  # 按 token 数限制（每条约 3 token 内容 + 4 token 消息开销，约保留 4 条）
         strategy="last",  # 保留最后的消息
-        token_counter=len  # 简单计数器（实际应该用 token 计数）这里其实不会被用到，因为 max_count 优先
+        token_counter=token_counter  # 真正按 token 计数（token_counter=len 时数的是消息条数）
     )
-    print(f"修剪后消息数: {len(trimmed)}")
+    print(f"修剪后消息数: {len(trimmed)}，约 {token_counter(trimmed)} tokens")
     print("\n保留的消息：")
     for msg in trimmed:
         print(f"  {msg.__class__.__name__}: {msg.content}")
@@ -151,21 +141,15 @@ def example_3_practical_use():
     模拟一个客服机器人
     场景：客服对话可能很长，需要管理上下文
     """
-    system_prompt = """
-    你是一个客服助手。
-    特点：
-    - 记住用户说过的话
-    - 友好、有耐心
-    - 使用 get_user_info 工具查询用户信息时需要用户 ID"""
-
     summarizer = SummarizationMiddleware(
-        model=model,
+        model=resolve(model),
         trigger=("tokens", 50),
+        token_counter=token_counter,
     )
     agent = create_agent(
-        model=model,
-        tools=[get_used_info,calculate],
-        system_prompt=system_prompt,
+        model=resolve(model),
+        tools=[get_used_info, evaluate_expression],
+        system_prompt=CUSTOMER_SERVICE_PROMPT,
         checkpointer=InMemorySaver(),
         middleware=[]
     )
@@ -176,7 +160,7 @@ def example_3_practical_use():
         "我的用户 ID 是 123",
         # "帮我查一下我的信息",
         "我多大来着？",  # 测试记忆
-        "帮我算一下 100 * 2 的优惠价。",
+        "帮我算一下 100 * 2 减去 15% 之后的优惠价。",  # 整个算式如 100*2*(1-15%) 一次工具调用算完
         # "谢谢，我的ID是多少？？"
     ]
     for conversation in conversations:
@@ -188,6 +172,49 @@ def example_3_practical_use():
                 print(chunk.get('model', {}).get('messages', [])[-1].content)
             elif chunk.get('tools', {}):
                 print(chunk.get('tools', {}).get('messages', [])[-1].content)
+
+
+def example_4_background_summarization():
+    """
+    示例4：后台摘要
+    SummarizationMiddleware 触发时，摘要调用会算进这一轮的响应时间；
+    BackgroundSummarizationMiddleware 在本轮结束后把摘要放到后台线程，下一轮再使用结果，
+    摘要还没好就先裁剪本次请求的历史
+    """
+    summarizer = BackgroundSummarizationMiddleware(
+        model=resolve(model),
+        trigger=("tokens", 300),
+        keep=("messages", 4),
+        token_counter=token_counter,
+    )
+    agent = create_agent(
+        model=resolve(model),
+        tools=[evaluate_expression],
+        system_prompt="你是一个有帮助的助手。",
+        checkpointer=InMemorySaver(),
+        middleware=[summarizer]
+    )
+    config = {"configurable": {"thread_id": "background_summary"}}
+
+    conversations = [
+        "我叫张三，是工程师",
+        "我在北京工作",
+        "我喜欢编程和阅读",
+        "我最近在学习 AI",
+        "请总结一下我的信息"
+    ]
+    for msg in conversations:
+        start = time.perf_counter()
+        response = agent.invoke({"messages": [{"role": "user", "content": msg}]}, config=config)
+        print(f"\n用户: {msg}")
+        print(f"Agent: {response['messages'][-1].content}")
+        print(f"耗时: {time.perf_counter() - start:.2f}s，消息数: {len(response['messages'])}")
+
+    summarizer.wait()
+    print(f"\n摘要统计: {summarizer.stats()}")
+    summarizer.close()
+
+
 #trigger=("tokens", 500),  内容如下：
 '''
 用户：我的用户 ID 是 123
@@ -235,6 +262,7 @@ def main():
         example_1_summarization_middleware()
         example_2_manual_trimming()
         example_3_practical_use()
+        example_4_background_summarization()
     except Exception as e:
         print(e)
         print("""
@@ -0,0 +1,96 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+""""""
+# ----------------------------------------------------------------------------------------------------------------------
+"""
+LangChain 1.0 - Agent Service (把 Agent 部署成服务)
+=================================================
+本模块重点讲解：
+1. 07_memory_basics 的客服 Agent 放到 HTTP 接口后面，thread_id 即会话
+2. invoke（一次返回）与 SSE 流式（逐 token 推送）两种接口
+3. 有界工作池 + 排队上限：过载时返回 503，而不是无限堆积
+4. 客户端断开时取消正在进行的一轮，释放模型并发名额
+
+启动（真实接口 / 离线模拟服务）：
+    python phase_2_practical/09_agent_service/main.py --port 8000
+    python phase_2_practical/09_agent_service/main.py --port 8000 --mock
+
+调用：
+    curl -X POST localhost:8000/threads/user_1/invoke -d '{"message": "我的用户 ID 是 123"}'
+    curl -N -X POST localhost:8000/threads/user_1/stream -d '{"message": "帮我查一下我的信息"}'
+    curl localhost:8000/stats
+
+压测：python benchmarks/load_test_service.py
+"""
+
+import argparse
+from os import getenv
+from dotenv import load_dotenv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # 项目根目录，用于导入 common 包
+from common.model_factory import get_chat_model
+from common.agent_server import AgentServer
+
+load_dotenv()
+
+
+def build_agent(checkpointer=None):
+    """
+    构建客服 Agent（与 07_memory_basics 的 example_3_practical_use 相同，工具和提示共用 common.tools.user_info）
+
+    参数:
+        checkpointer: 会话存储，默认用 SQLite 持久化，服务重启后会话仍在
+            （SqliteSaver 的异步接口在线程池里执行，不阻塞服务的事件循环）
+    """
+    from langchain.agents import create_agent
+    from common.checkpoint import SqliteSaver
+    from common.prefix_cache import PrefixStableMiddleware
+    from common.tools.user_info import CUSTOMER_SERVICE_PROMPT, get_used_info
+
+    model = get_chat_model(
+        model='deepseek-chat',
+        api_key=getenv("DEEPSEEK_API_KEY"),
+        temperature=0.6,
+        streaming=True,
+    )
+    if checkpointer is None:
+        checkpointer = SqliteSaver(str(Path(__file__).with_name('checkpoints.sqlite')))
+    return create_agent(
+        model=model,
+        tools=[get_used_info],
+        system_prompt=CUSTOMER_SERVICE_PROMPT,
+        checkpointer=checkpointer,
+        middleware=[PrefixStableMiddleware()],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='客服 Agent HTTP / SSE 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=32, help='同时处理的轮次上限（工作池大小）')
+    parser.add_argument('--queue', type=int, default=128, help='工作池之外最多排队的请求数，超出返回 503')
+    parser.add_argument('--timeout', type=float, default=120, help='单轮超时（秒）')
+    parser.add_argument('--mock', action='store_true', help='连到进程内的离线模拟服务（不消耗额度）')
+    args = parser.parse_args()
+
+    if args.mock:
+        import os
+        from common.mock_server import MockConfig, serve_in_thread
+
+        mock = serve_in_thread(MockConfig(latency=0.2, tokens_per_sec=50, rules=[
+            {"match": "查一下", "tool_calls": [{"name": "get_used_info", "arguments": {"used_id": "123"}}]},
+        ]))
+        os.environ['DEEPSEEK_BASE_URL'] = mock.base_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'mock')
+        print(f"离线模拟服务：{mock.base_url}")
+
+    server = AgentServer(build_agent(), max_concurrency=args.concurrency, max_queue=args.queue,
+                         request_timeout=args.timeout)
+    server.run(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()